@@ -1,5 +1,7 @@
 
 import streamlit as st
+# A página inicial só importa o streamlit e não acessa o banco: pandas, plotly e os dados
+# da TACO são carregados pelas páginas, no primeiro uso (ver src/lazy_imports.py)
 
 st.set_page_config(
     page_title="Meu Nutri App",
@@ -15,7 +17,9 @@ st.markdown("""
 Use o menu na barra lateral à esquerda para navegar entre as seções:
 
 - **1_patient_management:** Para cadastrar, buscar e acompanhar a evolução dos seus pacientes.
-- **2_meal_plan_creator:** Para montar os planos alimentares personalizados.
+- **10_meal_plan_creator:** Para montar os planos alimentares personalizados.
+- **11_recipes:** Para cadastrar as receitas da clínica e usá-las nos planos como um alimento só.
+- **99_admin_metrics:** Métricas de desempenho do banco e dos cálculos (administração).
 
 Esta é a página inicial. O conteúdo de cada seção está nos arquivos dentro da pasta `pages/`.
 """)
\ No newline at end of file
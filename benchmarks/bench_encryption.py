@@ -0,0 +1,139 @@
+# benchmarks/bench_encryption.py
+"""
+Mede o custo da criptografia dos dados dos pacientes (src/crypto.py) nas leituras: a mesma clínica
+sintética é lida em texto puro e cifrada (scripts/encrypt_patients.py), com uma chave temporária.
+Cada leitura é medida em três situações:
+    fria        cache de leituras e cache de decifragem vazios (app recém-aberto)
+    pós-escrita cache de leituras vazio, nomes já decifrados (o que acontece depois de qualquer gravação)
+    quente      os dois caches cheios
+O custo extra da versão cifrada (p50) é comparado com o orçamento de cada leitura (abaixo);
+o script termina com código 1 se alguma leitura passar dele.
+
+Uso (a partir da raiz do projeto):
+    python benchmarks/bench_encryption.py [--patients 2000] [--consultations 4]
+"""
+
+import argparse
+import base64
+import os
+import secrets
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.clinic import build_clinic
+from scripts.encrypt_patients import encrypt_database
+from src import crypto, db_utils
+
+REPETITIONS = 30
+# Custo extra aceito por leitura (ms, na mediana) com os dados cifrados, por situação.
+READ_OVERHEAD_BUDGET_MS = {'fria': 2.0, 'pós-escrita': 1.0, 'quente': 0.1}
+# Fora do cache de leituras, o diretório decifra (fria) ou reordena (pós-escrita) todos os nomes, e a
+# busca, todos os que começam pelo texto buscado: essas leituras crescem com a clínica, e o orçamento
+# delas vale por 1000 pacientes (nunca abaixo do de READ_OVERHEAD_BUDGET_MS).
+DIRECTORY_BUDGET_MS_PER_1000 = {'fria': 15.0, 'pós-escrita': 4.0}
+SEARCH_BUDGET_MS_PER_1000 = {'fria': 1.0, 'pós-escrita': 0.5}
+DIRECTORY_READS = ('get_patient_list()', 'search_patients(primeira página)')
+SEARCH_READS = ("search_patients('ana')", "search_patients('marcos s')")
+
+
+def _reads(n_patients):
+    patient_id = max(n_patients // 2, 1)
+    return {
+        'get_patient_list()': lambda: db_utils.get_patient_list(),
+        'search_patients(primeira página)': lambda: db_utils.search_patients(),
+        "search_patients('ana')": lambda: db_utils.search_patients('ana'),
+        "search_patients('marcos s')": lambda: db_utils.search_patients('marcos s'),
+        'get_patient_details()': lambda: db_utils.get_patient_details(patient_id),
+    }
+
+
+def _time(read, situation):
+    timings = []
+    for _ in range(REPETITIONS):
+        if situation != 'quente':
+            db_utils.query_cache.clear()
+        if situation == 'fria':
+            crypto.clear_cache()
+        start = time.perf_counter()
+        read()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def _measure(database_file, n_patients):
+    db_utils.DATABASE_FILE = database_file
+    db_utils.query_cache.clear()
+    crypto.clear_cache()
+    results = {}
+    for label, read in _reads(n_patients).items():
+        read()  # Abre as conexões do pool e aquece o cache de statements
+        for situation in READ_OVERHEAD_BUDGET_MS:
+            results[label, situation] = _time(read, situation)
+    db_utils.close_all_connections()
+    return results
+
+
+def _budget(label, situation, n_patients):
+    budget = READ_OVERHEAD_BUDGET_MS[situation]
+    if situation != 'quente' and label in DIRECTORY_READS:
+        budget = max(budget, DIRECTORY_BUDGET_MS_PER_1000[situation] * n_patients / 1000)
+    elif situation != 'quente' and label in SEARCH_READS:
+        budget = max(budget, SEARCH_BUDGET_MS_PER_1000[situation] * n_patients / 1000)
+    return budget
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Custo da criptografia nas leituras de pacientes.")
+    parser.add_argument('--patients', type=int, default=2000, help="Pacientes na clínica sintética")
+    parser.add_argument('--consultations', type=int, default=4, help="Consultas por paciente")
+    args = parser.parse_args()
+
+    previous_key = os.environ.get(crypto.KEY_ENV)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        plain_file = os.path.join(tmp_dir, 'plain.db')
+        encrypted_file = os.path.join(tmp_dir, 'encrypted.db')
+        print(f"Gerando clínica sintética ({args.patients} pacientes x {args.consultations} consultas)...")
+        build_clinic(plain_file, args.patients, args.consultations)
+        shutil.copy(plain_file, encrypted_file)
+
+        # Chave temporária só para o benchmark (nunca grava arquivo de chave)
+        os.environ.pop(crypto.KEY_ENV, None)
+        os.environ[crypto.KEY_FILE_ENV] = os.path.join(tmp_dir, 'sem-chave.key')
+        crypto.reload_key()
+        plain = _measure(plain_file, args.patients)
+
+        os.environ[crypto.KEY_ENV] = base64.urlsafe_b64encode(secrets.token_bytes(32)).decode()
+        crypto.reload_key()
+        encrypt_database(encrypted_file, purge_reports=False)
+        encrypted = _measure(encrypted_file, args.patients)
+
+    os.environ.pop(crypto.KEY_FILE_ENV, None)
+    if previous_key is None:
+        os.environ.pop(crypto.KEY_ENV, None)
+    else:
+        os.environ[crypto.KEY_ENV] = previous_key
+    crypto.reload_key()
+
+    print(f"\n{'leitura':<36} {'situação':<12} {'puro ms':>8} {'cifrado ms':>10} {'extra ms':>9} {'orçamento':>10}")
+    over_budget = []
+    for (label, situation), plain_ms in plain.items():
+        extra = encrypted[label, situation] - plain_ms
+        budget = _budget(label, situation, args.patients)
+        flag = '' if extra <= budget else '  <-- acima do orçamento'
+        if flag:
+            over_budget.append((label, situation))
+        print(f"{label:<36} {situation:<12} {plain_ms:>8.3f} {encrypted[label, situation]:>10.3f} "
+              f"{extra:>9.3f} {budget:>10.1f}{flag}")
+
+    if over_budget:
+        print(f"\n{len(over_budget)} leitura(s) acima do orçamento.")
+        sys.exit(1)
+    print("\nTodas as leituras dentro do orçamento.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+# benchmarks/bench_energy.py
+"""
+Compara o cálculo de TMB/GET em lote (calculate_energy_batch) com o caminho escalar
+(calculate_tee chamado paciente a paciente), para cada equação, em uma base sintética.
+
+Uso (a partir da raiz do projeto):
+    python benchmarks/bench_energy.py [número_de_pacientes]
+"""
+
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src import energy
+
+
+def _synthetic_patients(n_patients, seed=42):
+    rng = np.random.default_rng(seed)
+    return {
+        'sexes': rng.choice(['masculino', 'feminino'], n_patients),
+        'ages': rng.integers(18, 80, n_patients),
+        'weights_kg': rng.uniform(45, 130, n_patients).round(1),
+        'heights_cm': rng.uniform(150, 200, n_patients).round(1),
+        'activity_levels': rng.choice(list(energy.ACTIVITY_FACTORS), n_patients),
+        'body_fat_percentages': rng.uniform(8, 45, n_patients).round(1),
+    }
+
+
+def main():
+    n_patients = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    patients = _synthetic_patients(n_patients)
+    rows = list(zip(*patients.values()))
+
+    # Aquecimento fora da medição: a primeira chamada em lote carrega o pandas (import preguiçoso)
+    warmup = {key: values[:10] for key, values in patients.items()}
+    for equation in energy.EQUATIONS:
+        energy.calculate_tee(equation, *rows[0])
+        energy.calculate_energy_batch(equation, **warmup)
+
+    print(f"{n_patients} pacientes\n")
+    print(f"{'equação':<18} {'escalar (ms)':>13} {'lote (ms)':>10} {'ganho':>8}  confere")
+    for equation in energy.EQUATIONS:
+        start = time.perf_counter()
+        scalar = [
+            energy.calculate_tee(equation, sex, age, weight, height, level, body_fat)
+            for sex, age, weight, height, level, body_fat in rows
+        ]
+        scalar_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        batch = energy.calculate_energy_batch(equation, **patients)
+        batch_ms = (time.perf_counter() - start) * 1000
+
+        matches = np.allclose(np.array(scalar, dtype=float), batch['tee'].to_numpy(), equal_nan=True)
+        print(f"{equation:<18} {scalar_ms:>13.1f} {batch_ms:>10.1f} {scalar_ms / batch_ms:>7.0f}x  {'sim' if matches else 'NÃO'}")
+
+
+if __name__ == '__main__':
+    main()
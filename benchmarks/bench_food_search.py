@@ -0,0 +1,73 @@
+# benchmarks/bench_food_search.py
+"""
+Mede a latência da busca de alimentos (src/food_search.py) por tamanho da consulta,
+simulando a digitação letra a letra, sobre um banco temporário populado com a TACO.
+
+Uso (a partir da raiz do projeto):
+    python benchmarks/bench_food_search.py
+"""
+
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts import initialize_database
+from src import db_utils, food_search
+
+# Termos digitados letra a letra (cada prefixo vira uma consulta) e alguns com erro de digitação
+TYPED_QUERIES = ['arroz integral', 'feijao carioca cozido', 'pao frances', 'acucar cristal', 'frango peito grelhado']
+TYPO_QUERIES = ['fejao', 'arros integrl', 'banan prata', 'mamao papaia', 'brocolis cosido']
+REPETITIONS = 20
+
+
+def _time_query(query):
+    """Executa a busca várias vezes e retorna as latências em milissegundos."""
+    timings = []
+    for _ in range(REPETITIONS):
+        start = time.perf_counter()
+        food_search.search_foods(query)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def _report(label, timings):
+    timings = sorted(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(f"{label:<12} {statistics.median(timings):>8.3f} {p95:>8.3f} {timings[-1]:>8.3f}")
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_utils.DATABASE_FILE = os.path.join(tmp_dir, 'bench.db')
+        conn = sqlite3.connect(db_utils.DATABASE_FILE)
+        try:
+            initialize_database.create_tables(conn)
+            initialize_database.populate_foods_from_taco(conn)
+        finally:
+            conn.close()
+
+        by_length = {}
+        for text in TYPED_QUERIES:
+            for length in range(1, len(text) + 1):
+                by_length.setdefault(length, []).extend(_time_query(text[:length]))
+
+        print(f"\n{'tamanho':<12} {'p50 (ms)':>8} {'p95 (ms)':>8} {'max (ms)':>8}")
+        for length, timings in sorted(by_length.items()):
+            _report(str(length), timings)
+
+        typo_timings = [t for query in TYPO_QUERIES for t in _time_query(query)]
+        _report('com erros', typo_timings)
+
+        print("\nExemplos:")
+        for query in ['pao', 'acucar', 'fejao', 'arros integrl']:
+            results = food_search.search_foods(query, limit=3)['description'].tolist()
+            print(f"  {query!r}: {results}")
+        db_utils.close_all_connections()
+
+
+if __name__ == '__main__':
+    main()
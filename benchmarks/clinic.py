@@ -0,0 +1,120 @@
+# benchmarks/clinic.py
+"""
+Gera uma clínica sintética (pacientes, consultas com todas as medidas e alimentos) em um arquivo
+SQLite, para os benchmarks. Os alimentos são os da TACO; se forem pedidos mais, o restante é
+completado com alimentos sintéticos de nutrientes aleatórios.
+"""
+
+import os
+import sqlite3
+import sys
+from datetime import date, timedelta
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts import initialize_database
+from src import db_utils, food_search, food_similarity
+from src.taco import NUTRIENT_COLUMNS
+from src.text_utils import normalize_text
+
+FIRST_NAMES = ['Ana', 'Bruno', 'Carla', 'Diego', 'Eduarda', 'Felipe', 'Gabriela', 'Heitor', 'Isabela', 'João',
+               'Larissa', 'Marcos', 'Natália', 'Otávio', 'Paula', 'Rafael', 'Sofia', 'Tiago', 'Valéria', 'Yuri']
+LAST_NAMES = ['Silva', 'Santos', 'Oliveira', 'Souza', 'Lima', 'Pereira', 'Costa', 'Rodrigues', 'Almeida', 'Nascimento']
+FOOD_WORDS = ['arroz', 'feijão', 'frango', 'carne', 'peixe', 'batata', 'milho', 'leite', 'queijo', 'pão',
+              'banana', 'maçã', 'tomate', 'cenoura', 'aveia', 'ovo', 'cozido', 'grelhado', 'cru', 'integral']
+SYNTHETIC_FOOD_ID_START = 100000  # Longe dos ids da TACO
+FIRST_CONSULTATION = date(2020, 1, 6)
+
+
+def _populate_foods(conn, n_foods, rng):
+    """Carrega a TACO e, se n_foods for maior, acrescenta alimentos sintéticos."""
+    initialize_database.populate_foods_from_taco(conn)
+    existing = conn.execute("SELECT COUNT(*) FROM foods").fetchone()[0]
+    missing = max(n_foods - existing, 0)
+    if not missing:
+        return existing
+
+    descriptions = [
+        ', '.join(rng.choice(FOOD_WORDS, size=3, replace=False)).capitalize() + f" {food_number}"
+        for food_number in range(missing)
+    ]
+    nutrients = rng.gamma(shape=1.5, scale=20.0, size=(missing, len(NUTRIENT_COLUMNS))).round(2)
+    rows = (
+        (SYNTHETIC_FOOD_ID_START + position, description, *values.tolist())
+        for position, (description, values) in enumerate(zip(descriptions, nutrients))
+    )
+    columns = ['food_id', 'description', *NUTRIENT_COLUMNS]
+    with conn:
+        conn.executemany(
+            f"INSERT INTO foods ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})", rows
+        )
+    food_search.rebuild_food_search_index(conn)
+    food_similarity.rebuild_substitutes_table(conn)
+    return existing + missing
+
+
+def _populate_patients(conn, n_patients, rng):
+    names = [
+        f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {rng.choice(LAST_NAMES)}" for _ in range(n_patients)
+    ]
+    birth_dates = [
+        (date(1950, 1, 1) + timedelta(days=int(days))).isoformat() for days in rng.integers(0, 365 * 55, n_patients)
+    ]
+    sexes = rng.choice(['masculino', 'feminino'], n_patients)
+    with conn:
+        conn.executemany(
+            "INSERT INTO patients (name, name_search, birth_date, sex, contact, medical_history) VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                (name, normalize_text(name), birth_date, str(sex), '(11) 90000-0000', '')
+                for name, birth_date, sex in zip(names, birth_dates, sexes)
+            )
+        )
+
+
+def _populate_consultations(conn, n_patients, consultations_per_patient, rng):
+    skinfold_columns = [f"skinfold_{site}_mm" for site in db_utils.SKINFOLD_SITES]
+    circumference_columns = [f"circ_{site}_cm" for site in db_utils.CIRCUMFERENCE_SITES]
+    columns = ['patient_id', 'consultation_date', 'weight_kg', 'height_cm', 'body_fat_percentage',
+               *skinfold_columns, *circumference_columns, 'notes']
+
+    n_rows = n_patients * consultations_per_patient
+    patient_ids = np.repeat(np.arange(1, n_patients + 1), consultations_per_patient)
+    visit_numbers = np.tile(np.arange(consultations_per_patient), n_patients)
+    dates = [(FIRST_CONSULTATION + timedelta(days=int(days))).isoformat() for days in visit_numbers * 28]
+    weights = (rng.uniform(50, 120, n_patients).repeat(consultations_per_patient) - visit_numbers * 0.4).round(1)
+    heights = rng.uniform(150, 195, n_patients).repeat(consultations_per_patient).round(1)
+    body_fat = rng.uniform(10, 40, n_rows).round(1)
+    skinfolds = rng.uniform(4, 35, (n_rows, len(skinfold_columns))).round(1)
+    circumferences = rng.uniform(25, 110, (n_rows, len(circumference_columns))).round(1)
+
+    rows = (
+        (int(patient_ids[row]), dates[row], float(weights[row]), float(heights[row]), float(body_fat[row]),
+         *skinfolds[row].tolist(), *circumferences[row].tolist(), '')
+        for row in range(n_rows)
+    )
+    with conn:
+        conn.executemany(
+            f"INSERT INTO consultations ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})", rows
+        )
+
+
+def build_clinic(database_file, n_patients=1000, consultations_per_patient=8, n_foods=0, seed=42):
+    """
+    Cria o banco em database_file (esquema pelas migrações) e o popula com a clínica sintética.
+    Retorna um dicionário com o tamanho real gerado.
+    """
+    rng = np.random.default_rng(seed)
+    conn = sqlite3.connect(database_file)
+    try:
+        initialize_database.create_tables(conn)
+        foods = _populate_foods(conn, n_foods, rng)
+        _populate_patients(conn, n_patients, rng)
+        _populate_consultations(conn, n_patients, consultations_per_patient, rng)
+        conn.execute("ANALYZE")
+    finally:
+        conn.close()
+    return {
+        'patients': n_patients,
+        'consultations': n_patients * consultations_per_patient,
+        'foods': foods,
+    }
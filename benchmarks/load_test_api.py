@@ -0,0 +1,262 @@
+# benchmarks/load_test_api.py
+"""
+Teste de carga da API HTTP (src/api.py): sobe scripts/run_api.py em um subprocesso, sobre uma
+clínica sintética em um banco temporário (ou sobre --database), e dispara requisições com N
+clientes simultâneos (conexões keep-alive) durante alguns segundos por cenário.
+Mostra requisições por segundo e latências (p50/p95/p99) de cada cenário.
+
+Uso (a partir da raiz do projeto):
+    python benchmarks/load_test_api.py [--patients 1000] [--consultations 8] [--concurrency 32]
+                                       [--duration 10] [--only mixed] [--json resultados.json]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.clinic import build_clinic
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RUN_API = os.path.join(PROJECT_ROOT, 'scripts', 'run_api.py')
+BODY_FAT_BATCH_SIZE = 200  # Avaliações por requisição no cenário de %GC em lote
+CONSULTATION_BATCH_SIZE = 50  # Consultas por requisição no cenário de inserção em lote
+STARTUP_TIMEOUT_S = 30
+
+
+# --- Cliente HTTP/1.1 mínimo (keep-alive) ---
+
+class HttpClient:
+    def __init__(self, host, port):
+        self.host, self.port = host, port
+        self.reader = self.writer = None
+
+    async def request(self, method, path, body=None, headers=None):
+        """Envia uma requisição e devolve (status, cabeçalhos, corpo)."""
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        payload = b'' if body is None else json.dumps(body).encode()
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {self.host}", f"Content-Length: {len(payload)}"]
+        if body is not None:
+            lines.append("Content-Type: application/json")
+        lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+        self.writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode() + payload)
+        await self.writer.drain()
+
+        head = (await self.reader.readuntil(b'\r\n\r\n')).decode('latin-1').split('\r\n')
+        status = int(head[0].split()[1])
+        response_headers = {}
+        for line in head[1:]:
+            if line:
+                name, _, value = line.partition(':')
+                response_headers[name.strip().lower()] = value.strip()
+        length = int(response_headers.get('content-length', 0))
+        response_body = await self.reader.readexactly(length) if length else b''
+        return status, response_headers, response_body
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            await self.writer.wait_closed()
+
+
+# --- Cenários: cada um devolve (método, caminho, corpo, cabeçalhos, status esperado) ---
+
+def _random_skinfolds(rng):
+    return {site: round(rng.uniform(5, 35), 1) for site in ('chest', 'abdominal', 'thigh', 'triceps', 'suprailiac')}
+
+
+def scenario_get_patient(rng, state):
+    return 'GET', f"/patients/{rng.randint(1, state['patients'])}", None, None, 200
+
+
+def scenario_get_consultations(rng, state):
+    return 'GET', f"/patients/{rng.randint(1, state['patients'])}/consultations", None, None, 200
+
+
+def scenario_conditional_get(rng, state):
+    patient_id = rng.randint(1, state['conditional_patients'])
+    headers = {'If-None-Match': state['etags'][patient_id]}
+    return 'GET', f"/patients/{patient_id}/consultations", None, headers, 304
+
+
+def scenario_body_fat_batch(rng, state):
+    items = [
+        {'sex': rng.choice(('masculino', 'feminino')), 'age': rng.randint(18, 70), 'skinfolds': _random_skinfolds(rng)}
+        for _ in range(BODY_FAT_BATCH_SIZE)
+    ]
+    return 'POST', '/body-fat/batch', {'protocol': 'Pollock 3 dobras', 'items': items}, None, 200
+
+
+def scenario_consultation_batch(rng, state):
+    # Só grava em pacientes fora da faixa do GET condicional, para as ETags coletadas continuarem válidas
+    consultations = [
+        {
+            'patient_id': rng.randint(state['conditional_patients'] + 1, state['patients']),
+            'consultation_date': '2030-01-01',
+            'weight_kg': round(rng.uniform(50, 110), 1), 'skinfolds': _random_skinfolds(rng),
+        }
+        for _ in range(CONSULTATION_BATCH_SIZE)
+    ]
+    return 'POST', '/consultations/batch', {'consultations': consultations}, None, 201
+
+
+def scenario_mixed(rng, state):
+    """Perfil típico: leitura na maior parte, algumas revalidações, cálculos e gravações."""
+    roll = rng.random()
+    if roll < 0.45:
+        return scenario_get_patient(rng, state)
+    if roll < 0.80:
+        return scenario_get_consultations(rng, state)
+    if roll < 0.92:
+        return scenario_conditional_get(rng, state)
+    if roll < 0.97:
+        return scenario_body_fat_batch(rng, state)
+    request = scenario_consultation_batch(rng, state)
+    request[2]['consultations'] = request[2]['consultations'][:5]
+    return request
+
+
+SCENARIOS = {
+    'get_patient': scenario_get_patient,
+    'get_consultations': scenario_get_consultations,
+    'conditional_get': scenario_conditional_get,
+    'body_fat_batch': scenario_body_fat_batch,
+    'consultation_batch': scenario_consultation_batch,
+    'mixed': scenario_mixed,
+}
+
+
+# --- Execução ---
+
+async def _worker(host, port, scenario, state, deadline, seed, latencies, errors):
+    rng = random.Random(seed)
+    client = HttpClient(host, port)
+    try:
+        while time.perf_counter() < deadline:
+            method, path, body, headers, expected = scenario(rng, state)
+            start = time.perf_counter()
+            status, _, _ = await client.request(method, path, body, headers)
+            latencies.append((time.perf_counter() - start) * 1000)
+            if status != expected:
+                errors.append(f"{method} {path}: {status}")
+    finally:
+        await client.close()
+
+
+async def _collect_etags(host, port, state):
+    """ETags das consultas de alguns pacientes, para o cenário de GET condicional."""
+    client = HttpClient(host, port)
+    try:
+        for patient_id in range(1, state['conditional_patients'] + 1):
+            _, headers, _ = await client.request('GET', f"/patients/{patient_id}/consultations")
+            state['etags'][patient_id] = headers['etag']
+    finally:
+        await client.close()
+
+
+async def run_scenario(host, port, name, state, concurrency, duration):
+    latencies, errors = [], []
+    start = time.perf_counter()
+    deadline = start + duration
+    await asyncio.gather(*(
+        _worker(host, port, SCENARIOS[name], state, deadline, seed, latencies, errors) for seed in range(concurrency)
+    ))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+
+    def percentile(fraction):
+        return latencies[min(int(len(latencies) * fraction), len(latencies) - 1)]
+
+    return {
+        'requests': len(latencies),
+        'requests_per_s': len(latencies) / elapsed,
+        'p50_ms': percentile(0.50),
+        'p95_ms': percentile(0.95),
+        'p99_ms': percentile(0.99),
+        'errors': len(errors),
+        'first_error': errors[0] if errors else None,
+    }
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _wait_until_ready(host, port, process):
+    deadline = time.time() + STARTUP_TIMEOUT_S
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("A API terminou durante a inicialização.")
+        try:
+            with socket.create_connection((host, port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError("A API não respondeu a tempo.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga da API HTTP.")
+    parser.add_argument('--database', help="Banco existente (o padrão é gerar uma clínica sintética temporária)")
+    parser.add_argument('--patients', type=int, default=1000, help="Pacientes na clínica sintética")
+    parser.add_argument('--consultations', type=int, default=8, help="Consultas por paciente")
+    parser.add_argument('--concurrency', type=int, default=32, help="Clientes simultâneos")
+    parser.add_argument('--duration', type=float, default=10.0, help="Segundos por cenário")
+    parser.add_argument('--only', help="Roda só os cenários cujo nome contém este texto")
+    parser.add_argument('--json', help="Grava os resultados neste arquivo JSON")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='nutri-load-')
+    database_file = args.database
+    if database_file is None:
+        # A inserção em lote cresce o banco: a clínica sintética é descartada no final
+        database_file = os.path.join(workdir, 'nutri.db')
+        print(f"Gerando clínica sintética ({args.patients} pacientes x {args.consultations} consultas)...")
+        build_clinic(database_file, args.patients, args.consultations)
+
+    with sqlite3.connect(database_file) as conn:
+        n_patients = conn.execute("SELECT MAX(id) FROM patients").fetchone()[0]
+    state = {'patients': n_patients, 'conditional_patients': min(n_patients, 200), 'etags': {}}
+
+    host, port = '127.0.0.1', _free_port()
+    process = subprocess.Popen(
+        [sys.executable, RUN_API, '--database', database_file, '--host', host, '--port', str(port)]
+    )
+    results = {}
+    try:
+        _wait_until_ready(host, port, process)
+        asyncio.run(_collect_etags(host, port, state))
+        print(f"{'cenário':<20} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'erros':>6}")
+        for name in SCENARIOS:
+            if args.only and args.only not in name:
+                continue
+            result = asyncio.run(run_scenario(host, port, name, state, args.concurrency, args.duration))
+            results[name] = result
+            print(f"{name:<20} {result['requests_per_s']:>9.0f} {result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} "
+                  f"{result['p99_ms']:>8.1f} {result['errors']:>6}")
+            if result['first_error']:
+                print(f"    primeiro erro: {result['first_error']}")
+    finally:
+        process.terminate()
+        process.wait()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as file:
+            json.dump({'concurrency': args.concurrency, 'duration_s': args.duration, 'scenarios': results}, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
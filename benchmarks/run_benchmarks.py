@@ -0,0 +1,319 @@
+# benchmarks/run_benchmarks.py
+"""
+Suíte de benchmarks do app: cálculos de %GC, leituras e escritas do db_utils, carga da TACO
+e uma rerun "headless" da página de pacientes (streamlit.testing), sobre uma clínica sintética
+gerada em um banco temporário (ver benchmarks/clinic.py).
+
+Uso (a partir da raiz do projeto):
+    python benchmarks/run_benchmarks.py [--patients 1000] [--consultations 8] [--foods 0]
+                                        [--repeat 20] [--only db_utils] [--output resultados.json]
+    python benchmarks/run_benchmarks.py --compare antes.json depois.json [--threshold 0.15]
+
+O modo --compare lista a variação de cada benchmark (mediana) e termina com código 1 se algum
+ficou mais lento que o limite, para acompanhar o desempenho entre duas versões.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.clinic import build_clinic
+from scripts import initialize_database
+from src import calculations, db_utils, taco
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_OUTPUT = os.path.join(PROJECT_ROOT, 'benchmarks', 'results', 'latest.json')
+PATIENT_PAGE = os.path.join(PROJECT_ROOT, 'pages', '1_patient_management.py')
+SCALAR_CALLS = 1000  # Chamadas de calculate_body_fat por medição
+REGRESSION_THRESHOLD = 0.15  # 15% mais lento = regressão
+MIN_DIFFERENCE_MS = 0.05  # Diferenças menores que isso são ruído, mesmo em termos relativos
+
+BODY_FAT_SKINFOLDS = {
+    'triceps': 14.0, 'subscapular': 16.0, 'biceps': 7.0, 'chest': 12.0, 'midaxillary': 11.0,
+    'suprailiac': 15.0, 'abdominal': 22.0, 'thigh': 18.0,
+}
+
+
+# --- Medição ---
+
+def _measure(function, repeat, setup=None):
+    """Executa function `repeat` vezes (setup antes de cada uma, fora da medição); tempos em ms."""
+    timings = []
+    for _ in range(repeat):
+        argument = setup() if setup else None
+        start = time.perf_counter()
+        function(argument) if setup else function()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def _summary(timings):
+    ordered = sorted(timings)
+    return {
+        'median_ms': statistics.median(ordered),
+        'p95_ms': ordered[math.ceil(0.95 * len(ordered)) - 1],  # Posto mais próximo
+        'min_ms': ordered[0],
+        'runs': len(ordered),
+    }
+
+
+# --- Benchmarks ---
+
+def bench_calculations(repeat, clinic):
+    results = {}
+    for protocol in ('Pollock 7 dobras', 'Pollock 3 dobras', 'Durnin & Womersley 4 dobras'):
+        for sex in ('masculino', 'feminino'):
+            results[f"calculations.calculate_body_fat[{protocol}, {sex}] x{SCALAR_CALLS}"] = _measure(
+                lambda: [
+                    calculations.calculate_body_fat(protocol, '1985-06-15', sex, BODY_FAT_SKINFOLDS)
+                    for _ in range(SCALAR_CALLS)
+                ],
+                repeat
+            )
+
+    with db_utils.get_db_connection() as conn:
+        rows = conn.execute(
+            "SELECT p.sex, p.birth_date, c.consultation_date, "
+            + ', '.join(f"c.skinfold_{site}_mm" for site in db_utils.SKINFOLD_SITES)
+            + " FROM consultations c JOIN patients p ON p.id = c.patient_id"
+        ).fetchall()
+    sexes = [row[0] for row in rows]
+    ages = calculations.ages_from_birth_dates([row[1] for row in rows], [row[2] for row in rows])
+    skinfolds = {site: [row[3 + position] for row in rows] for position, site in enumerate(db_utils.SKINFOLD_SITES)}
+    for protocol in ('Pollock 7 dobras', 'Pollock 3 dobras', 'Durnin & Womersley 4 dobras'):
+        results[f"calculations.calculate_body_fat_batch[{protocol}] x{len(rows)}"] = _measure(
+            lambda: calculations.calculate_body_fat_batch(protocol, sexes, ages, skinfolds), repeat
+        )
+    return results
+
+
+def bench_readers(repeat, clinic):
+    """Cada leitor a frio (cache vazio, vai ao banco) e a quente (servido pelo cache)."""
+    middle_id = clinic['patients'] // 2
+    _, next_cursor = db_utils.search_patients()
+    readers = {
+        'get_patient_list()': lambda: db_utils.get_patient_list(),
+        'search_patients(primeira página)': lambda: db_utils.search_patients(),
+        'search_patients(segunda página)': lambda: db_utils.search_patients(after=next_cursor),
+        "search_patients('ana')": lambda: db_utils.search_patients('ana'),
+        'get_patient_details(id)': lambda: db_utils.get_patient_details(middle_id),
+        'get_consultations_for_patient(id)': lambda: db_utils.get_consultations_for_patient(middle_id),
+    }
+    results = {}
+    for name, reader in readers.items():
+        results[f"db_utils.{name}[frio]"] = _measure(lambda _: reader(), repeat, setup=db_utils.query_cache.clear)
+        reader()
+        results[f"db_utils.{name}[quente]"] = _measure(reader, repeat)
+    return results
+
+
+def bench_writers(repeat, clinic):
+    patient_id = clinic['patients'] // 3
+    skinfolds = {site: 10.0 for site in db_utils.SKINFOLD_SITES}
+    circumferences = {site: 50.0 for site in db_utils.CIRCUMFERENCE_SITES}
+
+    def add_patient():
+        db_utils.add_patient('Paciente Benchmark', '1990-01-01', 'feminino', '', '')
+
+    def update_patient():
+        db_utils.update_patient(patient_id, 'Paciente Atualizado', '1990-01-01', 'feminino', '', '')
+
+    def add_consultation():
+        db_utils.add_consultation(
+            patient_id, '2024-01-01', 70.0, 170.0, 20.0, '', skinfolds=skinfolds, circumferences=circumferences
+        )
+
+    def new_consultation():
+        add_consultation()
+        with db_utils.get_db_connection() as conn:
+            return conn.execute("SELECT MAX(id) FROM consultations").fetchone()[0]
+
+    def new_patient():
+        add_patient()
+        with db_utils.get_db_connection() as conn:
+            return conn.execute("SELECT MAX(id) FROM patients").fetchone()[0]
+
+    return {
+        'db_utils.add_patient': _measure(add_patient, repeat),
+        'db_utils.update_patient': _measure(update_patient, repeat),
+        'db_utils.add_consultation': _measure(add_consultation, repeat),
+        'db_utils.delete_consultation': _measure(db_utils.delete_consultation, repeat, setup=new_consultation),
+        'db_utils.delete_patient': _measure(db_utils.delete_patient, repeat, setup=new_patient),
+    }
+
+
+def bench_taco(repeat, clinic):
+    """Leitura da TACO (parse do CSV e cache binário) e a carga completa do initialize_database."""
+    source = initialize_database.TACO_TABLE_FILE
+    results = {
+        'taco.read_taco_source(csv, sem cache)': _measure(lambda: taco.read_taco_source(source), repeat),
+        'taco.load_taco(cache)': _measure(lambda: taco.load_taco(source), repeat),
+    }
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        databases = iter(range(repeat))
+
+        def fresh_database():
+            conn = sqlite3.connect(os.path.join(tmp_dir, f"taco-{next(databases)}.db"))
+            with contextlib.redirect_stdout(io.StringIO()):
+                initialize_database.create_tables(conn)
+            return conn
+
+        def populate(conn):
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    initialize_database.populate_foods_from_taco(conn)
+            finally:
+                conn.close()
+
+        results['initialize_database.populate_foods_from_taco'] = _measure(populate, repeat, setup=fresh_database)
+    return results
+
+
+def bench_patient_page(repeat, clinic):
+    """Rerun da página de pacientes sem navegador (streamlit.testing.v1.AppTest)."""
+    try:
+        from streamlit.testing.v1 import AppTest
+    except ImportError:
+        print("  streamlit não instalado: benchmark da página ignorado.")
+        return {}
+
+    patient_id = clinic['patients'] // 2
+    app = AppTest.from_file(PATIENT_PAGE, default_timeout=60)
+    timings = {'diretório (primeira execução)': [], 'paciente aberto': [], 'rerun sem mudanças': []}
+    for _ in range(repeat):
+        db_utils.query_cache.clear()
+        start = time.perf_counter()
+        app.run()
+        timings['diretório (primeira execução)'].append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        app.selectbox[0].set_value(patient_id).run()
+        timings['paciente aberto'].append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        app.run()
+        timings['rerun sem mudanças'].append((time.perf_counter() - start) * 1000)
+        if app.exception:
+            raise RuntimeError(f"A página falhou: {app.exception[0].value}")
+    return {f"page.1_patient_management[{name}]": values for name, values in timings.items()}
+
+
+BENCHMARKS = {
+    'calculations': bench_calculations,
+    'db_utils.readers': bench_readers,
+    'db_utils.writers': bench_writers,
+    'taco': bench_taco,
+    'page': bench_patient_page,
+}
+
+
+# --- Execução e comparação ---
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_utils.DATABASE_FILE = os.path.join(tmp_dir, 'clinic.db')
+        print("Gerando a clínica sintética...")
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            clinic = build_clinic(db_utils.DATABASE_FILE, args.patients, args.consultations, args.foods)
+        print(f"  {clinic} em {time.perf_counter() - start:.1f} s\n")
+
+        for group, benchmark in BENCHMARKS.items():
+            if args.only and args.only not in group:
+                continue
+            print(f"[{group}]")
+            for name, timings in benchmark(args.repeat, clinic).items():
+                results[name] = _summary(timings)
+                print(f"  {name:<70} {results[name]['median_ms']:>10.3f} ms (p95 {results[name]['p95_ms']:.3f})")
+            print()
+        db_utils.close_all_connections()
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'clinic': clinic,
+            'repeat': args.repeat,
+        },
+        'results': results,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as file:
+        json.dump(report, file, indent=2, ensure_ascii=False)
+    print(f"Resultados salvos em '{args.output}'.")
+
+
+def compare(before_path, after_path, threshold):
+    """Compara as medianas de duas execuções. Retorna o número de regressões."""
+    with open(before_path, encoding='utf-8') as file:
+        before = json.load(file)
+    with open(after_path, encoding='utf-8') as file:
+        after = json.load(file)
+    if before['meta'].get('clinic') != after['meta'].get('clinic'):
+        print("Atenção: as execuções usaram clínicas de tamanhos diferentes.\n")
+
+    regressions = 0
+    print(f"{'benchmark':<70} {'antes':>10} {'depois':>10} {'variação':>9}")
+    for name, result in after['results'].items():
+        previous = before['results'].get(name)
+        if previous is None:
+            print(f"{name:<70} {'—':>10} {result['median_ms']:>10.3f}      novo")
+            continue
+        old, new = previous['median_ms'], result['median_ms']
+        change = (new - old) / old if old else 0.0
+        flag = ''
+        if abs(new - old) >= MIN_DIFFERENCE_MS:
+            if change > threshold:
+                flag = '  REGRESSÃO'
+                regressions += 1
+            elif change < -threshold:
+                flag = '  melhora'
+        print(f"{name:<70} {old:>10.3f} {new:>10.3f} {change:>+8.1%}{flag}")
+    print(f"\n{regressions} regressão(ões) acima de {threshold:.0%}.")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks do app de nutrição.")
+    parser.add_argument('--patients', type=int, default=1000, help="Pacientes na clínica sintética")
+    parser.add_argument('--consultations', type=int, default=8, help="Consultas por paciente")
+    parser.add_argument('--foods', type=int, default=0, help="Total de alimentos (completa a TACO com sintéticos)")
+    parser.add_argument('--repeat', type=int, default=20, help="Repetições de cada medição")
+    parser.add_argument('--only', help="Roda só os grupos cujo nome contém este texto")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help="Arquivo JSON de resultados")
+    parser.add_argument('--compare', nargs=2, metavar=('ANTES', 'DEPOIS'), help="Compara dois resultados")
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD, help="Variação tolerada")
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(1 if compare(*args.compare, args.threshold) else 0)
+    run(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,195 @@
+# benchmarks/stress_concurrent_sessions.py
+"""
+Teste de estresse de gravações concorrentes: várias sessões simuladas (threads, opcionalmente em
+vários processos, como o Streamlit e a API lado a lado) editam os mesmos pacientes ao mesmo tempo
+sobre um banco temporário.
+Cada sessão repete: lê um paciente de um pequeno grupo disputado, soma 1 ao contador guardado no
+histórico clínico e salva com a versão lida (update_patient com expected_version); em conflito,
+relê e tenta de novo. Entre as edições, registra consultas em pacientes quaisquer.
+No fim, a soma dos contadores tem de ser igual ao número de edições salvas: qualquer diferença é
+uma atualização perdida. Modos de gravação:
+    queue   pela fila de escrita (src/write_queue.py), com commits em lote
+    direct  uma transação por gravação, direto do pool de conexões
+Com --no-versions as edições salvam sem conferir a versão, para mostrar as atualizações perdidas.
+
+Uso (a partir da raiz do projeto):
+    python benchmarks/stress_concurrent_sessions.py [--sessions 32] [--processes 1] [--duration 10]
+                                                    [--mode queue|direct|both] [--hot-patients 10] [--no-versions]
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.clinic import build_clinic
+from src import db_utils, write_queue
+
+CONSULTATIONS_PER_EDIT = 2  # Consultas registradas por sessão a cada edição de cadastro
+MAX_RETRIES = 50  # Tentativas de uma edição antes de desistir (conta como falha)
+
+
+def _write(mode, function, *args, **kwargs):
+    if mode == 'queue':
+        return write_queue.call(function, *args, **kwargs)
+    return function(*args, **kwargs)
+
+
+def _session(mode, versions, hot_patients, n_patients, deadline, seed, totals, lock):
+    rng = random.Random(seed)
+    counts = {'edits': 0, 'conflicts': 0, 'gave_up': 0, 'consultations': 0, 'errors': 0}
+    latencies = []
+    while time.perf_counter() < deadline:
+        patient_id = rng.randint(1, hot_patients)
+        for _ in range(MAX_RETRIES):
+            patient = db_utils.get_patient_details(patient_id).iloc[0]
+            start = time.perf_counter()
+            try:
+                _write(
+                    mode, db_utils.update_patient, patient_id, patient['name'], patient['birth_date'], patient['sex'],
+                    patient['contact'], str(int(patient['medical_history']) + 1),
+                    expected_version=int(patient['version']) if versions else None
+                )
+            except db_utils.VersionConflictError:
+                counts['conflicts'] += 1
+                continue
+            except sqlite3.OperationalError:
+                counts['errors'] += 1  # Ex: "database is locked" depois do busy_timeout
+                continue
+            latencies.append((time.perf_counter() - start) * 1000)
+            counts['edits'] += 1
+            break
+        else:
+            counts['gave_up'] += 1
+
+        for _ in range(CONSULTATIONS_PER_EDIT):
+            start = time.perf_counter()
+            try:
+                _write(
+                    mode, db_utils.add_consultation, rng.randint(1, n_patients), '2030-01-01',
+                    weight_kg=round(rng.uniform(50, 110), 1)
+                )
+            except sqlite3.OperationalError:
+                counts['errors'] += 1
+                continue
+            latencies.append((time.perf_counter() - start) * 1000)
+            counts['consultations'] += 1
+
+    with lock:
+        for key, value in counts.items():
+            totals[key] = totals.get(key, 0) + value
+        totals.setdefault('latencies', []).extend(latencies)
+
+
+def run_sessions(database_file, mode, sessions, duration, versions, hot_patients, n_patients, seed=0):
+    """Roda as sessões (threads) neste processo e devolve as contagens e latências somadas."""
+    db_utils.DATABASE_FILE = database_file
+    db_utils.query_cache.clear()
+    totals, lock = {}, threading.Lock()
+    deadline = time.perf_counter() + duration
+    threads = [
+        threading.Thread(
+            target=_session,
+            args=(mode, versions, hot_patients, n_patients, deadline, seed * 1000 + number, totals, lock)
+        )
+        for number in range(sessions)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if mode == 'queue':
+        write_queue.stop()
+        totals['queue'] = write_queue.queue_stats()
+    db_utils.close_all_connections()
+    return totals
+
+
+def _run_sessions_star(arguments):
+    return run_sessions(*arguments)
+
+
+def _reset_counters(database_file, hot_patients):
+    with sqlite3.connect(database_file) as conn:
+        conn.execute("UPDATE patients SET medical_history = '0' WHERE id <= ?", (hot_patients,))
+
+
+def _counter_total(database_file, hot_patients):
+    with sqlite3.connect(database_file) as conn:
+        return conn.execute(
+            "SELECT SUM(CAST(medical_history AS INTEGER)) FROM patients WHERE id <= ?", (hot_patients,)
+        ).fetchone()[0]
+
+
+def run_mode(database_file, mode, args, n_patients):
+    _reset_counters(database_file, args.hot_patients)
+    per_process = max(args.sessions // args.processes, 1)
+    arguments = [
+        (database_file, mode, per_process, args.duration, not args.no_versions, args.hot_patients, n_patients, number)
+        for number in range(args.processes)
+    ]
+    start = time.perf_counter()
+    if args.processes == 1:
+        results = [run_sessions(*arguments[0])]
+    else:
+        with multiprocessing.get_context('spawn').Pool(args.processes) as pool:
+            results = pool.map(_run_sessions_star, arguments)
+    elapsed = time.perf_counter() - start
+
+    totals = {key: sum(result.get(key, 0) for result in results)
+              for key in ('edits', 'conflicts', 'gave_up', 'consultations', 'errors')}
+    latencies = sorted(latency for result in results for latency in result.get('latencies', []))
+    totals['writes_per_s'] = (totals['edits'] + totals['consultations']) / elapsed
+    totals['p50_ms'] = latencies[len(latencies) // 2] if latencies else 0.0
+    totals['p99_ms'] = latencies[min(int(len(latencies) * 0.99), len(latencies) - 1)] if latencies else 0.0
+    totals['lost_updates'] = totals['edits'] - _counter_total(database_file, args.hot_patients)
+    totals['mean_batch_size'] = (
+        sum(result['queue']['mean_batch_size'] for result in results) / len(results) if mode == 'queue' else None
+    )
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Estresse de gravações concorrentes (versões e fila de escrita).")
+    parser.add_argument('--patients', type=int, default=500, help="Pacientes na clínica sintética")
+    parser.add_argument('--hot-patients', type=int, default=10, help="Pacientes editados por todas as sessões")
+    parser.add_argument('--sessions', type=int, default=32, help="Sessões simultâneas (somando os processos)")
+    parser.add_argument('--processes', type=int, default=1, help="Processos (cada um com sua fila de escrita)")
+    parser.add_argument('--duration', type=float, default=10.0, help="Segundos por modo")
+    parser.add_argument('--mode', choices=('queue', 'direct', 'both'), default='both')
+    parser.add_argument('--no-versions', action='store_true', help="Salva sem conferir a versão (última gravação vence)")
+    args = parser.parse_args()
+
+    modes = ('queue', 'direct') if args.mode == 'both' else (args.mode,)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        database_file = os.path.join(tmp_dir, 'nutri.db')
+        print(f"Gerando clínica sintética ({args.patients} pacientes)...")
+        build_clinic(database_file, args.patients, 2)
+        db_utils.close_all_connections()
+
+        print(f"\n{args.sessions} sessões em {args.processes} processo(s), {args.duration:.0f} s por modo, "
+              f"{args.hot_patients} pacientes disputados, versões {'desligadas' if args.no_versions else 'ligadas'}.")
+        print(f"{'modo':<8} {'grav./s':>8} {'p50 ms':>7} {'p99 ms':>8} {'edições':>8} {'conflitos':>9} "
+              f"{'desist.':>7} {'erros':>6} {'perdidas':>8} {'lote médio':>10}")
+        failed = False
+        for mode in modes:
+            result = run_mode(database_file, mode, args, args.patients)
+            batch = '-' if result['mean_batch_size'] is None else f"{result['mean_batch_size']:.1f}"
+            print(f"{mode:<8} {result['writes_per_s']:>8.0f} {result['p50_ms']:>7.2f} {result['p99_ms']:>8.2f} "
+                  f"{result['edits']:>8} {result['conflicts']:>9} {result['gave_up']:>7} {result['errors']:>6} "
+                  f"{result['lost_updates']:>8} {batch:>10}")
+            failed |= bool(result['errors'] or (result['lost_updates'] and not args.no_versions))
+
+    if failed:
+        print("\nHouve erros de gravação ou atualizações perdidas com as versões ligadas.")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
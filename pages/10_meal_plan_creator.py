@@ -0,0 +1,305 @@
+import streamlit as st
+from src import db_utils
+from src import dri
+from src import energy
+from src import food_search
+from src import food_similarity
+from src import meal_plans
+from src import write_queue
+from src.lazy_imports import lazy_import
+from src.meal_plan_optimizer import MealPlanOptimizer, DEFAULT_PORTION_BOUNDS
+from src.nutrient_matrix import get_nutrient_matrix
+
+pd = lazy_import('pandas')  # Só é carregado ao exibir um plano otimizado
+
+# --- CONFIGURAÇÕES ---
+if 'plan_foods' not in st.session_state:
+    st.session_state.plan_foods = {}  # food_id -> descrição dos alimentos permitidos
+if 'plan_optimizer' not in st.session_state:
+    st.session_state.plan_optimizer = None  # Modelo mantido entre execuções (warm start)
+
+st.set_page_config(page_title="Plano Alimentar", page_icon="🥗", layout="wide")
+
+st.title("🥗 Criador de Plano Alimentar")
+
+# --- GRAVAÇÕES (fila de escrita) ---
+# Como na Gestão de Pacientes: a página não espera o commit; o resultado aparece na execução seguinte
+pending_writes = st.session_state.setdefault('pending_writes', [])
+for message, result, error in write_queue.take_finished(pending_writes):
+    if error is not None:
+        st.error(f"Não foi possível gravar: {error}")
+    else:
+        st.success(message(result) if callable(message) else message)
+if pending_writes:
+    st.info(f"{len(pending_writes)} gravação(ões) em andamento; atualize a página em instantes para ver os dados.")
+
+# --- METAS ---
+st.subheader("Metas diárias")
+col1, col2, col3, col4 = st.columns(4)
+target_kcal = col1.number_input("Meta calórica (kcal)", min_value=800, max_value=6000, value=2000, step=50)
+protein_percent = col2.number_input("Proteínas (%)", min_value=5, max_value=60, value=20)
+carbohydrate_percent = col3.number_input("Carboidratos (%)", min_value=5, max_value=80, value=50)
+lipid_percent = col4.number_input("Lipídios (%)", min_value=5, max_value=60, value=30)
+if protein_percent + carbohydrate_percent + lipid_percent != 100:
+    st.warning("A soma dos percentuais de macronutrientes deve ser 100%.")
+
+targets = {'energy_kcal': target_kcal}
+targets.update(energy.macro_targets(target_kcal, protein_percent, carbohydrate_percent, lipid_percent))
+
+st.subheader("Limites de micronutrientes")
+col1, col2, col3, col4 = st.columns(4)
+sodium_max = col1.number_input("Sódio máximo (mg)", min_value=0, value=2000, step=100)
+fiber_min = col2.number_input("Fibra mínima (g)", min_value=0, value=25)
+calcium_min = col3.number_input("Cálcio mínimo (mg)", min_value=0, value=1000, step=50)
+iron_min = col4.number_input("Ferro mínimo (mg)", min_value=0.0, value=8.0, step=0.5)
+nutrient_bounds = {
+    'sodium_mg': (None, sodium_max),
+    'dietary_fiber_g': (fiber_min, None),
+    'calcium_mg': (calcium_min, None),
+    'iron_mg': (iron_min, None),
+}
+max_portion = st.slider("Porção máxima por alimento (g)", min_value=50, max_value=600, value=int(DEFAULT_PORTION_BOUNDS[1]), step=10)
+
+# --- ALIMENTOS PERMITIDOS ---
+st.subheader("Alimentos permitidos")
+food_query = st.text_input("Buscar alimento na TACO", placeholder="Ex: arroz, frango, banana...")
+if food_query:
+    results = food_search.search_foods(food_query)
+    if results.empty:
+        st.info("Nenhum alimento encontrado.")
+    else:
+        options = dict(zip(results['food_id'], results['description']))
+        chosen = st.multiselect("Resultados", options=list(options), format_func=options.get)
+        if chosen and st.button("Adicionar ao plano"):
+            for food_id in chosen:
+                st.session_state.plan_foods[int(food_id)] = options[food_id]
+            st.rerun()
+
+if st.session_state.plan_foods:
+    removed = st.multiselect(
+        "Remover alimentos",
+        options=list(st.session_state.plan_foods),
+        format_func=st.session_state.plan_foods.get
+    )
+    if removed and st.button("Remover selecionados"):
+        optimizer = st.session_state.plan_optimizer
+        for food_id in removed:
+            st.session_state.plan_foods.pop(food_id, None)
+            if optimizer is not None:
+                optimizer.remove_food(food_id)
+        st.rerun()
+    st.write(", ".join(st.session_state.plan_foods.values()))
+else:
+    st.info("Adicione alimentos ao plano para poder otimizá-lo.")
+
+# --- OTIMIZAÇÃO ---
+if st.session_state.plan_foods and st.button("Otimizar plano", type="primary"):
+    food_ids = list(st.session_state.plan_foods)
+    optimizer = st.session_state.plan_optimizer
+    if optimizer is None:
+        optimizer = MealPlanOptimizer(
+            food_ids, targets, nutrient_bounds=nutrient_bounds,
+            portion_bounds={food_id: (0, max_portion) for food_id in food_ids},
+            matrix=get_nutrient_matrix()
+        )
+        st.session_state.plan_optimizer = optimizer
+    else:
+        # Só atualiza o modelo existente: o solver parte da solução anterior
+        optimizer.set_targets(targets)
+        for nutrient, (lower, upper) in nutrient_bounds.items():
+            optimizer.set_nutrient_bounds(nutrient, lower, upper)
+        for food_id in food_ids:
+            optimizer.set_portion_bounds(food_id, 0, max_portion)
+    st.session_state.plan_result = optimizer.solve()
+
+result = st.session_state.get('plan_result')
+if result is not None:
+    if not result['optimal']:
+        st.error(f"Não foi possível montar o plano ({result['status']}). Revise os limites ou acrescente alimentos.")
+    else:
+        st.caption(f"Resolvido em {result['solve_ms']:.1f} ms ({result['iterations']} iterações).")
+        grams = result['grams']
+        grams = grams[grams > 0].round(0)
+        plan = pd.DataFrame({
+            'Alimento': [st.session_state.plan_foods.get(food_id, food_id) for food_id in grams.index],
+            'Quantidade (g)': grams.values,
+        })
+        st.dataframe(plan, hide_index=True, use_container_width=True)
+
+        totals = result['totals']
+        summary = pd.DataFrame({
+            'Nutriente': list(targets),
+            'Meta': [round(value, 1) for value in targets.values()],
+            'Plano': [round(totals[nutrient], 1) for nutrient in targets],
+            'Diferença': [round(result['deviations'][nutrient], 1) for nutrient in targets],
+        })
+        st.dataframe(summary, hide_index=True, use_container_width=True)
+
+        limits = pd.DataFrame({
+            'Nutriente': list(nutrient_bounds),
+            'Mínimo': [lower for lower, _ in nutrient_bounds.values()],
+            'Máximo': [upper for _, upper in nutrient_bounds.values()],
+            'Plano': [round(totals[nutrient], 1) for nutrient in nutrient_bounds],
+        })
+        st.dataframe(limits, hide_index=True, use_container_width=True)
+
+# --- PLANO DE VÁRIOS DIAS ---
+st.divider()
+st.subheader("Plano de vários dias")
+SUMMARY_NUTRIENTS = list(meal_plans.SUMMARY_NUTRIENTS)
+
+# Busca + paginação no banco, como no diretório da Gestão de Pacientes (chaves próprias desta página)
+plan_search = st.text_input("Buscar paciente pelo nome", key="plan_patient_search", placeholder="Digite o começo do nome...")
+if st.session_state.get('plan_patient_search_last') != plan_search:
+    st.session_state.plan_patient_search_last = plan_search
+    st.session_state.plan_patient_page_cursors = [None]
+
+patient_rows, next_cursor = db_utils.search_patients(plan_search, after=st.session_state.plan_patient_page_cursors[-1])
+patient_options = {row_id: name for row_id, name, _ in patient_rows}
+patient_id = st.selectbox(
+    "Paciente", options=[None] + list(patient_options),
+    format_func=lambda option: "Selecione..." if option is None else patient_options[option]
+)
+col_prev, col_next = st.columns(2)
+if len(st.session_state.plan_patient_page_cursors) > 1 and col_prev.button("◀ Página anterior", key="plan_patient_prev"):
+    st.session_state.plan_patient_page_cursors.pop()
+    st.rerun()
+if next_cursor is not None and col_next.button("Próxima página ▶", key="plan_patient_next"):
+    st.session_state.plan_patient_page_cursors.append(next_cursor)
+    st.rerun()
+
+plan = st.session_state.get('meal_plan')
+# O plano aberto é do paciente selecionado: trocar de paciente (ou voltar para "Selecione...") fecha o plano
+if st.session_state.get('plan_patient_last') != patient_id:
+    st.session_state.plan_patient_last = patient_id
+    st.session_state.pop('meal_plan', None)
+    plan = None
+if patient_id is not None and plan is None:
+    saved_plans = meal_plans.list_meal_plans(patient_id)
+    col1, col2 = st.columns(2)
+    if not saved_plans.empty:
+        plan_options = dict(zip(saved_plans['id'], saved_plans['name']))
+        chosen_plan = col1.selectbox("Planos salvos", options=list(plan_options), format_func=plan_options.get)
+        if col1.button("Abrir plano"):
+            st.session_state.meal_plan = meal_plans.load_meal_plan(int(chosen_plan))
+            st.rerun()
+    new_name = col2.text_input("Nome do novo plano", value="Plano de 4 semanas")
+    new_days = col2.number_input("Dias", min_value=1, max_value=meal_plans.MAX_DAYS, value=28)
+    if col2.button("Criar plano"):
+        st.session_state.meal_plan = meal_plans.MealPlan(int(new_days), new_name, patient_id=patient_id)
+        st.rerun()
+
+if plan is not None:
+    col_title, col_close = st.columns([4, 1])
+    col_title.markdown(f"**{plan.name}** — {plan.n_days} dias, {plan.n_items()} itens")
+    if col_close.button("Fechar plano", help="Volta para a lista de planos; alterações não salvas são descartadas"):
+        st.session_state.pop('meal_plan', None)
+        st.rerun()
+    col1, col2 = st.columns(2)
+    day = col1.selectbox("Dia", options=range(plan.n_days), format_func=lambda option: f"Dia {option + 1}")
+    meal = col2.selectbox("Refeição", options=range(len(meal_plans.MEALS)), format_func=meal_plans.MEALS.__getitem__)
+
+    items = plan.items(day, meal)
+    descriptions = meal_plans.food_descriptions(items)
+    edited = st.data_editor(
+        pd.DataFrame({
+            'food_id': list(items),
+            'Alimento': [descriptions.get(food_id, food_id) for food_id in items],
+            'Quantidade (g)': list(items.values()),
+        }),
+        column_config={'food_id': None},
+        disabled=['Alimento'],
+        hide_index=True,
+        use_container_width=True,
+        key=f"meal_plan_editor_{day}_{meal}"
+    )
+    col1, col2, col3 = st.columns(3)
+    if col1.button("Aplicar alterações"):
+        plan.set_meal(day, meal, dict(zip(edited['food_id'], edited['Quantidade (g)'].fillna(0))))
+        st.rerun()
+    if result is not None and result['optimal'] and col2.button("Usar plano otimizado nesta refeição"):
+        grams = result['grams']
+        plan.set_meal(day, meal, grams[grams > 0].round(0).to_dict())
+        st.rerun()
+    copy_target = col3.selectbox(
+        "Copiar este dia para", options=[None] + [option for option in range(plan.n_days) if option != day],
+        format_func=lambda option: "..." if option is None else f"Dia {option + 1}"
+    )
+    if copy_target is not None and col3.button("Copiar dia"):
+        plan.copy_day(day, copy_target)
+        st.rerun()
+
+    meal_summary = pd.DataFrame(
+        [plan.meal_totals(day, position)[SUMMARY_NUTRIENTS] for position in range(len(meal_plans.MEALS))],
+        index=meal_plans.MEALS
+    )
+    meal_summary.loc['Total do dia'] = plan.day_totals(day)[SUMMARY_NUTRIENTS]
+    st.dataframe(meal_summary.round(1), use_container_width=True)
+
+    with st.expander("Totais de todos os dias"):
+        all_days = plan.day_totals()[SUMMARY_NUTRIENTS].round(1)
+        all_days.index = [f"Dia {position + 1}" for position in all_days.index]
+        st.dataframe(all_days, use_container_width=True)
+
+    with st.expander("Adequação às DRI (média dos dias preenchidos)"):
+        patient = db_utils.get_patient_details(plan.patient_id).iloc[0]
+        adequacy = dri.plan_adequacy(plan, patient['sex'], patient['birth_date'])
+        summary = adequacy.summary().iloc[0]
+        if pd.isna(summary['adequacy_score']):
+            st.info("Sem referência de DRI para este paciente (verifique sexo e data de nascimento).")
+        else:
+            col1, col2, col3 = st.columns(3)
+            col1.metric("Adequação", f"{summary['adequacy_score']:.0f}%")
+            col2.metric("Abaixo da meta", int(summary['nutrients_below']))
+            col3.metric("Acima do limite (UL)", int(summary['nutrients_above_ul']))
+            st.dataframe(
+                adequacy.detail().rename(columns={
+                    'intake': 'Ingestão', 'target': 'Meta (RDA/AI)', 'upper_limit': 'Limite (UL)',
+                    'adequacy_percent': '% da meta', 'upper_limit_percent': '% do UL',
+                }).round(1),
+                use_container_width=True
+            )
+
+    upserts, deletes = plan.pending_changes()
+    # Um salvamento por vez: um plano novo só tem id depois do commit do primeiro
+    saving = st.session_state.get('meal_plan_saving')
+    saving = saving is not None and not saving.done()
+    if st.button(
+        f"Salvar plano ({len(upserts) + len(deletes)} alterações)", type="primary", disabled=saving or not plan.has_changes()
+    ):
+        future = write_queue.submit(meal_plans.save_meal_plan, plan)
+        st.session_state.meal_plan_saving = future
+        pending_writes.append((lambda written: f"Plano salvo ({written} itens gravados).", future))
+        st.rerun()
+
+# --- SUBSTITUIÇÕES ---
+st.divider()
+st.subheader("Substituições de alimentos")
+swap_query = st.text_input("Alimento a substituir", placeholder="Ex: arroz integral cozido")
+if swap_query:
+    matches = food_search.search_foods(swap_query, limit=10)
+    if matches.empty:
+        st.info("Nenhum alimento encontrado.")
+    else:
+        match_options = dict(zip(matches['food_id'], matches['description']))
+        col1, col2, col3, col4 = st.columns(4)
+        swap_food = col1.selectbox("Alimento", options=list(match_options), format_func=match_options.get)
+        swap_grams = col2.number_input("Quantidade (g)", min_value=1, value=100, step=10)
+        swap_profile = col3.selectbox("Comparar por", options=list(food_similarity.WEIGHT_PRESETS))
+        swap_match = col4.selectbox(
+            "Equivalência", options=[None, *food_similarity.EQUIVALENCE_NUTRIENTS],
+            format_func=lambda option: "Mesma quantidade em gramas" if option is None else f"Mesma quantidade de {option}"
+        )
+        try:
+            substitutes = food_similarity.find_substitutes(
+                int(swap_food), grams=float(swap_grams), weights=swap_profile, match=swap_match
+            )
+        except ValueError as error:
+            st.warning(str(error))
+        else:
+            st.dataframe(
+                substitutes.drop(columns='food_id').rename(columns={
+                    'description': 'Alimento', 'grams': 'Quantidade (g)', 'distance': 'Distância'
+                }).round(2),
+                hide_index=True, use_container_width=True
+            )
@@ -0,0 +1,112 @@
+import streamlit as st
+from src import food_search
+from src import meal_plans
+from src import recipes
+from src import write_queue
+from src.lazy_imports import lazy_import
+from src.nutrient_matrix import get_nutrient_matrix
+
+pd = lazy_import('pandas')
+
+if 'recipe_ingredients' not in st.session_state:
+    st.session_state.recipe_ingredients = {}  # food_id -> gramas cruas
+if 'recipe_id' not in st.session_state:
+    st.session_state.recipe_id = None  # None = receita nova
+
+st.set_page_config(page_title="Receitas", page_icon="🍲", layout="wide")
+
+st.title("🍲 Receitas da clínica")
+st.caption(
+    "Receitas salvas viram alimentos: aparecem na busca e entram nos planos como um item só, "
+    "com os nutrientes por 100 g da preparação pronta."
+)
+
+# --- ESCOLHA DA RECEITA ---
+saved = recipes.list_recipes()
+options = dict(zip(saved['food_id'], saved['name']))
+col1, col2 = st.columns([3, 1])
+chosen = col1.selectbox(
+    "Receita", options=[None] + list(options),
+    format_func=lambda option: "Nova receita" if option is None else options[option]
+)
+if col2.button("Abrir") or chosen != st.session_state.recipe_id:
+    st.session_state.recipe_id = chosen
+    st.session_state.recipe_ingredients = {}
+    header = None
+    if chosen is not None:
+        header, ingredients = recipes.get_recipe(int(chosen))
+        st.session_state.recipe_ingredients = dict(zip(ingredients['food_id'], ingredients['grams']))
+    st.session_state.recipe_header = header or {'name': '', 'yield_factor': 1.0, 'notes': ''}
+
+header = st.session_state.get('recipe_header', {'name': '', 'yield_factor': 1.0, 'notes': ''})
+col1, col2 = st.columns([3, 1])
+name = col1.text_input("Nome", value=header['name'], placeholder="Ex: Marmita de frango com arroz integral")
+yield_factor = col2.number_input(
+    "Rendimento (peso pronto / peso cru)", min_value=0.05, max_value=10.0, value=float(header['yield_factor']), step=0.05
+)
+notes = st.text_area("Modo de preparo / observações", value=header.get('notes') or '')
+
+# --- INGREDIENTES ---
+st.subheader("Ingredientes")
+query = st.text_input("Buscar ingrediente", placeholder="Ex: arroz integral, feijão, frango...")
+if query:
+    results = food_search.search_foods(query)
+    results = results[results['food_id'] != st.session_state.recipe_id]
+    found = dict(zip(results['food_id'], results['description']))
+    to_add = st.multiselect("Resultados", options=list(found), format_func=found.get)
+    if to_add and st.button("Adicionar ingredientes"):
+        for food_id in to_add:
+            st.session_state.recipe_ingredients.setdefault(int(food_id), 100.0)
+        st.rerun()
+
+ingredients = st.session_state.recipe_ingredients
+descriptions = meal_plans.food_descriptions(ingredients)
+edited = st.data_editor(
+    pd.DataFrame({
+        'food_id': list(ingredients),
+        'Ingrediente': [descriptions.get(food_id, food_id) for food_id in ingredients],
+        'Quantidade crua (g)': list(ingredients.values()),
+    }),
+    column_config={'food_id': None},
+    disabled=['Ingrediente'],
+    hide_index=True,
+    use_container_width=True,
+    key=f"recipe_editor_{st.session_state.recipe_id}"
+)
+current = {
+    int(food_id): float(grams) for food_id, grams in zip(edited['food_id'], edited['Quantidade crua (g)'].fillna(0))
+    if grams > 0
+}
+
+# --- PRÉVIA ---
+if current:
+    matrix = get_nutrient_matrix()
+    vector = recipes.recipe_vector(matrix.values[matrix.rows_for(current)], list(current.values()), yield_factor)
+    raw_weight = sum(current.values())
+    st.markdown(f"Peso cru: **{raw_weight:.0f} g** — peso pronto: **{raw_weight * yield_factor:.0f} g**")
+    preview = pd.Series(vector, index=matrix.columns)[list(meal_plans.SUMMARY_NUTRIENTS)]
+    st.dataframe(preview.round(1).to_frame("Por 100 g (pronto)").T, use_container_width=True)
+
+col1, col2 = st.columns(2)
+if col1.button("Salvar receita", type="primary", disabled=not current):
+    try:
+        # Pela fila de escrita; call() espera o commit porque a página precisa do id da receita
+        recipe_id = write_queue.call(
+            recipes.save_recipe, name, current, yield_factor=yield_factor, notes=notes or None, recipe_id=st.session_state.recipe_id
+        )
+    except ValueError as error:
+        st.error(str(error))
+    else:
+        st.session_state.recipe_id = recipe_id
+        st.session_state.recipe_ingredients = current
+        st.session_state.recipe_header = {'name': name, 'yield_factor': yield_factor, 'notes': notes}
+        st.success(f"Receita salva (alimento {recipe_id}).")
+if st.session_state.recipe_id is not None and col2.button("Excluir receita"):
+    try:
+        write_queue.call(recipes.delete_recipe, st.session_state.recipe_id)
+    except ValueError as error:
+        st.error(str(error))
+    else:
+        st.session_state.recipe_id = None
+        st.session_state.recipe_ingredients = {}
+        st.rerun()
@@ -1,8 +1,16 @@
 import streamlit as st
-import pandas as pd
 from datetime import datetime
 from src import db_utils  # Importa nossas funções do banco de dados
 from src import calculations
+from src import analytics
+from src import body_composition  # Recalcula o %GC derivado em segundo plano
+from src import reports
+from src import write_queue  # Gravações passam pela thread escritora única
+from src.lazy_imports import lazy_import
+
+# pandas e plotly só são carregados quando um paciente com consultas é aberto
+pd = lazy_import('pandas')
+px = lazy_import('plotly.express')
 
 # --- CONFIGURAÇÕES ---
 if 'bf_result' not in st.session_state:
@@ -12,18 +20,57 @@ st.set_page_config(page_title="Gestão de Pacientes", page_icon="👥")
 
 st.title("👥 Gestão de Pacientes")
 
-# --- LÓGICA PARA BUSCAR A LISTA DE PACIENTES ---
-patient_list = db_utils.get_patient_list()
-# Cria um dicionário para mapear nome para id, e vice-versa
-patient_map = {patient['name']: patient['id'] for _, patient in patient_list.iterrows()}
-patient_names = ["Cadastrar Novo Paciente"] + list(patient_map.keys())
+# --- GRAVAÇÕES (fila de escrita) ---
+# As gravações são enviadas com write_queue.submit() e a página não espera o commit; o resultado
+# de cada uma aparece aqui na execução seguinte. A lista de pendências é da sessão (todas as páginas).
+pending_writes = st.session_state.setdefault('pending_writes', [])
+
+
+def submit_write(message, function, *args, **kwargs):
+    """Envia a gravação para a fila; message (texto, ou função que recebe o resultado) é mostrada no fim."""
+    pending_writes.append((message, write_queue.submit(function, *args, **kwargs)))
+
+
+for message, result, error in write_queue.take_finished(pending_writes):
+    if error is not None:
+        st.error(f"Não foi possível gravar: {error}")
+    else:
+        st.success(message(result) if callable(message) else message)
+if pending_writes:
+    st.info(f"{len(pending_writes)} gravação(ões) em andamento; atualize a página em instantes para ver os dados.")
+
+# --- DIRETÓRIO DE PACIENTES (busca + paginação no banco) ---
+search_query = st.text_input("Buscar paciente pelo nome", key="patient_search", placeholder="Digite o começo do nome...")
+# Pilha de cursores das páginas já visitadas; volta para a primeira página quando a busca muda
+if st.session_state.get('patient_search_last') != search_query:
+    st.session_state.patient_search_last = search_query
+    st.session_state.patient_page_cursors = [None]
+
+patient_rows, next_cursor = db_utils.search_patients(search_query, after=st.session_state.patient_page_cursors[-1])
+# Rótulos por id: pacientes homônimos continuam distinguíveis
+patient_labels = {
+    patient_id: f"{name} — última consulta: {last_date or 'nenhuma'}"
+    for patient_id, name, last_date in patient_rows
+}
 
 # --- MENU DE SELEÇÃO ---
-selected_patient_name = st.selectbox("Selecione um Paciente ou Cadastre um Novo", options=patient_names)
+selected_patient_id = st.selectbox(
+    "Selecione um Paciente ou Cadastre um Novo",
+    options=[None] + list(patient_labels),
+    format_func=lambda option: "Cadastrar Novo Paciente" if option is None else patient_labels[option]
+)
+
+col_prev, col_next = st.columns(2)
+if len(st.session_state.patient_page_cursors) > 1 and col_prev.button("◀ Página anterior"):
+    st.session_state.patient_page_cursors.pop()
+    st.rerun()
+if next_cursor is not None and col_next.button("Próxima página ▶"):
+    st.session_state.patient_page_cursors.append(next_cursor)
+    st.rerun()
 
 # --- LÓGICA DE EXIBIÇÃO ---
 
-if selected_patient_name == "Cadastrar Novo Paciente":
+if selected_patient_id is None:
     st.subheader("Formulário de Cadastro")
     with st.form("new_patient_form", clear_on_submit=True):
         name = st.text_input("Nome Completo", key="new_name")
@@ -35,15 +82,31 @@ if selected_patient_name == "Cadastrar Novo Paciente":
         submitted = st.form_submit_button("Salvar Paciente")
         if submitted:
             if name:  # Validação simples para garantir que o nome não está vazio
-                db_utils.add_patient(name, birth_date.strftime("%Y-%m-%d"), sex.lower(), contact, medical_history)
-                st.success(f"Paciente '{name}' cadastrado com sucesso!")
+                submit_write(
+                    f"Paciente '{name}' cadastrado com sucesso!",
+                    db_utils.add_patient, name, birth_date.strftime("%Y-%m-%d"), sex.lower(), contact, medical_history
+                )
                 st.rerun() # Recarrega a página para atualizar a lista
             else:
                 st.error("O nome do paciente é obrigatório.")
 
+    # Pacientes excluídos no modo arquivo podem voltar com todo o histórico
+    archived = db_utils.get_archived_patients()
+    if not archived.empty:
+        with st.expander(f"🗄️ Pacientes arquivados ({len(archived)})"):
+            archived_labels = {
+                row.patient_id: f"{row.name} — excluído em {row.archived_at[:16]}" for row in archived.itertuples()
+            }
+            to_restore = st.selectbox("Paciente", options=list(archived_labels), format_func=archived_labels.get)
+            if st.button("Restaurar paciente"):
+                submit_write("Paciente restaurado com consultas e planos alimentares.", db_utils.restore_patient, int(to_restore))
+                st.rerun()
+
 else: # Se um paciente existente foi selecionado
-    patient_id = patient_map[selected_patient_name]
+    patient_id = selected_patient_id
     patient_details = db_utils.get_patient_details(patient_id).iloc[0] # Pega a primeira (e única) linha do DataFrame
+    # Versão do cadastro mostrada no formulário na execução anterior: é ela que o salvamento confere
+    form_versions = st.session_state.setdefault('patient_form_versions', {})
 
     # Formulário de Edição de Dados Cadastrais
     with st.expander("📝 Editar Dados Cadastrais", expanded=False):
@@ -63,20 +126,29 @@ else: # Se um paciente existente foi selecionado
                     delete_button = st.form_submit_button("❌ Excluir Paciente")
 
                 if update_button:
-                    db_utils.update_patient(patient_id, name, birth_date.strftime("%Y-%m-%d"), sex.lower(), contact, medical_history)
-                    st.success(f"Informações de '{name}' atualizadas com sucesso!")
+                    # Em conflito de versão, o erro aparece na próxima execução, com os dados atuais no formulário
+                    submit_write(
+                        f"Informações de '{name}' atualizadas com sucesso!",
+                        db_utils.update_patient, patient_id, name, birth_date.strftime("%Y-%m-%d"), sex.lower(),
+                        contact, medical_history,
+                        expected_version=form_versions.get(patient_id, int(patient_details['version']))
+                    )
                     st.rerun()
 
                 if delete_button:
                     st.session_state.confirm_delete_patient = True # Usando chave específica
+    form_versions[patient_id] = int(patient_details['version'])
     
     # --- NOVO: Lógica de confirmação da exclusão do PACIENTE ---
     if st.session_state.get('confirm_delete_patient'):
-        st.warning(f"**Atenção:** Você tem certeza que deseja excluir **{selected_patient_name}** e todas as suas consultas? Esta ação não pode ser desfeita.")
+        st.warning(f"**Atenção:** Você tem certeza que deseja excluir **{patient_details['name']}**, todas as suas consultas e planos alimentares?")
+        archive_patient = st.checkbox("Guardar no arquivo (o paciente poderá ser restaurado depois)", value=True)
         col1_conf, col2_conf = st.columns(2)
         if col1_conf.button("Sim, excluir PACIENTE", type="primary"):
-            db_utils.delete_patient(patient_id) # Futuramente, expandir para deletar consultas em cascata
-            st.success(f"Paciente '{selected_patient_name}' foi excluído.")
+            # Consultas e planos saem em cascata
+            submit_write(
+                f"Paciente '{patient_details['name']}' foi excluído.", db_utils.delete_patient, patient_id, archive=archive_patient
+            )
             del st.session_state.confirm_delete_patient
             st.rerun()
         if col2_conf.button("Não, cancelar exclusão"):
@@ -116,11 +188,11 @@ else: # Se um paciente existente foi selecionado
             st.subheader("Circunferências (cm)")
             c1, c2, c3 = st.columns(3)
             circuns = {
-                'circ_arm': c1.number_input("Circ. Braço", min_value=0.0, format="%.1f"),
-                'circ_waist': c2.number_input("Circ. Cintura", min_value=0.0, format="%.1f"),
-                'circ_abdominal': c3.number_input("Circ. Abdominal", min_value=0.0, format="%.1f"),
-                'circ_hip': c1.number_input("Circ. Quadril", min_value=0.0, format="%.1f"),
-                'circ_thigh': c2.number_input("Circ. Coxa", min_value=0.0, format="%.1f"),
+                'arm': c1.number_input("Circ. Braço", min_value=0.0, format="%.1f"),
+                'waist': c2.number_input("Circ. Cintura", min_value=0.0, format="%.1f"),
+                'abdominal': c3.number_input("Circ. Abdominal", min_value=0.0, format="%.1f"),
+                'hip': c1.number_input("Circ. Quadril", min_value=0.0, format="%.1f"),
+                'thigh': c2.number_input("Circ. Coxa", min_value=0.0, format="%.1f"),
             }
 
             # Seleção de protocolo e cálculo
@@ -158,7 +230,6 @@ else: # Se um paciente existente foi selecionado
                     'midaxillary': st.session_state.sk_midaxillary, 'suprailiac': st.session_state.sk_suprailiac,
                     'abdominal': st.session_state.sk_abdominal, 'thigh': st.session_state.sk_thigh
                 }
-                print(skinfolds_values)
             
                 # Executa o cálculo
                 if protocol != 'Nenhum':
@@ -168,7 +239,6 @@ else: # Se um paciente existente foi selecionado
                         patient_details['sex'],
                         skinfolds_values
                     )
-                    print(result)
                     # Armazena o resultado
                     st.session_state.bf_result = round(result, 2) if result is not None else 0.0
                 calculate_button = None # Reseta o estado do botão de cálculo
@@ -183,8 +253,13 @@ else: # Se um paciente existente foi selecionado
 
         
             if save_button:
-                db_utils.add_consultation(patient_id, consultation_date.strftime("%Y-%m-%d"), weight_kg, height_cm, body_fat_percentage, notes)
-                st.success("Nova consulta registrada com sucesso!")
+                # Guarda todas as medidas; com um protocolo, o %GC passa a ser recalculado automaticamente
+                submit_write(
+                    "Nova consulta registrada com sucesso!",
+                    db_utils.add_consultation, patient_id, consultation_date.strftime("%Y-%m-%d"), weight_kg, height_cm, body_fat_percentage or None, notes,
+                    skinfolds=skinfolds, circumferences=circuns,
+                    body_fat_protocol=None if protocol == 'Nenhum' else protocol
+                )
                 st.rerun()
 
     # Histórico de consultas
@@ -194,16 +269,59 @@ else: # Se um paciente existente foi selecionado
     if consultations.empty:
         st.info("Nenhuma consulta registrada para este paciente ainda.")
     else:
-        df_display = consultations[['consultation_date', 'weight_kg', 'height_cm', 'body_fat_percentage', 'notes']].copy()
+        df_display = consultations[['consultation_date', 'weight_kg', 'height_cm', 'body_fat_percentage', 'body_fat_protocol', 'notes']].copy()
         df_display.rename(columns={
             'consultation_date': 'Data',
             'weight_kg': 'Peso (kg)',
             'height_cm': 'Altura (cm)',
             'body_fat_percentage': '% Gordura',
+            'body_fat_protocol': 'Protocolo',
             'notes': 'Anotações'
         }, inplace=True)
         
         st.dataframe(df_display, use_container_width=True, hide_index=True)
+
+        # Reanálise: as dobras ficam guardadas, então basta trocar o protocolo das consultas
+        with st.expander("🔁 Recalcular % de gordura com outro protocolo"):
+            new_protocol = st.selectbox(
+                "Protocolo para todas as consultas",
+                ['Pollock 7 dobras', 'Pollock 3 dobras', 'Durnin & Womersley 4 dobras'],
+                key="recalculate_protocol"
+            )
+            if st.button("Recalcular"):
+                submit_write(
+                    lambda changed: f"{changed} consulta(s) com as dobras do protocolo estão sendo recalculadas em segundo plano; "
+                                    "atualize a página em instantes. As demais mantêm o % de gordura registrado.",
+                    db_utils.set_body_fat_protocol, patient_id, new_protocol
+                )
+                st.rerun()
+
+        # --- Gráficos de evolução (séries calculadas e mantidas em cache por src/analytics.py) ---
+        progress = analytics.get_patient_progress(patient_id)
+        if len(progress) > 1:
+            st.subheader("Evolução")
+            chart_options = {
+                'Peso (kg)': ['weight_kg'],
+                'IMC': ['bmi'],
+                '% Gordura': ['body_fat_percentage'],
+                'Massa gorda x massa magra (kg)': ['fat_mass_kg', 'lean_mass_kg'],
+                'Relação cintura-quadril': ['waist_hip_ratio'],
+            }
+            chart_tabs = st.tabs(list(chart_options))
+            for tab, (title, columns) in zip(chart_tabs, chart_options.items()):
+                series = progress[['consultation_date'] + columns].dropna(how='all', subset=columns)
+                if series.empty:
+                    tab.info("Sem medidas suficientes para este gráfico.")
+                    continue
+                fig = px.line(series, x='consultation_date', y=columns, markers=True, labels={'consultation_date': 'Data', 'value': title, 'variable': ''})
+                tab.plotly_chart(fig, use_container_width=True)
+
+            latest = progress.iloc[-1]
+            if pd.notna(latest['weight_kg_per_week']):
+                st.caption(
+                    f"Variação de peso desde a consulta anterior: {latest['weight_kg_per_week']:+.2f} kg/semana "
+                    f"(total desde a primeira consulta: {latest['weight_change_kg']:+.1f} kg)."
+                )
         
         # --- NOVO: Opção para deletar uma consulta específica ---
         consultation_to_delete = st.selectbox(
@@ -218,6 +336,25 @@ else: # Se um paciente existente foi selecionado
             consultation_id_to_delete = int(consultations.loc[selected_index, 'id'])
 
             if st.button("Excluir consulta selecionada", type="primary"):
-                db_utils.delete_consultation(consultation_id_to_delete)
-                st.success("Consulta excluída com sucesso.")
-                st.rerun()
\ No newline at end of file
+                submit_write("Consulta excluída com sucesso.", db_utils.delete_consultation, consultation_id_to_delete)
+                st.rerun()
+    # --- Relatório em PDF (gerado em segundo plano e guardado em disco por src/reports.py) ---
+    with st.expander("📄 Relatório de evolução em PDF"):
+        if st.session_state.get('report_patient_id') == patient_id or st.button("Gerar relatório"):
+            st.session_state.report_patient_id = patient_id
+            try:
+                report_status, report_file = reports.request_report(patient_id)
+            except ImportError as error:
+                st.error(str(error))
+            else:
+                if report_status == 'ready':
+                    with open(report_file, 'rb') as file:
+                        st.download_button(
+                            "Baixar relatório", data=file.read(),
+                            file_name=f"relatorio_{patient_details['name']}.pdf", mime="application/pdf"
+                        )
+                elif report_status == 'pending':
+                    st.info("O relatório está sendo gerado; você pode continuar usando o app.")
+                    st.button("Verificar novamente")
+                else:
+                    st.error("Não foi possível gerar o relatório. Tente novamente.")
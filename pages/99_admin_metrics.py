@@ -0,0 +1,79 @@
+import streamlit as st
+from src import crypto
+from src import db_utils
+from src import instrumentation
+from src import write_queue
+from src.lazy_imports import lazy_import
+
+pd = lazy_import('pandas')  # Só é carregado quando há métricas para exibir
+
+st.set_page_config(page_title="Métricas", page_icon="📊", layout="wide")
+
+st.title("📊 Métricas de desempenho")
+st.caption(
+    "Chamadas ao banco, cálculos de %GC e comandos SQL medidos neste processo do Streamlit. "
+    f"Para ligar já na inicialização, defina {instrumentation.ENABLED_ENV}=1."
+)
+
+# --- LIGAR / DESLIGAR ---
+col1, col2, col3 = st.columns(3)
+if instrumentation.is_enabled():
+    col1.success("Instrumentação ligada")
+    if col1.button("Desligar"):
+        instrumentation.disable()
+        st.rerun()
+else:
+    col1.info("Instrumentação desligada")
+    if col1.button("Ligar"):
+        instrumentation.enable()
+        st.rerun()
+
+threshold = col2.number_input(
+    "Consulta lenta a partir de (ms)", min_value=0.0, value=float(instrumentation.slow_query_ms), step=10.0
+)
+if threshold != instrumentation.slow_query_ms:
+    instrumentation.slow_query_ms = threshold
+
+if col3.button("Zerar métricas"):
+    instrumentation.reset()
+    st.rerun()
+
+# --- MÉTRICAS ---
+metrics = instrumentation.snapshot()
+if not metrics:
+    st.info("Nenhuma métrica registrada ainda. Ligue a instrumentação e use as outras páginas.")
+else:
+    table = pd.DataFrame(metrics).rename(columns={
+        'kind': 'Tipo', 'name': 'Nome', 'count': 'Chamadas', 'errors': 'Erros', 'rows': 'Linhas',
+        'total_ms': 'Total (ms)', 'mean_ms': 'Média (ms)', 'p95_ms': 'p95 (ms)', 'max_ms': 'Máximo (ms)',
+    })
+    st.subheader("Funções")
+    st.dataframe(table[table['Tipo'] == 'function'].drop(columns='Tipo').round(3), hide_index=True, use_container_width=True)
+    st.subheader("SQL por tipo de comando")
+    st.dataframe(table[table['Tipo'] == 'sql'].drop(columns='Tipo').round(3), hide_index=True, use_container_width=True)
+
+stats = db_utils.cache_stats()
+st.caption(f"Cache de leituras: {stats}")
+st.caption(f"Fila de gravações: {write_queue.queue_stats()}")
+if crypto.is_enabled():
+    st.caption(f"Cache de decifragem (dados dos pacientes): {crypto.cache_stats()}")
+
+st.download_button(
+    "Baixar métricas (formato Prometheus)",
+    data=instrumentation.prometheus_text(),
+    file_name="nutri_metrics.prom",
+    mime="text/plain"
+)
+
+# --- CONSULTAS LENTAS ---
+st.subheader("Consultas lentas")
+slow_queries = instrumentation.slow_queries()
+if not slow_queries:
+    st.write(f"Nenhuma consulta acima de {instrumentation.slow_query_ms:.0f} ms.")
+for entry in slow_queries:
+    with st.expander(f"{entry['duration_ms']:.1f} ms — {entry['sql'][:100]}"):
+        st.caption(entry['timestamp'])
+        st.code(entry['sql'], language='sql')
+        if entry['plan']:
+            st.markdown("**Plano de execução**")
+            st.code('\n'.join(entry['plan']))
@@ -0,0 +1,72 @@
+# scripts/bulk_transfer.py
+"""
+Importa ou exporta pacientes e consultas em massa (CSV ou Parquet, lidos/escritos em blocos).
+
+Uso (a partir da raiz do projeto):
+    python scripts/bulk_transfer.py import --patients pacientes.csv --consultations consultas.csv \
+        [--body-fat-protocol "Pollock 7 dobras"] [--chunk-size 5000]
+    python scripts/bulk_transfer.py export patients pacientes.parquet
+    python scripts/bulk_transfer.py export consultations consultas.csv
+"""
+
+import argparse
+import os
+import sys
+
+# Permite importar o pacote src ao rodar o script a partir da raiz do projeto
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src import bulk_io, db_utils
+
+
+def _print_import_report(title, report):
+    print(f"{title}: {report['rows_imported']} de {report['rows_read']} linhas importadas "
+          f"em {report['seconds']:.2f} s ({report['rows_per_second']:.0f} linhas/s).")
+    if report['rows_rejected']:
+        print(f"  {report['rows_rejected']} linhas rejeitadas. Primeiros motivos:")
+        for error in report['errors']:
+            print(f"    - {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Importação/exportação em massa de pacientes e consultas.")
+    parser.add_argument('--database', default=db_utils.DATABASE_FILE, help="Arquivo do banco SQLite")
+    parser.add_argument('--chunk-size', type=int, default=bulk_io.DEFAULT_CHUNK_SIZE, help="Linhas por bloco")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    import_parser = commands.add_parser('import', help="Importa pacientes e/ou consultas")
+    import_parser.add_argument('--patients', help="Arquivo de pacientes (.csv/.parquet)")
+    import_parser.add_argument('--consultations', help="Arquivo de consultas (.csv/.parquet)")
+    import_parser.add_argument('--body-fat-protocol', help="Calcula o %%GC ausente com este protocolo")
+
+    export_parser = commands.add_parser('export', help="Exporta uma tabela")
+    export_parser.add_argument('table', choices=bulk_io.EXPORT_TABLES)
+    export_parser.add_argument('path', help="Arquivo de saída (.csv/.parquet)")
+
+    args = parser.parse_args()
+    db_utils.DATABASE_FILE = args.database
+
+    try:
+        if args.command == 'import':
+            if not args.patients and not args.consultations:
+                parser.error("informe --patients e/ou --consultations")
+            patient_ids = None
+            if args.patients:
+                report, patient_ids = bulk_io.import_patients(args.patients, args.chunk_size)
+                _print_import_report("Pacientes", report)
+                # Sem a coluna 'id' no arquivo de pacientes, as consultas usam os ids do banco
+                patient_ids = patient_ids or None
+            if args.consultations:
+                report = bulk_io.import_consultations(
+                    args.consultations, patient_ids, args.body_fat_protocol, args.chunk_size
+                )
+                _print_import_report("Consultas", report)
+        else:
+            report = bulk_io.export_table(args.table, args.path, args.chunk_size)
+            print(f"{report['rows']} linhas exportadas para '{report['file']}' "
+                  f"em {report['seconds']:.2f} s ({report['rows_per_second']:.0f} linhas/s).")
+    finally:
+        db_utils.close_all_connections()
+
+
+if __name__ == '__main__':
+    main()
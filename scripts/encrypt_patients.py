@@ -0,0 +1,126 @@
+# scripts/encrypt_patients.py
+"""
+Cifra os dados sensíveis dos pacientes já gravados em texto puro (nome, contato e histórico,
+inclusive no arquivo de pacientes excluídos) e monta o índice cego usado na busca por nome.
+Depois apaga name_search, faz o checkpoint do WAL e compacta o banco (VACUUM), para que o texto
+puro não fique para trás em páginas livres, e apaga os relatórios em PDF guardados em disco (que
+trazem nome e contato; são gerados de novo quando pedidos). Pode ser rodado de novo: o que já está
+cifrado fica como está.
+
+A chave vem de NUTRI_ENCRYPTION_KEY ou do arquivo de chave (NUTRI_KEY_FILE, padrão database/nutri.key).
+Guarde uma cópia da chave fora do servidor: sem ela, os dados cifrados não podem ser lidos.
+
+Uso (a partir da raiz do projeto, de preferência com o app parado):
+    python scripts/encrypt_patients.py [--generate-key] [--database database/nutri.db]
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+
+# Permite importar o pacote src ao rodar o script a partir da raiz do projeto
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src import crypto, db_utils, migrations, reports
+
+
+def _seal(patient):
+    """Cifra, no lugar, os campos sensíveis de um dicionário de paciente; devolve se algo mudou."""
+    changed = False
+    for column in db_utils.ENCRYPTED_PATIENT_COLUMNS:
+        value = patient.get(column)
+        if value is not None and not crypto.is_encrypted(value, column):
+            patient[column] = crypto.encrypt(value, column)
+            changed = True
+    if patient.get('name_search') is not None:
+        patient['name_search'] = None
+        changed = True
+    return changed
+
+
+def encrypt_database(database_file, vacuum=True, purge_reports=True):
+    """
+    Cifra os pacientes e o arquivo de excluídos; devolve um relatório com as contagens.
+    purge_reports=False mantém os PDFs em disco (ex: benchmarks sobre um banco temporário).
+    """
+    if not crypto.is_enabled():
+        raise RuntimeError(f"Nenhuma chave configurada ({crypto.KEY_ENV} ou {crypto.KEY_FILE_ENV}); use --generate-key.")
+    report = {'patients': 0, 'archived': 0}
+    # Conexão própria: VACUUM não pode rodar dentro de transação nem com o pool segurando o arquivo
+    db_utils.close_all_connections()
+    conn = sqlite3.connect(database_file, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    try:
+        conn.execute("PRAGMA foreign_keys = ON")
+        migrations.migrate(conn)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for row in conn.execute("SELECT * FROM patients").fetchall():
+                patient = dict(row)
+                name = crypto.decrypt(patient['name'], 'name')
+                if _seal(patient):
+                    conn.execute(
+                        "UPDATE patients SET name = ?, name_search = NULL, contact = ?, medical_history = ? WHERE id = ?",
+                        (patient['name'], patient['contact'], patient['medical_history'], patient['id'])
+                    )
+                    report['patients'] += 1
+                db_utils.index_patient_name(conn, patient['id'], name)
+            for row in conn.execute("SELECT patient_id, data FROM patients_archive").fetchall():
+                data = json.loads(row['data'])
+                if _seal(data['patient']):
+                    conn.execute(
+                        "UPDATE patients_archive SET name = ?, data = ? WHERE patient_id = ?",
+                        (data['patient']['name'], json.dumps(data, ensure_ascii=False), row['patient_id'])
+                    )
+                    report['archived'] += 1
+            db_utils.mark_data_changed(conn)  # O app e a API, se abertos, descartam o que têm em cache
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+
+        start = time.perf_counter()
+        if vacuum:
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            conn.execute("VACUUM")
+        report['seconds'] = time.perf_counter() - start
+    finally:
+        conn.close()
+    db_utils.query_cache.clear()
+    report['reports_removed'] = reports.remove_reports() if purge_reports else 0
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cifra os dados sensíveis dos pacientes no banco.")
+    parser.add_argument('--database', default=db_utils.DATABASE_FILE, help="Arquivo do banco SQLite")
+    parser.add_argument('--generate-key', action='store_true',
+                        help=f"Cria o arquivo de chave ({crypto.DEFAULT_KEY_FILE} ou {crypto.KEY_FILE_ENV}) antes de cifrar")
+    parser.add_argument('--no-vacuum', action='store_true', help="Não compacta o arquivo (o texto puro antigo pode ficar em páginas livres)")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.database):
+        print(f"ERRO: Banco '{args.database}' não encontrado.")
+        sys.exit(1)
+    if args.generate_key:
+        try:
+            print(f"Chave criada em {crypto.generate_key_file()}. Guarde uma cópia em local seguro.")
+        except FileExistsError as error:
+            print(f"ERRO: O arquivo de chave '{error.filename}' já existe; ele não será sobrescrito.")
+            sys.exit(1)
+
+    try:
+        report = encrypt_database(args.database, vacuum=not args.no_vacuum)
+    except RuntimeError as error:
+        print(f"ERRO: {error}")
+        sys.exit(1)
+    print(f"Pacientes cifrados: {report['patients']}; pacientes arquivados cifrados: {report['archived']}.")
+    print(f"Relatórios em PDF apagados do disco: {report['reports_removed']}.")
+    if not args.no_vacuum:
+        print(f"Checkpoint e VACUUM concluídos em {report['seconds']:.2f} s.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+# scripts/maintenance.py
+"""
+Manutenção do banco: encontra e remove linhas órfãs (consultas e planos de pacientes que não
+existem mais, itens de planos excluídos), compacta o arquivo (VACUUM) e atualiza as estatísticas
+do planejador de consultas (ANALYZE). Ao final, mostra quanto espaço foi recuperado.
+
+Uso (a partir da raiz do projeto, de preferência com o app parado):
+    python scripts/maintenance.py [--dry-run] [--no-vacuum]
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import time
+
+# Permite importar o pacote src ao rodar o script a partir da raiz do projeto
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src import db_utils
+
+# (tabela filha, coluna, tabela pai, coluna do pai) — na ordem de remoção: os planos órfãos
+# saem antes dos itens, e os itens deles caem em cascata
+ORPHAN_CHECKS = (
+    ('consultations', 'patient_id', 'patients', 'id'),
+    ('meal_plans', 'patient_id', 'patients', 'id'),
+    ('meal_plan_items', 'plan_id', 'meal_plans', 'id'),
+)
+
+
+def _orphan_condition(child, column, parent, parent_column):
+    return (
+        f"{child}.{column} IS NOT NULL AND NOT EXISTS "
+        f"(SELECT 1 FROM {parent} WHERE {parent}.{parent_column} = {child}.{column})"
+    )
+
+
+def _database_bytes(path):
+    """Tamanho do banco em disco, somando o WAL."""
+    return sum(os.path.getsize(file) for file in (path, f"{path}-wal") if os.path.exists(file))
+
+
+def find_orphans(conn):
+    """Número de linhas órfãs por tabela."""
+    return {
+        child: conn.execute(
+            f"SELECT COUNT(*) FROM {child} WHERE {_orphan_condition(child, column, parent, parent_column)}"
+        ).fetchone()[0]
+        for child, column, parent, parent_column in ORPHAN_CHECKS
+    }
+
+
+def delete_orphans(conn):
+    """Remove as linhas órfãs (em uma transação) e devolve quantas saíram de cada tabela."""
+    deleted = {}
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for child, column, parent, parent_column in ORPHAN_CHECKS:
+            cursor = conn.execute(f"DELETE FROM {child} WHERE {_orphan_condition(child, column, parent, parent_column)}")
+            deleted[child] = cursor.rowcount
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
+    return deleted
+
+
+def run_maintenance(database_file, dry_run=False, vacuum=True):
+    """Executa a manutenção e devolve um relatório (dicionário) com o que foi feito."""
+    report = {'bytes_before': _database_bytes(database_file)}
+    # Conexão própria: VACUUM não pode rodar dentro de transação nem com o pool segurando o arquivo
+    db_utils.close_all_connections()
+    conn = sqlite3.connect(database_file, isolation_level=None)
+    try:
+        conn.execute("PRAGMA foreign_keys = ON")
+        report['free_pages_before'] = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        report['orphans'] = find_orphans(conn)
+        if dry_run:
+            return report
+
+        report['deleted'] = delete_orphans(conn)
+        start = time.perf_counter()
+        if vacuum:
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            conn.execute("VACUUM")
+        conn.execute("ANALYZE")
+        report['seconds'] = time.perf_counter() - start
+        report['free_pages_after'] = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    finally:
+        conn.close()
+    report['bytes_after'] = _database_bytes(database_file)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Remove linhas órfãs e compacta o banco de dados.")
+    parser.add_argument('--database', default=db_utils.DATABASE_FILE, help="Arquivo do banco SQLite")
+    parser.add_argument('--dry-run', action='store_true', help="Só conta as linhas órfãs, sem alterar nada")
+    parser.add_argument('--no-vacuum', action='store_true', help="Não compacta o arquivo (só ANALYZE)")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.database):
+        print(f"ERRO: Banco '{args.database}' não encontrado.")
+        sys.exit(1)
+
+    report = run_maintenance(args.database, dry_run=args.dry_run, vacuum=not args.no_vacuum)
+    print("Linhas órfãs encontradas:")
+    for table, count in report['orphans'].items():
+        print(f"    {table:<18} {count}")
+    if args.dry_run:
+        print(f"Páginas livres no arquivo: {report['free_pages_before']}. Nada foi alterado (--dry-run).")
+        return
+
+    print(f"Linhas órfãs removidas: {sum(report['deleted'].values())}.")
+    reclaimed = report['bytes_before'] - report['bytes_after']
+    print(f"Tamanho do banco: {report['bytes_before'] / 1024:.0f} KiB -> {report['bytes_after'] / 1024:.0f} KiB "
+          f"({reclaimed / 1024:.0f} KiB recuperados; páginas livres: {report['free_pages_before']} -> "
+          f"{report['free_pages_after']}).")
+    print(f"{'ANALYZE concluído' if args.no_vacuum else 'VACUUM e ANALYZE concluídos'} em {report['seconds']:.2f} s.")
+
+
+if __name__ == '__main__':
+    main()
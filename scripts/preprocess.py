@@ -1,10 +1,15 @@
-import pandas as pd
 import os
+import sys
+
+# Permite importar o pacote src ao rodar o script a partir da raiz do projeto
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src import taco
 
 def preprocess_taco_table(input_path, output_path):
     """
-    Lê uma planilha da Tabela TACO, remove linhas em branco e cabeçalhos repetidos,
-    e salva o resultado como um arquivo CSV.
+    Lê a planilha da Tabela TACO com o parser tipado de src/taco.py (descartando linhas
+    de categoria, a coluna de kJ e a repetição do número do alimento), grava o cache
+    binário e salva o resultado como um arquivo CSV com os nomes de coluna do banco.
 
     Args:
         input_path (str): O caminho para o arquivo .xlsx de entrada.
@@ -13,11 +18,10 @@ def preprocess_taco_table(input_path, output_path):
     print(f"Iniciando o pré-processamento do arquivo: {input_path}")
 
     try:
-        # A Tabela TACO geralmente possui algumas linhas de título antes dos dados.
-        # O valor de 'skiprows' pode precisar de ajuste dependendo da sua planilha.
-        # Ex: skiprows=3 pula as 3 primeiras linhas.
-        df = pd.read_excel(input_path, skiprows=1)
-        print(f"Arquivo lido com sucesso. Shape inicial: {df.shape}")
+        table = taco.load_taco(input_path)
+        print(f"Arquivo lido com sucesso: {len(table)} alimentos, {len(taco.NUTRIENT_COLUMNS)} nutrientes.")
+        print(f"Valores em traço: {int(table.trace.sum())}; valores ausentes: {int(table.missing.sum())}.")
+        print(f"Cache binário: {taco.cache_path_for(input_path)}")
 
     except FileNotFoundError:
         print(f"Erro: O arquivo de entrada não foi encontrado em '{input_path}'")
@@ -27,30 +31,14 @@ def preprocess_taco_table(input_path, output_path):
         print(f"Ocorreu um erro ao ler o arquivo Excel: {e}")
         return
 
-    # --- Início da Limpeza ---
-
-    # 1. Remover linhas completamente em branco
-    df_cleaned = df.dropna(how='all')
-    print(f"Shape após remover linhas em branco: {df_cleaned.shape}")
-
-    # 2. Remover linhas não numéricas na primeira coluna (que geralmente são cabeçalhos repetidos)
-    if not df_cleaned.empty:
-        first_col_name = df_cleaned.columns[0]
-        initial_rows = len(df_cleaned)
-
-        # Mantém apenas as linhas onde o valor na primeira coluna pode ser convertido para número
-        is_numeric = pd.to_numeric(df_cleaned[first_col_name], errors='coerce').notna()
-        df_cleaned = df_cleaned[is_numeric]
-
-        rows_removed = initial_rows - len(df_cleaned)
-        print(f"{rows_removed} linhas não numéricas (cabeçalhos) foram removidas da primeira coluna.")
-        print(f"Shape final: {df_cleaned.shape}")
-
-    # --- Fim da Limpeza ---
+    # No CSV, traços voltam a ser 'Tr' e ausentes ficam em branco, para não perder a distinção
+    df_output = table.to_frame()
+    nutrient_columns = list(taco.NUTRIENT_COLUMNS)
+    df_output[nutrient_columns] = df_output[nutrient_columns].astype(object).mask(table.trace, 'Tr')
 
     # Salvar o DataFrame limpo em um arquivo CSV com codificação UTF-8
     try:
-        df_cleaned.to_csv(output_path, index=False, encoding='utf-8')
+        df_output.to_csv(output_path, index=False, encoding='utf-8')
         print(f"Arquivo pré-processado salvo com sucesso em: {output_path}")
     except Exception as e:
         print(f"Ocorreu um erro ao salvar o arquivo CSV: {e}")
@@ -66,4 +54,4 @@ if __name__ == "__main__":
     # Garante que o diretório de dados exista
     os.makedirs(DATA_DIR, exist_ok=True)
 
-    preprocess_taco_table(os.path.join(DATA_DIR, INPUT_FILENAME), os.path.join(DATA_DIR, OUTPUT_FILENAME))
\ No newline at end of file
+    preprocess_taco_table(os.path.join(DATA_DIR, INPUT_FILENAME), os.path.join(DATA_DIR, OUTPUT_FILENAME))
@@ -0,0 +1,142 @@
+# scripts/profile_imports.py
+"""
+Mede o custo de importação (a frio) da página inicial, de cada página e de cada módulo de src,
+usando `python -X importtime` em um processo novo para cada alvo.
+
+Para as páginas, só as linhas de import do arquivo são executadas (lidas com ast): mede-se o
+custo de abrir a página sem rodar o Streamlit. O relatório mostra, por alvo, o tempo total,
+os pacotes mais caros e quais bibliotecas pesadas foram carregadas já na importação.
+
+Uso (a partir da raiz do projeto):
+    python scripts/profile_imports.py [--runs 3] [--top 8] [--json relatorio.json]
+    python scripts/profile_imports.py --baseline relatorio.json   # falha se algum alvo ficou mais lento
+"""
+
+import argparse
+import ast
+import glob
+import json
+import os
+import subprocess
+import sys
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Bibliotecas que devem ser carregadas só no primeiro uso (ver src/lazy_imports.py)
+HEAVY_PACKAGES = ('pandas', 'plotly', 'highspy', 'pyarrow', 'scipy')
+REGRESSION_TOLERANCE = 0.20  # Alvo 20% mais lento que a linha de base = regressão
+REGRESSION_MIN_MS = 20.0  # ...e pelo menos 20 ms mais lento (ignora ruído em alvos rápidos)
+
+
+def _import_statements(path):
+    """Linhas de import do nível superior de um arquivo (as de uma página, sem executar o resto)."""
+    with open(path, encoding='utf-8') as file:
+        tree = ast.parse(file.read(), filename=path)
+    return [ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))]
+
+
+def _targets():
+    """(nome, código) de cada alvo: página inicial, páginas e módulos de src."""
+    targets = [('app.py', '; '.join(_import_statements(os.path.join(PROJECT_ROOT, 'app.py'))))]
+    for path in sorted(glob.glob(os.path.join(PROJECT_ROOT, 'pages', '*.py'))):
+        statements = _import_statements(path)
+        if statements:
+            targets.append((os.path.relpath(path, PROJECT_ROOT), '; '.join(statements)))
+    for path in sorted(glob.glob(os.path.join(PROJECT_ROOT, 'src', '*.py'))):
+        module = os.path.splitext(os.path.basename(path))[0]
+        if module != '__init__':
+            targets.append((f"src.{module}", f"import src.{module}"))
+    return targets
+
+
+def _parse_importtime(stderr):
+    """Converte a saída de -X importtime em {módulo: (self_us, cumulativo_us)}."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+def profile_target(code, runs):
+    """Importa o código em `runs` processos novos e fica com a execução mais rápida (menos ruído)."""
+    best = None
+    for _ in range(runs):
+        completed = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', code],
+            cwd=PROJECT_ROOT, capture_output=True, text=True
+        )
+        if completed.returncode != 0:
+            error = completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else 'erro desconhecido'
+            return {'error': error}
+        modules = _parse_importtime(completed.stderr)
+        total_ms = sum(self_us for self_us, _ in modules.values()) / 1000
+        if best is None or total_ms < best['total_ms']:
+            best = {'total_ms': total_ms, 'modules': modules}
+
+    by_package = {}
+    for name, (self_us, _) in best['modules'].items():
+        package = name.split('.')[0]
+        by_package[package] = by_package.get(package, 0) + self_us / 1000
+    return {
+        'total_ms': best['total_ms'],
+        'packages_ms': dict(sorted(by_package.items(), key=lambda item: item[1], reverse=True)),
+        'heavy_loaded': [package for package in HEAVY_PACKAGES if package in by_package],
+    }
+
+
+def _print_report(report, top):
+    for name, result in report.items():
+        if 'error' in result:
+            print(f"{name}: não foi possível importar ({result['error']})\n")
+            continue
+        heavy = ', '.join(result['heavy_loaded']) or 'nenhuma'
+        print(f"{name}: {result['total_ms']:.1f} ms (bibliotecas pesadas carregadas: {heavy})")
+        for package, milliseconds in list(result['packages_ms'].items())[:top]:
+            print(f"    {package:<28} {milliseconds:8.1f} ms")
+        print()
+
+
+def _compare(report, baseline):
+    """Lista os alvos que ficaram mais lentos que na linha de base, além da tolerância."""
+    regressions = []
+    for name, result in report.items():
+        before = baseline.get(name, {}).get('total_ms')
+        if before is None or 'error' in result:
+            continue
+        slower_ms = result['total_ms'] - before
+        if slower_ms > REGRESSION_MIN_MS and slower_ms > before * REGRESSION_TOLERANCE:
+            regressions.append(f"{name}: {before:.1f} ms -> {result['total_ms']:.1f} ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Relatório do custo de importação das páginas e módulos.")
+    parser.add_argument('--runs', type=int, default=3, help="Execuções por alvo (fica a mais rápida)")
+    parser.add_argument('--top', type=int, default=8, help="Pacotes listados por alvo")
+    parser.add_argument('--json', help="Salva o relatório neste arquivo (para usar como linha de base)")
+    parser.add_argument('--baseline', help="Compara com um relatório salvo e falha se houver regressão")
+    args = parser.parse_args()
+
+    report = {name: profile_target(code, args.runs) for name, code in _targets()}
+    _print_report(report, args.top)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2, ensure_ascii=False)
+        print(f"Relatório salvo em '{args.json}'.")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as file:
+            regressions = _compare(report, json.load(file))
+        if regressions:
+            print("Regressões no tempo de importação:")
+            for regression in regressions:
+                print(f"    {regression}")
+            sys.exit(1)
+        print("Nenhuma regressão em relação à linha de base.")
+
+
+if __name__ == '__main__':
+    main()
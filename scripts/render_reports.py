@@ -0,0 +1,56 @@
+# scripts/render_reports.py
+"""
+Gera, em lote e em paralelo, os relatórios em PDF dos pacientes ativos (com consulta no último
+ano, por padrão). Relatórios que não mudaram desde a última execução são mantidos.
+Pensado para rodar fora do horário de atendimento, por exemplo via cron:
+    0 2 * * * cd /caminho/do/nutri-app && python scripts/render_reports.py
+
+Uso (a partir da raiz do projeto):
+    python scripts/render_reports.py [--active-days 365] [--workers 4] [--force]
+    python scripts/render_reports.py --patient 12 --patient 15
+"""
+
+import argparse
+import os
+import sys
+import time
+
+# Permite importar o pacote src ao rodar o script a partir da raiz do projeto
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src import db_utils, reports
+
+
+def _print_progress(done, total):
+    if done == total or done % 50 == 0:
+        print(f"  {done}/{total} relatórios gerados...")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Geração em lote dos relatórios de evolução em PDF.")
+    parser.add_argument('--database', default=db_utils.DATABASE_FILE, help="Arquivo do banco SQLite")
+    parser.add_argument('--active-days', type=int, default=reports.ACTIVE_PATIENT_DAYS,
+                        help="Considera ativos os pacientes com consulta nestes últimos dias")
+    parser.add_argument('--patient', type=int, action='append', help="Gera só para este paciente (pode repetir)")
+    parser.add_argument('--workers', type=int, default=reports.REPORT_WORKERS, help="Processos de renderização")
+    parser.add_argument('--force', action='store_true', help="Gera de novo mesmo os relatórios atualizados")
+    args = parser.parse_args()
+    db_utils.DATABASE_FILE = args.database
+
+    patient_ids = args.patient or reports.active_patient_ids(args.active_days)
+    print(f"{len(patient_ids)} pacientes selecionados.")
+    start = time.perf_counter()
+    try:
+        summary = reports.render_reports(patient_ids, workers=args.workers, force=args.force, progress=_print_progress)
+    finally:
+        db_utils.close_all_connections()
+
+    print(f"Concluído em {time.perf_counter() - start:.1f} s: {summary['rendered']} gerados, "
+          f"{summary['cached']} já atualizados, {summary['failed']} com erro.")
+    for patient_id, error in summary['errors'].items():
+        print(f"  Paciente {patient_id}: {error}")
+    if summary['failed']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
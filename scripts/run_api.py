@@ -0,0 +1,37 @@
+# scripts/run_api.py
+"""
+Sobe a API HTTP/JSON (src/api.py) ao lado do app Streamlit, usando o mesmo banco de dados.
+
+Uso (a partir da raiz do projeto):
+    python scripts/run_api.py [--host 127.0.0.1] [--port 8000] [--database database/nutri.db]
+"""
+
+import argparse
+import os
+import sys
+
+# Permite importar o pacote src ao rodar o script a partir da raiz do projeto
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src import api, db_utils
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API HTTP/JSON do app de nutrição.")
+    parser.add_argument('--database', default=db_utils.DATABASE_FILE, help="Arquivo do banco SQLite")
+    parser.add_argument('--host', default='127.0.0.1', help="Endereço em que a API escuta")
+    parser.add_argument('--port', type=int, default=8000, help="Porta da API")
+    parser.add_argument('--log-level', default='warning', help="Nível de log do uvicorn")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.database):
+        print(f"ERRO: Banco '{args.database}' não encontrado. Rode scripts/initialize_database.py antes.")
+        sys.exit(1)
+    db_utils.DATABASE_FILE = args.database
+
+    import uvicorn
+    # Um único processo: o paralelismo do SQLite fica no pool de threads da própria API
+    uvicorn.run(api.app, host=args.host, port=args.port, log_level=args.log_level, access_log=False)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+# src/analytics.py
+
+import threading
+import time
+import numpy as np
+from src import db_utils
+from src.query_cache import QueryCache
+from src.lazy_imports import lazy_import
+pd = lazy_import('pandas')
+
+# Colunas das consultas usadas na evolução do paciente
+SOURCE_COLUMNS = [
+    'id', 'patient_id', 'consultation_date', 'weight_kg', 'height_cm',
+    'body_fat_percentage', 'circ_waist_cm', 'circ_hip_cm',
+]
+# Métricas para as quais calculamos a taxa de variação semanal
+RATE_METRICS = ['weight_kg', 'bmi', 'body_fat_percentage', 'fat_mass_kg', 'lean_mass_kg']
+SQL_VARIABLES_PER_QUERY = 900  # Abaixo do limite de parâmetros do SQLite
+
+# Séries já calculadas. As escritas do db_utils invalidam ('consultations', id); aqui isso
+# descarta a série daquele paciente e o marca para recálculo na visão de coorte.
+PROGRESS_CACHE_SIZE = 4096
+progress_cache = QueryCache(maxsize=PROGRESS_CACHE_SIZE, ttl_seconds=db_utils.QUERY_CACHE_TTL_SECONDS)
+
+_cohort = None  # DataFrame com a evolução de todos os pacientes
+_cohort_database = None
+_cohort_loaded_at = 0.0
+_cohort_lock = threading.Lock()
+_stale_patients = set()  # Pacientes cujas consultas mudaram desde o último cálculo da coorte
+_cohort_reset = False  # O cache do db_utils foi esvaziado (ex: gravação de outro processo): recalcula tudo
+_stale_lock = threading.Lock()  # Separado, para que as escritas não esperem um recálculo da coorte
+
+
+def _on_invalidate(*tags):
+    """Recebe as invalidações do cache do db_utils e repassa para os caches de evolução."""
+    progress_cache.invalidate(*tags)
+    with _stale_lock:
+        for tag in tags:
+            if isinstance(tag, tuple) and tag[0] == 'consultations':
+                _stale_patients.add(tag[1])
+
+
+def _on_clear():
+    """O cache do db_utils foi esvaziado: descarta as séries e a coorte calculadas."""
+    global _cohort_reset
+    progress_cache.clear()
+    with _stale_lock:
+        _cohort_reset = True
+
+
+db_utils.query_cache.add_invalidation_listener(_on_invalidate)
+db_utils.query_cache.add_clear_listener(_on_clear)
+
+
+def compute_progress(consultations):
+    """
+    Calcula as séries de evolução para todos os pacientes presentes no DataFrame de consultas,
+    em uma única passada vetorizada agrupada por paciente.
+    Acrescenta: bmi, fat_mass_kg, lean_mass_kg, waist_hip_ratio, days_since_previous,
+    <métrica>_per_week (variação semanal desde a consulta anterior) e weight_change_kg
+    (variação desde a primeira consulta). Medidas iguais a 0 são tratadas como não informadas.
+    """
+    df = consultations.reindex(columns=SOURCE_COLUMNS).copy()
+    measures = ['weight_kg', 'height_cm', 'body_fat_percentage', 'circ_waist_cm', 'circ_hip_cm']
+    df[measures] = df[measures].apply(pd.to_numeric, errors='coerce').replace(0, np.nan)
+    df['consultation_date'] = pd.to_datetime(df['consultation_date'], format='%Y-%m-%d', errors='coerce')
+    df = df.sort_values(['patient_id', 'consultation_date', 'id'], ignore_index=True)
+
+    df['bmi'] = df['weight_kg'] / (df['height_cm'] / 100) ** 2
+    df['fat_mass_kg'] = df['weight_kg'] * df['body_fat_percentage'] / 100
+    df['lean_mass_kg'] = df['weight_kg'] - df['fat_mass_kg']
+    df['waist_hip_ratio'] = df['circ_waist_cm'] / df['circ_hip_cm']
+
+    grouped = df.groupby('patient_id', sort=False)
+    df['days_since_previous'] = grouped['consultation_date'].diff().dt.days
+    weeks = (df['days_since_previous'] / 7).replace(0, np.nan)
+    differences = grouped[RATE_METRICS].diff()
+    for metric in RATE_METRICS:
+        df[f'{metric}_per_week'] = differences[metric] / weeks
+    df['weight_change_kg'] = df['weight_kg'] - grouped['weight_kg'].transform('first')
+    return df
+
+
+def _load_consultations(patient_ids=None):
+    """Lê as colunas de evolução das consultas (de todos os pacientes, ou só dos informados)."""
+    query = f"SELECT {', '.join(SOURCE_COLUMNS)} FROM consultations"
+    with db_utils.get_db_connection() as conn:
+        if patient_ids is None:
+            return pd.read_sql_query(query, con=conn)
+        frames = []
+        for start in range(0, len(patient_ids), SQL_VARIABLES_PER_QUERY):
+            chunk = list(patient_ids[start:start + SQL_VARIABLES_PER_QUERY])
+            placeholders = ', '.join('?' for _ in chunk)
+            frames.append(pd.read_sql_query(f"{query} WHERE patient_id IN ({placeholders})", con=conn, params=chunk))
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=SOURCE_COLUMNS)
+
+
+def get_patient_progress(patient_id):
+    """Série de evolução de um paciente (do cache, ou calculada e guardada se necessário)."""
+    db_utils.check_external_changes()
+    frame = progress_cache.get_or_load(
+        (db_utils.DATABASE_FILE, 'progress', patient_id),
+        lambda: compute_progress(_load_consultations([patient_id])),
+        lambda result: [('consultations', patient_id)]
+    )
+    return frame.copy()
+
+
+def get_cohort_progress():
+    """
+    Séries de evolução de todos os pacientes com consultas (visão de coorte).
+    A primeira chamada calcula tudo em uma passada; as seguintes só recalculam os pacientes
+    cujas consultas mudaram desde então e substituem as linhas deles. Quando outro processo grava
+    no banco (ou depois do TTL do cache), a coorte é recalculada inteira.
+    """
+    global _cohort, _cohort_database, _cohort_loaded_at, _cohort_reset
+    db_utils.check_external_changes()
+    with _cohort_lock:
+        with _stale_lock:
+            stale = list(_stale_patients)
+            _stale_patients.clear()
+            reset, _cohort_reset = _cohort_reset, False
+        expired = time.monotonic() - _cohort_loaded_at > db_utils.QUERY_CACHE_TTL_SECONDS
+        if _cohort is None or reset or expired or _cohort_database != db_utils.DATABASE_FILE:
+            _cohort = compute_progress(_load_consultations())
+            _cohort_database = db_utils.DATABASE_FILE
+            _cohort_loaded_at = time.monotonic()
+        elif stale:
+            recomputed = compute_progress(_load_consultations(stale))
+            kept = _cohort[~_cohort['patient_id'].isin(stale)]
+            _cohort = pd.concat([kept, recomputed], ignore_index=True).sort_values(
+                ['patient_id', 'consultation_date', 'id'], ignore_index=True
+            )
+        return _cohort.copy()
@@ -0,0 +1,389 @@
+# src/api.py
+
+import asyncio
+import base64
+import functools
+import hashlib
+import json
+import math
+import re
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+import numpy as np
+from src import body_composition  # Recalcula o %GC derivado em segundo plano após as gravações
+from src import calculations
+from src import db_utils
+from src import dri
+from src import write_queue
+from src.lazy_imports import lazy_import
+pd = lazy_import('pandas')
+
+# API HTTP/JSON (ASGI) sobre as mesmas funções usadas pelas páginas do Streamlit.
+# O acesso ao SQLite é bloqueante: cada leitura roda em um pool de threads limitado,
+# do tamanho do pool de conexões, e o laço asyncio fica livre para atender outros clientes.
+# As gravações vão para a fila de escrita (src/write_queue.py) e são só aguardadas, sem ocupar threads.
+# Para servir: python scripts/run_api.py (ou uvicorn src.api:app).
+API_DB_WORKERS = db_utils.POOL_SIZE  # Uma thread por conexão do pool
+MAX_BODY_BYTES = 10 * 1024 * 1024
+MAX_BATCH_ITEMS = 10000  # Itens por requisição nos endpoints em lote
+MAX_PAGE_SIZE = 500  # Pacientes por página em GET /patients (?limit= acima disso é reduzido)
+
+_executor = ThreadPoolExecutor(max_workers=API_DB_WORKERS, thread_name_prefix='api-db')
+_routes = []  # (método, regex do caminho, função)
+
+
+class ApiError(Exception):
+    """Erro com status HTTP, devolvido ao cliente como {"error": mensagem}."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class Request:
+    def __init__(self, scope, body, path_params):
+        self.method = scope['method']
+        self.path = scope['path']
+        self.query = {key: values[-1] for key, values in parse_qs(scope.get('query_string', b'').decode()).items()}
+        self.headers = {key.decode('latin-1').lower(): value.decode('latin-1') for key, value in scope['headers']}
+        self.body = body
+        self.path_params = path_params
+
+    def json(self):
+        try:
+            return json.loads(self.body or b'null')
+        except ValueError as error:
+            raise ApiError(400, f"JSON inválido: {error}")
+
+
+def route(method, pattern):
+    """Registra uma função como endpoint. Os grupos nomeados do padrão viram path_params (int)."""
+    def decorator(function):
+        _routes.append((method, re.compile(f"^{pattern}$"), function))
+        return function
+    return decorator
+
+
+async def run_blocking(function, *args, **kwargs):
+    """Roda uma função bloqueante (SQLite, pandas) no pool de threads da API."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(function, *args, **kwargs))
+
+
+async def run_write(function, *args, **kwargs):
+    """Entrega uma gravação à fila de escrita e espera o commit do lote em que ela entrou."""
+    return await asyncio.wrap_future(write_queue.submit(function, *args, **kwargs))
+
+
+# --- Conversão para JSON ---
+
+def _plain(value):
+    """Converte tipos do numpy/pandas e NaN em tipos aceitos pelo JSON."""
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+
+def _records(frame):
+    """Linhas do DataFrame como dicionários (uma conversão só para object; to_dict('records') é ~7x mais lento)."""
+    columns = frame.columns.tolist()
+    return [dict(zip(columns, map(_plain, row))) for row in frame.to_numpy(dtype=object).tolist()]
+
+
+def _encode_cursor(cursor):
+    return None if cursor is None else base64.urlsafe_b64encode(json.dumps(cursor).encode()).decode()
+
+
+def _decode_cursor(text):
+    if not text:
+        return None
+    try:
+        cursor = json.loads(base64.urlsafe_b64decode(text.encode()))
+    except ValueError:
+        raise ApiError(400, "Cursor de paginação inválido.")
+    # O cursor é o último (nome normalizado, id) da página anterior (ver db_utils.search_patients)
+    if not (isinstance(cursor, list) and len(cursor) == 2 and isinstance(cursor[0], str)
+            and isinstance(cursor[1], int) and not isinstance(cursor[1], bool)):
+        raise ApiError(400, "Cursor de paginação inválido.")
+    return tuple(cursor)
+
+
+def _page_limit(text):
+    """?limit= da paginação, limitado a 1..MAX_PAGE_SIZE; texto que não é número inteiro vira 400."""
+    if text is None:
+        return db_utils.PATIENT_PAGE_SIZE
+    try:
+        limit = int(text)
+    except ValueError:
+        raise ApiError(400, f"'limit' deve ser um número inteiro (recebido: {text!r}).")
+    return min(max(limit, 1), MAX_PAGE_SIZE)
+
+
+def _required(data, *fields):
+    if not isinstance(data, dict):
+        raise ApiError(400, "O corpo deve ser um objeto JSON.")
+    missing = [field for field in fields if data.get(field) in (None, '')]
+    if missing:
+        raise ApiError(400, f"Campos obrigatórios ausentes: {', '.join(missing)}")
+    return data
+
+
+# --- Endpoints ---
+
+@route('GET', r'/health')
+async def health(request):
+    return 200, {'status': 'ok'}
+
+
+@route('GET', r'/patients')
+async def list_patients(request):
+    limit = _page_limit(request.query.get('limit'))
+    rows, next_cursor = await run_blocking(
+        db_utils.search_patients, request.query.get('query', ''), _decode_cursor(request.query.get('after')), limit
+    )
+    return 200, {
+        'patients': [{'id': pid, 'name': name, 'last_consultation_date': last} for pid, name, last in rows],
+        'next_cursor': _encode_cursor(next_cursor),
+    }
+
+
+PATIENT_FIELDS = ('name', 'birth_date', 'sex', 'contact', 'medical_history')
+
+
+@route('POST', r'/patients')
+async def create_patient(request):
+    data = _required(request.json(), 'name')
+    patient_id = await run_write(db_utils.add_patient, *(data.get(field) for field in PATIENT_FIELDS))
+    return 201, {'id': patient_id}
+
+
+async def _patient_or_404(patient_id):
+    details = await run_blocking(db_utils.get_patient_details, patient_id)
+    if details.empty:
+        raise ApiError(404, f"Paciente {patient_id} não encontrado.")
+    return _records(details)[0]
+
+
+@route('GET', r'/patients/(?P<patient_id>\d+)')
+async def get_patient(request):
+    return 200, await _patient_or_404(request.path_params['patient_id'])
+
+
+@route('PUT', r'/patients/(?P<patient_id>\d+)')
+async def update_patient(request):
+    patient_id = request.path_params['patient_id']
+    data = _required(request.json(), 'name')
+    await _patient_or_404(patient_id)
+    # 'version' (lida no GET) liga o controle otimista: 409 se outra sessão salvou antes
+    await run_write(
+        db_utils.update_patient, patient_id, *(data.get(field) for field in PATIENT_FIELDS),
+        expected_version=data.get('version')
+    )
+    return 200, await _patient_or_404(patient_id)
+
+
+@route('DELETE', r'/patients/(?P<patient_id>\d+)')
+async def delete_patient(request):
+    patient_id = request.path_params['patient_id']
+    await _patient_or_404(patient_id)
+    await run_write(db_utils.delete_patient, patient_id, archive=request.query.get('archive') in ('1', 'true'))
+    return 204, None
+
+
+@route('GET', r'/patients/(?P<patient_id>\d+)/consultations')
+async def list_consultations(request):
+    patient_id = request.path_params['patient_id']
+    await _patient_or_404(patient_id)
+    consultations = await run_blocking(db_utils.get_consultations_for_patient, patient_id)
+    return 200, {'consultations': _records(consultations)}
+
+
+CONSULTATION_FIELDS = (
+    'patient_id', 'consultation_date', 'weight_kg', 'height_cm', 'body_fat_percentage', 'notes',
+    'skinfolds', 'circumferences', 'body_fat_protocol',
+)
+
+
+def _consultation_arguments(data):
+    _required(data, 'patient_id', 'consultation_date')
+    unknown = set(data) - set(CONSULTATION_FIELDS)
+    if unknown:
+        raise ApiError(400, f"Campos desconhecidos: {', '.join(sorted(unknown))}")
+    return data
+
+
+@route('POST', r'/patients/(?P<patient_id>\d+)/consultations')
+async def create_consultation(request):
+    data = request.json()
+    if isinstance(data, dict):
+        data = {**data, 'patient_id': request.path_params['patient_id']}
+    consultation_id = await run_write(db_utils.add_consultation, **_consultation_arguments(data))
+    return 201, {'id': consultation_id}
+
+
+@route('POST', r'/consultations/batch')
+async def create_consultations(request):
+    data = _required(request.json(), 'consultations')
+    consultations = data['consultations']
+    if not isinstance(consultations, list) or len(consultations) > MAX_BATCH_ITEMS:
+        raise ApiError(400, f"'consultations' deve ser uma lista com até {MAX_BATCH_ITEMS} itens.")
+    arguments = [_consultation_arguments(consultation) for consultation in consultations]
+    inserted = await run_write(db_utils.add_consultations, arguments)
+    return 201, {'inserted': inserted}
+
+
+@route('DELETE', r'/consultations/(?P<consultation_id>\d+)')
+async def delete_consultation(request):
+    await run_write(db_utils.delete_consultation, request.path_params['consultation_id'])
+    return 204, None
+
+
+def _check_body_fat_items(items):
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            raise ApiError(400, f"items[{index}] deve ser um objeto JSON.")
+        if not isinstance(item.get('skinfolds', {}), dict):
+            raise ApiError(400, f"items[{index}].skinfolds deve ser um objeto JSON ({{local: mm}}).")
+
+
+def _body_fat_batch(protocol, items):
+    sexes = [item.get('sex') for item in items]
+    if all('age' in item for item in items):
+        ages = np.array([item['age'] for item in items], dtype=float)
+    else:
+        ages = calculations.ages_from_birth_dates([item.get('birth_date') for item in items])
+    sites = sorted({site for item in items for site in item.get('skinfolds', {})})
+    skinfolds = {
+        site: np.array([item.get('skinfolds', {}).get(site, np.nan) for item in items], dtype=float)
+        for site in sites
+    }
+    result = calculations.calculate_body_fat_batch(protocol, sexes, ages, skinfolds)
+    return [_plain(round(value, 2)) for value in result['body_fat_percentage'].tolist()]
+
+
+@route('POST', r'/body-fat/batch')
+async def body_fat_batch(request):
+    data = _required(request.json(), 'protocol', 'items')
+    items = data['items']
+    if not isinstance(items, list) or len(items) > MAX_BATCH_ITEMS:
+        raise ApiError(400, f"'items' deve ser uma lista com até {MAX_BATCH_ITEMS} itens.")
+    _check_body_fat_items(items)
+    # Cálculo vetorizado com numpy: rápido, mas fora do laço para não atrasar as outras requisições
+    values = await run_blocking(_body_fat_batch, data['protocol'], items)
+    return 200, {'body_fat_percentage': values}
+
+
+@route('POST', r'/adequacy/batch')
+async def adequacy_batch(request):
+    """Adequação às DRI de vários planos ({"plan_ids": [...]}) ou do plano mais recente de vários pacientes."""
+    data = _required(request.json())
+    if 'plan_ids' in data:
+        ids, function = data['plan_ids'], dri.cohort_adequacy
+    elif 'patient_ids' in data:
+        ids, function = data['patient_ids'], dri.patients_adequacy
+    else:
+        raise ApiError(400, "Informe 'plan_ids' ou 'patient_ids'.")
+    if not isinstance(ids, list) or len(ids) > MAX_BATCH_ITEMS:
+        raise ApiError(400, f"A lista de ids deve ter até {MAX_BATCH_ITEMS} itens.")
+    result = await run_blocking(function, ids)
+    summary = result.summary()
+    summary.insert(0, 'id', result.labels)
+    adequacy = result.adequacy.round(3)
+    return 200, {
+        'results': [
+            {**row, 'adequacy': {nutrient: ratio for nutrient, ratio in ratios.items() if ratio is not None}}
+            for row, ratios in zip(_records(summary), _records(adequacy))
+        ],
+    }
+
+
+# --- ASGI ---
+
+async def _read_body(receive):
+    chunks, size = [], 0
+    while True:
+        message = await receive()
+        chunk = message.get('body', b'')
+        size += len(chunk)
+        if size > MAX_BODY_BYTES:
+            raise ApiError(413, "Corpo da requisição muito grande.")
+        chunks.append(chunk)
+        if not message.get('more_body'):
+            return b''.join(chunks)
+
+
+def _etag(body):
+    return f'"{hashlib.sha1(body).hexdigest()[:20]}"'
+
+
+def _if_none_match(header, etag):
+    """Verdadeiro se o cabeçalho If-None-Match já contém esta versão (comparação fraca, RFC 9110)."""
+    if not header:
+        return False
+    tags = [tag.strip().removeprefix('W/') for tag in header.split(',')]
+    return '*' in tags or etag in tags
+
+
+async def _dispatch(scope, receive):
+    """Encontra a rota e executa o endpoint; devolve (status, payload)."""
+    allowed = []
+    for method, pattern, function in _routes:
+        match = pattern.match(scope['path'])
+        if match is None:
+            continue
+        if method != scope['method'] and not (method == 'GET' and scope['method'] == 'HEAD'):
+            allowed.append(method)
+            continue
+        body = await _read_body(receive)
+        path_params = {key: int(value) for key, value in match.groupdict().items()}
+        return await function(Request(scope, body, path_params))
+    if allowed:
+        raise ApiError(405, f"Método não permitido (use {', '.join(allowed)}).")
+    raise ApiError(404, "Recurso não encontrado.")
+
+
+async def app(scope, receive, send):
+    """Aplicação ASGI."""
+    if scope['type'] == 'lifespan':
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                body_composition.request_refresh()  # Consultas deixadas pendentes antes de a API subir
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await asyncio.get_running_loop().run_in_executor(None, write_queue.stop)
+                await asyncio.get_running_loop().run_in_executor(None, db_utils.close_all_connections)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+    if scope['type'] != 'http':
+        return
+
+    try:
+        status, payload = await _dispatch(scope, receive)
+    except ApiError as error:
+        status, payload = error.status, {'error': error.message}
+    except db_utils.VersionConflictError as error:
+        status, payload = 409, {'error': str(error), 'current_version': error.current_version}
+    except (ValueError, TypeError, KeyError) as error:
+        status, payload = 422, {'error': str(error)}
+    except sqlite3.IntegrityError as error:
+        status, payload = 409, {'error': f"Violação de integridade: {error}"}
+
+    headers = [(b'content-type', b'application/json; charset=utf-8')]
+    body = b'' if payload is None else json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode()
+    if scope['method'] in ('GET', 'HEAD') and status == 200:
+        # GET condicional: o cliente que já tem esta versão recebe 304 sem corpo
+        etag = _etag(body)
+        headers.append((b'etag', etag.encode()))
+        if _if_none_match(dict(scope['headers']).get(b'if-none-match', b'').decode('latin-1'), etag):
+            status, body = 304, b''
+    headers.append((b'content-length', str(len(body)).encode()))
+    if scope['method'] == 'HEAD':
+        body = b''
+
+    await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': body})
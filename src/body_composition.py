@@ -0,0 +1,116 @@
+# src/body_composition.py
+
+import logging
+import threading
+import numpy as np
+from src import db_utils
+from src import write_queue
+from src.calculations import ages_from_birth_dates, calculate_body_fat_batch
+from src.lazy_imports import lazy_import
+pd = lazy_import('pandas')
+
+# Recálculo incremental do %GC derivado (consultations.body_fat_percentage com body_fat_protocol).
+# Triggers do banco (migração 6) incrementam body_fat_stale quando as dobras, a data, o protocolo,
+# o sexo ou a data de nascimento mudam; o job abaixo recalcula só essas consultas, em lote.
+REFRESH_BATCH_SIZE = 2000  # Consultas recalculadas por transação
+
+logger = logging.getLogger(__name__)
+
+_STALE_QUERY = f"""
+SELECT c.id, c.patient_id, c.consultation_date, c.body_fat_protocol, c.body_fat_stale,
+       p.sex, p.birth_date, {', '.join(f'c.skinfold_{site}_mm' for site in db_utils.SKINFOLD_SITES)}
+FROM consultations c
+LEFT JOIN patients p ON p.id = c.patient_id
+WHERE c.body_fat_stale > 0
+LIMIT ?
+"""
+
+_refresh_requested = threading.Event()
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def refresh_stale_body_fat(batch_size=REFRESH_BATCH_SIZE):
+    """
+    Recalcula o %GC de até batch_size consultas pendentes, com a idade na data de cada consulta.
+    Só grava as consultas que não mudaram de novo durante o cálculo (o contador body_fat_stale
+    lido precisa ser o mesmo); as demais continuam pendentes para a próxima rodada.
+    Retorna o número de consultas lidas (menor que batch_size quando não há mais pendências).
+    """
+    with db_utils.get_db_connection() as conn:
+        stale = pd.read_sql_query(_STALE_QUERY, con=conn, params=(batch_size,))
+    if stale.empty:
+        return 0
+
+    body_fat = np.full(len(stale), np.nan)
+    ages = ages_from_birth_dates(stale['birth_date'].to_numpy(), stale['consultation_date'].to_numpy())
+    for protocol, rows in stale.groupby('body_fat_protocol', sort=False):
+        positions = stale.index.get_indexer(rows.index)
+        skinfolds = {site: rows[f'skinfold_{site}_mm'].to_numpy(dtype=float) for site in db_utils.SKINFOLD_SITES}
+        try:
+            result = calculate_body_fat_batch(protocol, rows['sex'].to_numpy(), ages[positions], skinfolds)
+        except ValueError:
+            continue  # Protocolo desconhecido: o %GC gravado fica como está
+        body_fat[positions] = result['body_fat_percentage'].to_numpy()
+
+    values = [None if np.isnan(value) else round(float(value), 2) for value in body_fat]
+    patient_ids = [int(pid) for pid in stale['patient_id'].dropna().unique()]
+    # Pela fila de escrita, como as gravações das páginas e da API
+    write_queue.call(
+        _store_body_fat, list(zip(values, stale['id'].tolist(), stale['body_fat_stale'].tolist())), patient_ids
+    )
+    return len(stale)
+
+
+def _store_body_fat(rows, patient_ids):
+    with db_utils.transaction() as conn:
+        # Sem dados para calcular (dobras ausentes, protocolo desconhecido), o %GC já gravado
+        # (ex: digitado na consulta) é mantido: NULL nunca substitui um valor existente
+        conn.executemany(
+            """
+            UPDATE consultations SET body_fat_percentage = COALESCE(?, body_fat_percentage), body_fat_stale = 0
+            WHERE id = ? AND body_fat_stale = ?
+            """,
+            rows
+        )
+    db_utils.query_cache.invalidate(*[('consultations', patient_id) for patient_id in patient_ids])
+
+
+def refresh_all_stale_body_fat():
+    """Recalcula todas as consultas pendentes (em lotes). Retorna o total recalculado."""
+    total = 0
+    while True:
+        refreshed = refresh_stale_body_fat()
+        total += refreshed
+        if refreshed < REFRESH_BATCH_SIZE:
+            return total
+
+
+def _run_worker():
+    while True:
+        _refresh_requested.wait()
+        _refresh_requested.clear()
+        try:
+            refresh_all_stale_body_fat()
+        except Exception:
+            # Não derruba a thread: as consultas continuam pendentes e entram na próxima rodada
+            logger.exception("Erro ao recalcular o %GC em segundo plano")
+
+
+def request_refresh():
+    """Acorda o job de recálculo em segundo plano (iniciando a thread na primeira chamada)."""
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = threading.Thread(target=_run_worker, name='body-fat-refresh', daemon=True)
+            _worker.start()
+    _refresh_requested.set()
+
+
+def _on_invalidate(*tags):
+    """Escritas em pacientes/consultas podem ter deixado %GC pendente: agenda o recálculo."""
+    if any(isinstance(tag, tuple) and tag[0] in ('patient', 'consultations') for tag in tags):
+        request_refresh()
+
+
+db_utils.query_cache.add_invalidation_listener(_on_invalidate)
@@ -0,0 +1,414 @@
+# src/bulk_io.py
+
+import csv
+import os
+import time
+import numpy as np
+from src import crypto
+from src import db_utils
+from src import write_queue
+from src.calculations import ages_from_birth_dates, calculate_body_fat_batch
+from src.text_utils import normalize_text
+from src.lazy_imports import lazy_import
+pd = lazy_import('pandas')
+
+# Importação e exportação em massa de pacientes e consultas (ex: migração de uma clínica).
+# Os arquivos são lidos e escritos em blocos: nem o arquivo nem a tabela inteira ficam em memória.
+DEFAULT_CHUNK_SIZE = 5000  # Linhas por bloco (e por transação, na importação)
+MAX_REPORTED_ERRORS = 20  # Linhas rejeitadas descritas no relatório (as demais só são contadas)
+SQL_VARIABLES_PER_QUERY = 900  # Abaixo do limite de parâmetros do SQLite
+
+PATIENT_FIELDS = ('name', 'birth_date', 'sex', 'contact', 'medical_history')
+SOURCE_ID_COLUMN = 'id'  # Id do sistema de origem; só serve para ligar as consultas aos pacientes
+# Colunas calculadas pelo próprio banco/aplicação, que não são importadas nem exportadas
+INTERNAL_COLUMNS = {'patients': ('name_search', 'created_at', 'updated_at', 'version'), 'consultations': ('body_fat_stale',)}
+EXPORT_TABLES = ('patients', 'consultations')
+FILE_FORMATS = {'.csv': 'csv', '.parquet': 'parquet', '.pq': 'parquet'}
+
+# Grafias aceitas para o sexo (já normalizadas: sem acentos e minúsculas)
+SEX_ALIASES = {
+    'masculino': 'masculino', 'm': 'masculino', 'masc': 'masculino', 'male': 'masculino', 'homem': 'masculino',
+    'feminino': 'feminino', 'f': 'feminino', 'fem': 'feminino', 'female': 'feminino', 'mulher': 'feminino',
+}
+DATE_FORMATS = ('%Y-%m-%d', '%d/%m/%Y')  # ISO primeiro; depois o formato brasileiro
+
+
+# --- Formatos de arquivo ---
+
+def _file_format(path):
+    file_format = FILE_FORMATS.get(os.path.splitext(path)[1].lower())
+    if file_format is None:
+        raise ValueError(f"Formato de arquivo não suportado: {path} (use {', '.join(FILE_FORMATS)})")
+    return file_format
+
+
+def _require_pyarrow():
+    """Importa o pyarrow só quando um arquivo Parquet é usado (CSV não precisa dele)."""
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError as error:
+        raise ImportError("Arquivos Parquet precisam do pacote pyarrow (pip install pyarrow).") from error
+    return pyarrow
+
+
+def read_chunks(path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Lê um arquivo CSV ou Parquet em blocos de até chunk_size linhas (DataFrames)."""
+    if _file_format(path) == 'csv':
+        # Tudo como texto: a normalização abaixo decide o tipo de cada coluna
+        reader = pd.read_csv(path, chunksize=chunk_size, dtype=str, keep_default_na=False, na_values=[''])
+        for chunk in reader:
+            chunk.columns = [str(column).strip() for column in chunk.columns]
+            yield chunk
+    else:
+        pyarrow = _require_pyarrow()
+        for batch in pyarrow.parquet.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+
+
+# --- Normalização e validação ---
+
+def _table_columns(conn, table):
+    """Colunas (nome -> tipo declarado) da tabela no banco, sem as colunas internas."""
+    rows = conn.execute(f"PRAGMA table_info({table})").fetchall()
+    return {row[1]: row[2].upper() for row in rows if row[1] not in INTERNAL_COLUMNS.get(table, ())}
+
+
+def _check_columns(columns, allowed, required, file_description):
+    unknown = [column for column in columns if column not in allowed]
+    if unknown:
+        raise ValueError(f"Colunas desconhecidas em {file_description}: {', '.join(unknown)}")
+    missing = [column for column in required if column not in columns]
+    if missing:
+        raise ValueError(f"Colunas obrigatórias ausentes em {file_description}: {', '.join(missing)}")
+
+
+def _text(series):
+    """Texto sem espaços nas pontas; vazio vira ausente."""
+    text = series.astype('string').str.strip()
+    return text.mask(text == '')
+
+
+def normalize_dates(series):
+    """Converte datas (ISO, DD/MM/AAAA ou já datetime) para 'YYYY-MM-DD'. Retorna (datas, inválidas)."""
+    if pd.api.types.is_datetime64_any_dtype(series):
+        parsed = series
+    else:
+        text = _text(series)
+        parsed = pd.to_datetime(text.str.slice(0, 10), format=DATE_FORMATS[0], errors='coerce')
+        for date_format in DATE_FORMATS[1:]:
+            parsed = parsed.fillna(pd.to_datetime(text, format=date_format, errors='coerce'))
+        series = text
+    dates = parsed.dt.strftime('%Y-%m-%d').astype(object)
+    return dates.where(parsed.notna(), None), series.notna() & parsed.isna()
+
+
+def normalize_numbers(series):
+    """Converte números (aceita vírgula decimal). Retorna (valores float, inválidos)."""
+    if pd.api.types.is_numeric_dtype(series):
+        return series.astype(float), pd.Series(False, index=series.index)
+    # Caminho rápido (conversão em C); só os valores que falharem passam pelo tratamento de texto
+    values = pd.to_numeric(series, errors='coerce').astype(float)
+    failed = series.notna() & values.isna()
+    invalid = pd.Series(False, index=series.index)
+    if failed.any():
+        text = _text(series[failed])
+        retried = pd.to_numeric(text.str.replace(',', '.', regex=False), errors='coerce')
+        values[failed] = retried.astype(float)
+        invalid[failed] = text.notna() & retried.isna()
+    return values, invalid
+
+
+def normalize_sexes(series):
+    """Converte as grafias de sexo para 'masculino'/'feminino'. Retorna (sexos, inválidos)."""
+    text = _text(series)
+    codes, uniques = pd.factorize(text)
+    lookup = np.array([SEX_ALIASES.get(normalize_text(value)) for value in uniques] + [None], dtype=object)
+    sexes = pd.Series(lookup[codes], index=series.index, dtype=object)
+    return sexes, text.notna() & sexes.isna()
+
+
+def _source_keys(series):
+    """Ids do sistema de origem como texto comparável ('12', '12.0' e 12 viram '12')."""
+    return _text(series).str.replace(r'\.0+$', '', regex=True)
+
+
+class _ImportReport:
+    """Acumula as contagens e as linhas rejeitadas de uma importação."""
+
+    def __init__(self, path):
+        self.path = path
+        self.rows_read = 0
+        self.rows_imported = 0
+        self.rows_rejected = 0
+        self.errors = []
+        self._start = time.perf_counter()
+
+    def reject(self, chunk, mask, reason):
+        """Registra as linhas do bloco marcadas em mask como rejeitadas pelo motivo informado."""
+        mask = np.array(mask.fillna(False), dtype=bool)
+        for row_number in (chunk.index[mask] + 1)[:MAX_REPORTED_ERRORS - len(self.errors)]:
+            self.errors.append(f"registro {row_number}: {reason}")
+        return mask
+
+    def as_dict(self):
+        seconds = time.perf_counter() - self._start
+        return {
+            'file': self.path,
+            'rows_read': self.rows_read,
+            'rows_imported': self.rows_imported,
+            'rows_rejected': self.rows_rejected,
+            'errors': self.errors,
+            'seconds': seconds,
+            'rows_per_second': self.rows_imported / seconds if seconds else 0.0,
+        }
+
+
+def _renumber(chunk, offset):
+    """Índice do bloco = posição da linha no arquivo (a partir de 0), para as mensagens de erro."""
+    chunk.index = pd.RangeIndex(offset, offset + len(chunk))
+    return chunk
+
+
+def _rows(frame, columns):
+    """Tuplas prontas para executemany (NaN/NA viram NULL)."""
+    values = frame[columns].astype(object)
+    return values.where(frame[columns].notna(), None).itertuples(index=False, name=None)
+
+
+# --- Importação ---
+
+def import_patients(path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Importa pacientes de um CSV/Parquet com as colunas de PATIENT_FIELDS (name obrigatória) e,
+    opcionalmente, 'id' do sistema de origem. Cada bloco é gravado em uma transação.
+    Retorna (relatório, mapa_de_ids): o mapa leva o id de origem ao id criado no banco e é usado
+    por import_consultations para ligar as consultas aos pacientes importados.
+    """
+    report = _ImportReport(path)
+    id_map = {}
+    for chunk in read_chunks(path, chunk_size):
+        _renumber(chunk, report.rows_read)
+        report.rows_read += len(chunk)
+        _check_columns(chunk.columns, (SOURCE_ID_COLUMN, *PATIENT_FIELDS), ('name',), path)
+
+        patients = pd.DataFrame(index=chunk.index)
+        patients['name'] = _text(chunk['name'])
+        rejected = report.reject(chunk, patients['name'].isna(), "nome ausente")
+        if 'birth_date' in chunk:
+            patients['birth_date'], invalid = normalize_dates(chunk['birth_date'])
+            rejected |= report.reject(chunk, invalid, "data de nascimento inválida")
+        if 'sex' in chunk:
+            patients['sex'], invalid = normalize_sexes(chunk['sex'])
+            rejected |= report.reject(chunk, invalid, "sexo inválido")
+        for column in ('contact', 'medical_history'):
+            if column in chunk:
+                patients[column] = _text(chunk[column])
+        patients = patients[~rejected]
+        names = crypto.decrypt_many(patients['name'], 'name')  # Arquivo com nomes cifrados pela chave atual
+        encrypted = crypto.is_enabled()
+        if encrypted:
+            # Campos sensíveis cifrados e name_search vazio; a busca usa o índice cego (db_utils)
+            patients['name_search'] = None
+            for column in db_utils.ENCRYPTED_PATIENT_COLUMNS:
+                if column in patients:
+                    patients[column] = [crypto.encrypt(value, column) for (value,) in _rows(patients, [column])]
+        else:
+            patients['name_search'] = [normalize_text(name) for name in names]
+        report.rows_rejected += int(rejected.sum())
+
+        columns = list(patients.columns)
+        source_keys = _source_keys(chunk[SOURCE_ID_COLUMN])[~rejected].tolist() if SOURCE_ID_COLUMN in chunk else None
+        # Pela fila de escrita (uma transação por bloco), como as gravações das páginas e da API
+        id_map.update(write_queue.call(
+            _insert_patients, columns, list(_rows(patients, columns)), names, source_keys, one_by_one=encrypted
+        ))
+        report.rows_imported += len(patients)
+
+    db_utils.query_cache.invalidate('patient_directory')
+    return report.as_dict(), id_map
+
+
+def _insert_patients(columns, rows, names, source_keys, one_by_one=False):
+    """Grava um bloco de pacientes; devolve {id de origem: id criado} (vazio sem source_keys)."""
+    insert = f"INSERT INTO patients ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})"
+    id_map = {}
+    with db_utils.transaction() as conn:
+        if source_keys is not None or one_by_one:
+            # Um execute por linha (na mesma transação) para saber o id criado de cada paciente
+            for position, (name, row) in enumerate(zip(names, rows)):
+                patient_id = conn.execute(insert, row).lastrowid
+                if source_keys is not None:
+                    id_map[source_keys[position]] = patient_id
+                db_utils.index_patient_name(conn, patient_id, name)
+        else:
+            conn.executemany(insert, rows)
+    return id_map
+
+
+def _patient_profiles(conn, patient_ids):
+    """Sexo e data de nascimento dos pacientes informados (DataFrame indexado por id)."""
+    frames = []
+    for start in range(0, len(patient_ids), SQL_VARIABLES_PER_QUERY):
+        chunk = [int(patient_id) for patient_id in patient_ids[start:start + SQL_VARIABLES_PER_QUERY]]
+        frames.append(pd.read_sql_query(
+            f"SELECT id, sex, birth_date FROM patients WHERE id IN ({', '.join('?' for _ in chunk)})",
+            con=conn, params=chunk
+        ))
+    if not frames:
+        return pd.DataFrame(columns=['sex', 'birth_date'])
+    return pd.concat(frames, ignore_index=True).set_index('id')
+
+
+def _fill_body_fat(consultations, profiles, protocol):
+    """Calcula o %GC pelo protocolo nas consultas sem %GC informado, a partir das dobras cutâneas."""
+    missing = consultations['body_fat_percentage'].isna() if 'body_fat_percentage' in consultations else None
+    if missing is None:
+        missing = pd.Series(True, index=consultations.index)
+    if not missing.any():
+        return consultations
+
+    rows = consultations[missing]
+    patient = profiles.reindex(rows['patient_id'].to_numpy())
+    skinfolds = {
+        column[len('skinfold_'):-len('_mm')]: rows[column].to_numpy(dtype=float)
+        for column in rows.columns if column.startswith('skinfold_')
+    }
+    ages = ages_from_birth_dates(patient['birth_date'].to_numpy(), rows['consultation_date'].to_numpy())
+    body_fat = calculate_body_fat_batch(protocol, patient['sex'].to_numpy(), ages, skinfolds)
+    consultations.loc[missing, 'body_fat_percentage'] = body_fat['body_fat_percentage'].to_numpy()
+    # Guarda o protocolo: o %GC calculado passa a ser recalculado se as medidas mudarem
+    consultations.loc[missing, 'body_fat_protocol'] = protocol
+    return consultations
+
+
+def import_consultations(path, patient_ids=None, body_fat_protocol=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Importa consultas de um CSV/Parquet cujas colunas são as da tabela consultations
+    (patient_id e consultation_date obrigatórias; dobras e circunferências com os mesmos nomes do banco).
+    patient_ids: mapa de ids devolvido por import_patients; sem ele, patient_id é o id do paciente no banco.
+    body_fat_protocol: se informado (ex: 'Pollock 7 dobras'), calcula o %GC das consultas que não o trazem.
+    Cada bloco é gravado em uma transação. Retorna o relatório da importação.
+    """
+    report = _ImportReport(path)
+    with db_utils.get_db_connection() as conn:
+        schema = _table_columns(conn, 'consultations')
+    allowed = [column for column in schema if column != 'id']
+
+    for chunk in read_chunks(path, chunk_size):
+        _renumber(chunk, report.rows_read)
+        report.rows_read += len(chunk)
+        _check_columns(chunk.columns, allowed, ('patient_id', 'consultation_date'), path)
+
+        consultations = pd.DataFrame(index=chunk.index)
+        if patient_ids is None:
+            patient_id, invalid = normalize_numbers(chunk['patient_id'])
+        else:
+            patient_id = _source_keys(chunk['patient_id']).map(patient_ids).astype(float)
+            invalid = pd.Series(False, index=chunk.index)
+        consultations['patient_id'] = patient_id
+        consultations['consultation_date'], invalid_dates = normalize_dates(chunk['consultation_date'])
+        rejected = report.reject(chunk, invalid_dates | consultations['consultation_date'].isna(), "data da consulta inválida")
+        for column in chunk.columns.drop(['patient_id', 'consultation_date']):
+            if schema[column] == 'REAL':
+                consultations[column], invalid_numbers = normalize_numbers(chunk[column])
+                rejected |= report.reject(chunk, invalid_numbers, f"{column} não é um número")
+            else:
+                consultations[column] = _text(chunk[column])
+
+        with db_utils.get_db_connection() as conn:
+            known_ids = consultations['patient_id'].dropna().unique()
+            profiles = _patient_profiles(conn, known_ids)
+        unknown_patient = invalid | ~consultations['patient_id'].isin(profiles.index)
+        rejected |= report.reject(chunk, unknown_patient, "paciente não encontrado")
+        consultations = consultations[~rejected]
+        consultations['patient_id'] = consultations['patient_id'].astype(int)
+        report.rows_rejected += int(rejected.sum())
+
+        if body_fat_protocol and len(consultations):
+            consultations = _fill_body_fat(consultations, profiles, body_fat_protocol)
+
+        columns = list(consultations.columns)
+        write_queue.call(
+            _insert_consultations, columns, list(_rows(consultations, columns)),
+            [int(pid) for pid in consultations['patient_id'].unique()]
+        )
+        report.rows_imported += len(consultations)
+
+    db_utils.query_cache.invalidate('patient_directory')
+    return report.as_dict()
+
+
+def _insert_consultations(columns, rows, patient_ids):
+    """Grava um bloco de consultas em uma transação."""
+    with db_utils.transaction() as conn:
+        conn.executemany(
+            f"INSERT INTO consultations ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})", rows
+        )
+    db_utils.query_cache.invalidate(*[('consultations', patient_id) for patient_id in patient_ids])
+
+
+# --- Exportação ---
+
+def _parquet_type(pyarrow, declared_type):
+    if declared_type == 'INTEGER':
+        return pyarrow.int64()
+    if declared_type == 'REAL':
+        return pyarrow.float64()
+    return pyarrow.string()
+
+
+def export_table(table, path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Exporta a tabela (patients ou consultations) para CSV/Parquet, lendo do banco em blocos com
+    fetchmany: nem a tabela nem o arquivo passam inteiros pela memória.
+    O arquivo gerado pode ser importado de volta (o 'id' dos pacientes liga as consultas).
+    Retorna um dicionário com rows, seconds e rows_per_second.
+    """
+    if table not in EXPORT_TABLES:
+        raise ValueError(f"Tabela não exportável: {table} (use {', '.join(EXPORT_TABLES)})")
+    file_format = _file_format(path)
+    start = time.perf_counter()
+    rows_written = 0
+
+    with db_utils.get_db_connection() as conn:
+        schema = _table_columns(conn, table)
+        columns = list(schema)
+        cursor = conn.execute(f"SELECT {', '.join(columns)} FROM {table} ORDER BY id")
+        # Campos cifrados saem decifrados: o arquivo serve para levar os dados a outro banco (ou chave)
+        sealed = [
+            (position, column) for position, column in enumerate(columns)
+            if table == 'patients' and column in db_utils.ENCRYPTED_PATIENT_COLUMNS
+        ] if crypto.is_enabled() else []
+
+        def fetch():
+            rows = cursor.fetchmany(chunk_size)
+            if sealed and rows:
+                rows = [list(row) for row in rows]
+                for position, column in sealed:
+                    for row, plain in zip(rows, crypto.decrypt_many((row[position] for row in rows), column)):
+                        row[position] = plain
+            return rows
+
+        if file_format == 'csv':
+            with open(path, 'w', newline='', encoding='utf-8') as file:
+                writer = csv.writer(file)
+                writer.writerow(columns)
+                while rows := fetch():
+                    writer.writerows(rows)
+                    rows_written += len(rows)
+        else:
+            pyarrow = _require_pyarrow()
+            arrow_schema = pyarrow.schema([(column, _parquet_type(pyarrow, schema[column])) for column in columns])
+            with pyarrow.parquet.ParquetWriter(path, arrow_schema) as writer:
+                while rows := fetch():
+                    arrays = [
+                        pyarrow.array(values, type=field.type)
+                        for values, field in zip(zip(*rows), arrow_schema)
+                    ]
+                    writer.write_batch(pyarrow.record_batch(arrays, schema=arrow_schema))
+                    rows_written += len(rows)
+
+    seconds = time.perf_counter() - start
+    return {'file': path, 'rows': rows_written, 'seconds': seconds,
+            'rows_per_second': rows_written / seconds if seconds else 0.0}
@@ -2,6 +2,10 @@
 
 import math
 from datetime import date
+import numpy as np
+from src.instrumentation import instrumented
+from src.lazy_imports import lazy_import
+pd = lazy_import('pandas')
 
 def _calculate_age(birth_date_str):
     """Calcula a idade a partir da string de data de nascimento (YYYY-MM-DD)."""
@@ -17,28 +21,24 @@ def _pollock7(sex, age, skinfolds):
         return None # Retorna None se alguma dobra necessária estiver faltando
 
     sum_7_folds = sum(skinfolds[k] for k in required_folds)
-    print(sum_7_folds)
-    print(sex.lower())
-    print(age)
 
-    if sex.lower() == 'masculino':
+    if sex == 'masculino':
         body_density = 1.112 - (0.00043499 * sum_7_folds) + (0.00000055 * (sum_7_folds**2)) - (0.00028826 * age)
-    elif sex.lower() == 'feminino':
+    elif sex == 'feminino':
         body_density = 1.097 - (0.00046971 * sum_7_folds) + (0.00000056 * (sum_7_folds**2)) - (0.00012828 * age)
     else:
         return None
-    
-    print(body_density)
+
     return (495/body_density)-450
 
 def _pollock3(sex, age, skinfolds):
     """Calcula a Densidade Corporal usando o protocolo de Pollock de 3 dobras."""
-    if sex.lower() == 'masculino':
+    if sex == 'masculino':
         required_folds = ['chest', 'abdominal', 'thigh']
         if not all(k in skinfolds and skinfolds[k] > 0 for k in required_folds): return None
         sum_3_folds = sum(skinfolds[k] for k in required_folds)
         body_density = 1.10938 - (0.0008267 * sum_3_folds) + (0.0000016 * (sum_3_folds**2)) - (0.0002574 * age)
-    elif sex.lower() == 'feminino':
+    elif sex == 'feminino':
         required_folds = ['triceps', 'suprailiac', 'thigh']
         if not all(k in skinfolds and skinfolds[k] > 0 for k in required_folds): return None
         sum_3_folds = sum(skinfolds[k] for k in required_folds)
@@ -58,14 +58,14 @@ def _durnin_womersley4(sex, age, skinfolds):
     log_sum = math.log10(sum_4_folds)
     
     # Coeficientes C e M variam com idade e sexo
-    if sex.lower() == 'masculino':
+    if sex == 'masculino':
         if age < 17: c, m = 1.1533, 0.0643
         elif age <= 19: c, m = 1.1620, 0.0630
         elif age <= 29: c, m = 1.1631, 0.0632
         elif age <= 39: c, m = 1.1422, 0.0544
         elif age <= 49: c, m = 1.1620, 0.0700
         else: c, m = 1.1715, 0.0779
-    elif sex.lower() == 'feminino':
+    elif sex == 'feminino':
         if age < 17: c, m = 1.1369, 0.0598
         elif age <= 19: c, m = 1.1549, 0.0678
         elif age <= 29: c, m = 1.1599, 0.0717
@@ -78,22 +78,162 @@ def _durnin_womersley4(sex, age, skinfolds):
     body_density = c - (m * log_sum)
     return (495/body_density)-450
 
+_PROTOCOLS = {
+    'Pollock 7 dobras': _pollock7,
+    'Pollock 3 dobras': _pollock3,
+    'Durnin & Womersley 4 dobras': _durnin_womersley4,
+}
+
+@instrumented()
 def calculate_body_fat(protocol, birth_date_str, sex, skinfolds):
     """
     Função principal que seleciona o protocolo e calcula o percentual de gordura.
     skinfolds: dicionário com as dobras, ex: {'triceps': 10, 'abdominal': 15, ...}
     """
     age = _calculate_age(birth_date_str)
-    
-    body_fat = None
-    
+    protocol_function = _PROTOCOLS.get(protocol)
+    if protocol_function is None or sex is None:
+        return None # Retorna None se o protocolo for inválido
+
+    # Normaliza o sexo uma única vez; os protocolos comparam com 'masculino'/'feminino'
+    return protocol_function(sex.lower(), age, skinfolds) # None se faltarem dados
+
+
+# --- Cálculo em lote (vetorizado) ---
+# Usado para recalcular milhares de consultas de uma vez quando um protocolo muda.
+# Os coeficientes são os mesmos das funções acima, organizados em tabelas indexadas por sexo.
+
+SEX_CODES = {'masculino': 0, 'feminino': 1}
+
+_POLLOCK7_FOLDS = ('chest', 'midaxillary', 'triceps', 'subscapular', 'abdominal', 'suprailiac', 'thigh')
+_POLLOCK3_FOLDS = (('chest', 'abdominal', 'thigh'), ('triceps', 'suprailiac', 'thigh'))  # por sexo
+_DURNIN_WOMERSLEY4_FOLDS = ('biceps', 'triceps', 'subscapular', 'suprailiac')
+
+# Densidade = a - b*soma + c*soma² - d*idade; uma linha por sexo (masculino, feminino)
+_POLLOCK7_COEFFICIENTS = np.array([
+    [1.112, 0.00043499, 0.00000055, 0.00028826],
+    [1.097, 0.00046971, 0.00000056, 0.00012828],
+])
+_POLLOCK3_COEFFICIENTS = np.array([
+    [1.10938, 0.0008267, 0.0000016, 0.0002574],
+    [1.0994921, 0.0009929, 0.0000023, 0.0001392],
+])
+
+# Durnin & Womersley: coeficientes (c, m) por sexo e faixa etária.
+# Faixas: <17, 17-19, 20-29, 30-39, 40-49, 50+ (idade em anos completos)
+_DURNIN_WOMERSLEY_AGE_LIMITS = np.array([16, 19, 29, 39, 49])
+_DURNIN_WOMERSLEY_COEFFICIENTS = np.array([
+    [[1.1533, 0.0643], [1.1620, 0.0630], [1.1631, 0.0632], [1.1422, 0.0544], [1.1620, 0.0700], [1.1715, 0.0779]],
+    [[1.1369, 0.0598], [1.1549, 0.0678], [1.1599, 0.0717], [1.1423, 0.0632], [1.1333, 0.0612], [1.1339, 0.0645]],
+])
+
+
+def encode_sexes(sexes):
+    """Converte os sexos para códigos 0 (masculino) / 1 (feminino); -1 para valores desconhecidos."""
+    # factorize agrupa os valores repetidos: só os distintos (poucos) passam pelo lower()/lookup
+    codes, uniques = pd.factorize(np.asarray(sexes, dtype=object))
+    lookup = np.array([SEX_CODES.get(str(value).lower(), -1) for value in uniques] + [-1], dtype=np.int8)
+    return lookup[codes]  # Código -1 do factorize (valor ausente) cai no último item: -1
+
+
+def _fold_sum(skinfolds, folds, n_rows):
+    """Soma as dobras pedidas linha a linha; NaN se alguma estiver ausente ou não for positiva."""
+    columns = [
+        np.asarray(skinfolds[fold], dtype=float) if fold in skinfolds else np.full(n_rows, np.nan)
+        for fold in folds
+    ]
+    matrix = np.column_stack(columns)
+    matrix[~(matrix > 0)] = np.nan
+    return matrix.sum(axis=1)
+
+
+def _quadratic_density(coefficients, sex_codes, ages, fold_sum):
+    """Aplica a equação quadrática de Pollock com os coeficientes do sexo de cada linha."""
+    a, b, c, d = coefficients[np.maximum(sex_codes, 0)].T
+    return a - (b * fold_sum) + (c * fold_sum**2) - (d * ages)
+
+
+def _pollock7_batch(sex_codes, ages, skinfolds):
+    """Densidade corporal pelo protocolo de Pollock de 7 dobras, para todas as linhas."""
+    fold_sum = _fold_sum(skinfolds, _POLLOCK7_FOLDS, len(ages))
+    return _quadratic_density(_POLLOCK7_COEFFICIENTS, sex_codes, ages, fold_sum)
+
+
+def _pollock3_batch(sex_codes, ages, skinfolds):
+    """Densidade corporal pelo protocolo de Pollock de 3 dobras (dobras diferentes por sexo)."""
+    male_sum = _fold_sum(skinfolds, _POLLOCK3_FOLDS[0], len(ages))
+    female_sum = _fold_sum(skinfolds, _POLLOCK3_FOLDS[1], len(ages))
+    fold_sum = np.where(sex_codes == 1, female_sum, male_sum)
+    return _quadratic_density(_POLLOCK3_COEFFICIENTS, sex_codes, ages, fold_sum)
+
+
+def _durnin_womersley4_batch(sex_codes, ages, skinfolds):
+    """Densidade corporal por Durnin & Womersley, com coeficientes escolhidos por tabela (sexo x faixa etária)."""
+    fold_sum = _fold_sum(skinfolds, _DURNIN_WOMERSLEY4_FOLDS, len(ages))
+    age_bands = np.searchsorted(_DURNIN_WOMERSLEY_AGE_LIMITS, np.floor(ages), side='left')
+    c, m = _DURNIN_WOMERSLEY_COEFFICIENTS[np.maximum(sex_codes, 0), age_bands].T
+    # searchsorted põe NaN depois de todos os limites (faixa 50+): sem idade, não há faixa nem resultado
+    return np.where(np.isnan(ages), np.nan, c - (m * np.log10(fold_sum)))
+
+
+def required_skinfolds(protocol, sex):
+    """Dobras que o protocolo usa para o sexo informado (ValueError para protocolo desconhecido)."""
     if protocol == 'Pollock 7 dobras':
-        body_fat = _pollock7(sex, age, skinfolds)
-        return body_fat
-    elif protocol == 'Pollock 3 dobras':
-        body_fat = _pollock3(sex, age, skinfolds)
-        return body_fat
-    elif protocol == 'Durnin & Womersley 4 dobras':
-        body_fat = _durnin_womersley4(sex, age, skinfolds)
-        return body_fat
-    return None # Retorna None se o protocolo for inválido ou faltarem dados
\ No newline at end of file
+        return _POLLOCK7_FOLDS
+    if protocol == 'Pollock 3 dobras':
+        return _POLLOCK3_FOLDS[1 if str(sex).lower() == 'feminino' else 0]
+    if protocol == 'Durnin & Womersley 4 dobras':
+        return _DURNIN_WOMERSLEY4_FOLDS
+    raise ValueError(f"Protocolo desconhecido: {protocol}")
+
+
+_BATCH_PROTOCOLS = {
+    'Pollock 7 dobras': _pollock7_batch,
+    'Pollock 3 dobras': _pollock3_batch,
+    'Durnin & Womersley 4 dobras': _durnin_womersley4_batch,
+}
+
+
+def ages_from_birth_dates(birth_dates, reference_date=None):
+    """
+    Versão vetorizada de _calculate_age: idades (em anos completos) para uma sequência de datas YYYY-MM-DD.
+    reference_date: data de referência única (padrão: hoje) ou uma sequência alinhada de datas
+    YYYY-MM-DD (ex: a idade na data de cada consulta). Datas inválidas resultam em NaN.
+    """
+    if reference_date is None:
+        reference_date = date.today()
+    dates = pd.to_datetime(pd.Series(np.asarray(birth_dates, dtype=object)), format='%Y-%m-%d', errors='coerce')
+    if isinstance(reference_date, date):
+        year, month, day = reference_date.year, reference_date.month, reference_date.day
+    else:
+        references = pd.to_datetime(
+            pd.Series(np.asarray(reference_date, dtype=object)), format='%Y-%m-%d', errors='coerce'
+        )
+        year, month, day = references.dt.year, references.dt.month, references.dt.day
+    birthday_pending = (dates.dt.month > month) | ((dates.dt.month == month) & (dates.dt.day > day))
+    ages = year - dates.dt.year - birthday_pending.astype(int)
+    return ages.to_numpy(dtype=float)
+
+
+@instrumented()
+def calculate_body_fat_batch(protocol, sexes, ages, skinfolds):
+    """
+    Versão vetorizada de calculate_body_fat, para muitos pacientes/consultas de uma só vez.
+    sexes: sequência com 'masculino'/'feminino' (qualquer capitalização)
+    ages: sequência com as idades em anos completos (ver ages_from_birth_dates)
+    skinfolds: DataFrame ou dicionário de arrays com uma coluna por dobra, ex: {'triceps': [...], ...}
+    Retorna um DataFrame com 'body_density' e 'body_fat_percentage' (NaN onde faltarem dados).
+    """
+    density_function = _BATCH_PROTOCOLS.get(protocol)
+    if density_function is None:
+        raise ValueError(f"Protocolo desconhecido: {protocol}")
+
+    sex_codes = encode_sexes(sexes)
+    ages = np.asarray(ages, dtype=float)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        body_density = density_function(sex_codes, ages, skinfolds)
+        body_density = np.where(sex_codes >= 0, body_density, np.nan)
+        body_fat = (495 / body_density) - 450
+
+    index = skinfolds.index if isinstance(skinfolds, pd.DataFrame) else None
+    return pd.DataFrame({'body_density': body_density, 'body_fat_percentage': body_fat}, index=index)
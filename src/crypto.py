@@ -0,0 +1,235 @@
+# src/crypto.py
+
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+from collections import OrderedDict
+from src.text_utils import normalize_text
+
+# Criptografia de campos sensíveis dos pacientes (nome, contato, histórico) no banco.
+# Cada valor é cifrado com AES-256-GCM (nonce aleatório, nome da coluna como dado associado)
+# e gravado como texto "enc1:<base64>". Só conta como cifrado o valor que se decifra com a chave:
+# o resto (bancos ainda não migrados por scripts/encrypt_patients.py, ou texto digitado que por
+# acaso começa com "enc1:") é texto puro e passa direto pela decifragem.
+# A chave mestra (32 bytes em base64) vem da variável de ambiente NUTRI_ENCRYPTION_KEY ou de
+# um arquivo de chave (NUTRI_KEY_FILE, padrão database/nutri.key); sem chave, nada é cifrado.
+# Da chave mestra saem, por HMAC, a chave de cifragem e a do índice cego (blind index) de nomes.
+KEY_ENV = 'NUTRI_ENCRYPTION_KEY'
+KEY_FILE_ENV = 'NUTRI_KEY_FILE'
+DEFAULT_KEY_FILE = os.path.join('database', 'nutri.key')
+ENCRYPTED_PREFIX = 'enc1:'
+NONCE_BYTES = 12
+TAG_BYTES = 16  # Etiqueta de autenticação do AES-GCM, no fim do texto cifrado
+DECRYPTION_CACHE_SIZE = 32768  # Valores decifrados mantidos em memória (LRU; cobre o diretório de uma clínica grande)
+# Índice cego: HMAC (truncado em 8 bytes) de cada prefixo do nome normalizado, de
+# BLIND_INDEX_MIN_PREFIX a BLIND_INDEX_MAX_PREFIX letras — a mesma busca por começo do nome de
+# name_search, sem guardar o nome em claro. Em troca, quem tem o banco vê quantos pacientes
+# compartilham um mesmo prefixo (não qual é).
+BLIND_INDEX_MIN_PREFIX = 3
+BLIND_INDEX_MAX_PREFIX = 12
+
+_keys = None  # (chave de cifragem, chave do índice cego) ou False sem chave configurada
+_keys_lock = threading.Lock()
+_cipher = None
+_invalid_tag = None  # cryptography.exceptions.InvalidTag, carregada junto com a chave
+_cache = OrderedDict()  # (coluna, valor cifrado) -> texto
+_cache_lock = threading.Lock()
+cache_hits = 0
+cache_misses = 0
+
+
+def _require_cryptography():
+    try:
+        from cryptography.exceptions import InvalidTag
+        from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+    except ImportError as error:
+        raise ImportError(
+            "A criptografia dos dados dos pacientes precisa do pacote cryptography (pip install cryptography)."
+        ) from error
+    return AESGCM, InvalidTag
+
+
+def _read_master_key():
+    encoded = os.environ.get(KEY_ENV)
+    if not encoded:
+        path = os.environ.get(KEY_FILE_ENV, DEFAULT_KEY_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding='ascii') as file:
+            encoded = file.read().strip()
+    key = base64.urlsafe_b64decode(encoded)
+    if len(key) != 32:
+        raise ValueError("A chave de criptografia deve ter 32 bytes (base64).")
+    return key
+
+
+def _get_keys():
+    global _keys, _cipher, _invalid_tag
+    keys = _keys
+    if keys is None:
+        with _keys_lock:
+            if _keys is None:
+                master = _read_master_key()
+                if master is None:
+                    _keys = False
+                else:
+                    _keys = (
+                        hmac.new(master, b'nutri-app/encryption', hashlib.sha256).digest(),
+                        hmac.new(master, b'nutri-app/blind-index', hashlib.sha256).digest(),
+                    )
+                    aesgcm, _invalid_tag = _require_cryptography()
+                    _cipher = aesgcm(_keys[0])
+            keys = _keys
+    return keys
+
+
+def is_enabled():
+    """Verdadeiro quando há chave configurada: as escritas passam a cifrar os campos sensíveis."""
+    return bool(_get_keys())
+
+
+def reload_key():
+    """Esquece a chave carregada (e o cache), para ler de novo a variável de ambiente/arquivo."""
+    global _keys, _cipher
+    with _keys_lock:
+        _keys, _cipher = None, None
+    clear_cache()
+
+
+def generate_key_file(path=None):
+    """Cria um arquivo de chave novo (erro se já existir: trocar a chave tornaria os dados ilegíveis)."""
+    path = path or os.environ.get(KEY_FILE_ENV, DEFAULT_KEY_FILE)
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    # 'x': nunca sobrescreve; 0o600: só o dono do arquivo lê a chave
+    descriptor = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(descriptor, 'w', encoding='ascii') as file:
+        file.write(base64.urlsafe_b64encode(secrets.token_bytes(32)).decode() + '\n')
+    reload_key()
+    return path
+
+
+def _unseal(value, column):
+    """
+    Texto de um valor cifrado por encrypt() nesta coluna, com a chave atual; None para qualquer
+    outro valor. O prefixo sozinho não basta (um contato pode começar com "enc1:"): o valor só é
+    tratado como cifrado se o AES-GCM confirmar a autenticidade dele.
+    """
+    if not isinstance(value, str) or not value.startswith(ENCRYPTED_PREFIX) or not is_enabled():
+        return None
+    try:
+        raw = base64.b64decode(value[len(ENCRYPTED_PREFIX):], altchars=b'-_', validate=True)
+    except ValueError:
+        return None
+    if len(raw) < NONCE_BYTES + TAG_BYTES:
+        return None
+    try:
+        return _cipher.decrypt(raw[:NONCE_BYTES], raw[NONCE_BYTES:], column.encode()).decode('utf-8')
+    except (_invalid_tag, UnicodeDecodeError):
+        return None
+
+
+def is_encrypted(value, column):
+    """Verdadeiro se o valor foi cifrado por encrypt() nesta coluna, com a chave atual."""
+    return _unseal(value, column) is not None
+
+
+def encrypt(value, column):
+    """Cifra um valor de texto (None fica None; sem chave configurada, volta como está)."""
+    if value is None or not is_enabled() or is_encrypted(value, column):
+        return value
+    nonce = secrets.token_bytes(NONCE_BYTES)
+    sealed = _cipher.encrypt(nonce, str(value).encode('utf-8'), column.encode())
+    return ENCRYPTED_PREFIX + base64.urlsafe_b64encode(nonce + sealed).decode()
+
+
+def decrypt(value, column):
+    """
+    Decifra um valor; texto puro, None e valores que não se decifram com a chave atual (ex: texto
+    digitado que começa com "enc1:", ou qualquer valor quando não há chave) voltam como estão.
+    O resultado fica em um cache LRU limitado: cada valor cifrado é único (nonce aleatório),
+    então a entrada nunca fica velha.
+    """
+    global cache_hits, cache_misses
+    if not isinstance(value, str) or not value.startswith(ENCRYPTED_PREFIX):
+        return value
+    key = (column, value)
+    with _cache_lock:
+        plain = _cache.get(key)
+        if plain is not None:
+            _cache.move_to_end(key)
+            cache_hits += 1
+            return plain
+        cache_misses += 1
+    plain = _unseal(value, column)
+    if plain is None:
+        plain = value
+    with _cache_lock:
+        _cache[key] = plain
+        if len(_cache) > DECRYPTION_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return plain
+
+
+def decrypt_many(values, column):
+    """Decifra uma sequência de valores; as consultas ao cache são feitas de uma vez, sob um só lock."""
+    global cache_hits
+    values = list(values)
+    plains = [None] * len(values)
+    missing = []
+    with _cache_lock:
+        for position, value in enumerate(values):
+            if not isinstance(value, str) or not value.startswith(ENCRYPTED_PREFIX):
+                plains[position] = value
+                continue
+            plain = _cache.get((column, value))
+            if plain is None:
+                missing.append(position)
+            else:
+                _cache.move_to_end((column, value))
+                plains[position] = plain
+                cache_hits += 1
+    for position in missing:
+        plains[position] = decrypt(values[position], column)
+    return plains
+
+
+def clear_cache():
+    global cache_hits, cache_misses
+    with _cache_lock:
+        _cache.clear()
+        cache_hits = cache_misses = 0
+
+
+def cache_stats():
+    return {'entries': len(_cache), 'max_entries': DECRYPTION_CACHE_SIZE, 'hits': cache_hits, 'misses': cache_misses}
+
+
+def _term(text):
+    digest = hmac.new(_get_keys()[1], text.encode('utf-8'), hashlib.sha256).digest()
+    return int.from_bytes(digest[:8], 'big', signed=True)  # Cabe em um INTEGER do SQLite
+
+
+def blind_index_terms(name):
+    """Termos do índice cego de um nome: um por prefixo do nome normalizado (sem acentos, minúsculo)."""
+    normalized = normalize_text(name)
+    if not is_enabled() or not normalized:
+        return set()
+    return {
+        _term(normalized[:length])
+        for length in range(BLIND_INDEX_MIN_PREFIX, min(len(normalized), BLIND_INDEX_MAX_PREFIX) + 1)
+    }
+
+
+def query_term(query):
+    """
+    Termo do índice cego para uma busca pelo começo do nome (cortado em BLIND_INDEX_MAX_PREFIX letras).
+    Retorna None quando a busca é curta demais para o índice: aí é preciso percorrer os nomes decifrados.
+    Como o termo só cobre as primeiras letras, quem busca ainda confere o nome decifrado.
+    """
+    normalized = normalize_text(query)
+    if len(normalized) < BLIND_INDEX_MIN_PREFIX:
+        return None
+    return _term(normalized[:BLIND_INDEX_MAX_PREFIX])
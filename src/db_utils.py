@@ -1,90 +1,718 @@
 import sqlite3
 import os
-import pandas as pd
+import queue
+import threading
+import time
+import bisect
+import functools
+import inspect
+import itertools
+import json
+from contextlib import contextmanager
+from src.query_cache import QueryCache
+from src.instrumentation import InstrumentedConnection, instrumented
+from src.text_utils import normalize_text
+from src.calculations import required_skinfolds
+from src import crypto
+from src.lazy_imports import lazy_import
+pd = lazy_import('pandas')
+reports = lazy_import('src.reports')  # Só para apagar os PDFs de pacientes excluídos
 
 DATABASE_FILE = os.path.join('database', 'nutri.db')
 
-def get_db_connection():
-    """Cria e retorna uma conexão com o banco de dados."""
-    conn = sqlite3.connect(DATABASE_FILE)
+# --- Configurações do pool de conexões ---
+POOL_SIZE = 8  # Máximo de conexões ociosas mantidas abertas por processo
+BUSY_TIMEOUT_MS = 5000  # Quanto tempo esperar pelo lock de escrita antes de falhar
+CACHED_STATEMENTS = 256  # Statements preparados reutilizados por conexão
+PATIENT_PAGE_SIZE = 50  # Pacientes por página no diretório
+QUERY_CACHE_SIZE = 2048  # Resultados de leitura mantidos em memória
+QUERY_CACHE_TTL_SECONDS = 300  # Limite de desatualização para escritas feitas fora de transaction()
+CHANGE_CHECK_INTERVAL_SECONDS = 1.0  # Intervalo mínimo entre conferências de gravações de outros processos
+
+# PRAGMAs aplicados a cada conexão nova.
+# WAL permite leitores concorrentes com um escritor; synchronous=NORMAL é seguro com WAL
+# e evita um fsync por commit; cache_size negativo é em KiB (-16000 ≈ 16 MB).
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -16000",
+    "PRAGMA mmap_size = 268435456",
+    "PRAGMA temp_store = MEMORY",
+    # Chaves estrangeiras: consultas e planos são excluídos junto com o paciente (migração 10)
+    "PRAGMA foreign_keys = ON",
+    f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}",
+)
+
+
+def _open_connection(database_file):
+    """Abre uma conexão nova já configurada com os PRAGMAs de desempenho."""
+    conn = sqlite3.connect(
+        database_file,
+        timeout=BUSY_TIMEOUT_MS / 1000,
+        cached_statements=CACHED_STATEMENTS,
+        # A conexão circula entre as threads do Streamlit, mas nunca é usada por duas ao mesmo tempo
+        check_same_thread=False,
+        # Autocommit: leituras não abrem transação; escritas usam transaction() explicitamente
+        isolation_level=None,
+        # Cursores medidos por src/instrumentation.py (sem custo relevante quando desligada)
+        factory=InstrumentedConnection,
+    )
     # Retorna as linhas como dicionários para fácil acesso por nome de coluna
     conn.row_factory = sqlite3.Row
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma)
     return conn
 
+
+class ConnectionPool:
+    """Pool de conexões SQLite de longa duração, compartilhado por todas as sessões do processo."""
+
+    def __init__(self, database_file, size=POOL_SIZE):
+        self.database_file = database_file
+        self._idle = queue.LifoQueue(maxsize=size)
+
+    def acquire(self):
+        """Retorna uma conexão ociosa do pool ou abre uma nova se o pool estiver vazio."""
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return _open_connection(self.database_file)
+
+    def release(self, conn):
+        """Devolve a conexão ao pool (ou a fecha, se o pool já estiver cheio)."""
+        if conn.in_transaction:
+            conn.rollback()
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def close_all(self):
+        """Fecha todas as conexões ociosas."""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    """Retorna o pool do processo, recriando-o se DATABASE_FILE tiver mudado."""
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool.database_file != DATABASE_FILE:
+            if _pool is not None:
+                _pool.close_all()
+            _pool = ConnectionPool(DATABASE_FILE)
+        return _pool
+
+
+def close_all_connections():
+    """Fecha as conexões mantidas pelo pool (útil ao encerrar o processo ou em scripts)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close_all()
+            _pool = None
+
+
+@contextmanager
+def get_db_connection():
+    """Empresta uma conexão do pool; ela é devolvida automaticamente ao sair do bloco with."""
+    pool = _get_pool()
+    conn = pool.acquire()
+    try:
+        yield conn
+    finally:
+        pool.release(conn)
+
+
+_write_batch = threading.local()  # Conexão do lote aberto por write_batch() nesta thread
+_commit_callbacks = threading.local()  # Pilha (uma lista por transaction() aberta) de funções de on_commit()
+
+
+def on_commit(callback):
+    """
+    Agenda callback() para depois do commit da transaction() aberta nesta thread (ex: marcar um
+    objeto em memória como salvo). Se a gravação for desfeita, ou se o commit do lote da fila de
+    escrita falhar, a função não é chamada. Fora de transaction(), sobe RuntimeError.
+    """
+    stack = getattr(_commit_callbacks, 'stack', None)
+    if not stack:
+        raise RuntimeError("on_commit() precisa de uma transaction() aberta.")
+    stack[-1].append(callback)
+
+
+@contextmanager
+def _collect_commit_callbacks():
+    """Abre um nível da pilha de on_commit(); devolve a lista com as funções agendadas nele."""
+    stack = _commit_callbacks.__dict__.setdefault('stack', [])
+    callbacks = []
+    stack.append(callbacks)
+    try:
+        yield callbacks
+    finally:
+        stack.pop()
+
+
+@contextmanager
+def transaction():
+    """
+    Abre uma transação de escrita (BEGIN IMMEDIATE) em uma conexão do pool.
+    Faz commit ao sair do bloco with, ou rollback se ocorrer uma exceção.
+    Dentro de write_batch() (fila de escrita, src/write_queue.py), vira um SAVEPOINT do lote:
+    o rollback desfaz só esta gravação, e o commit fica para o fim do lote (assim como as
+    funções agendadas com on_commit()).
+    """
+    batch_conn = getattr(_write_batch, 'conn', None)
+    if batch_conn is not None:
+        batch_conn.execute("SAVEPOINT write_job")
+        with _collect_commit_callbacks() as callbacks:
+            try:
+                yield batch_conn
+            except BaseException:
+                batch_conn.execute("ROLLBACK TO write_job")
+                batch_conn.execute("RELEASE write_job")
+                raise
+            batch_conn.execute("RELEASE write_job")
+        _commit_callbacks.stack[-1].extend(callbacks)  # Passam para o lote
+        return
+
+    with get_db_connection() as conn:
+        # IMMEDIATE reserva o lock de escrita já no início, evitando "database is locked"
+        # no meio da transação quando duas sessões tentam escrever ao mesmo tempo
+        conn.execute("BEGIN IMMEDIATE")
+        with _collect_commit_callbacks() as callbacks:
+            try:
+                yield conn
+                _record_own_change(conn)
+            except BaseException:
+                conn.rollback()
+                raise
+            try:
+                conn.commit()
+            except BaseException:
+                _forget_changes()  # O contador gravado não vale mais: recomeça da próxima leitura
+                raise
+    for callback in callbacks:
+        callback()
+
+
+@contextmanager
+def write_batch():
+    """
+    Uma transação para várias gravações seguidas na mesma thread: cada transaction() aberta
+    dentro do bloco vira um SAVEPOINT, e o commit (único) acontece ao sair do bloco.
+    """
+    with transaction() as conn:
+        _write_batch.conn = conn
+        try:
+            yield conn
+        finally:
+            _write_batch.conn = None
+
+
+# --- Cache das funções de leitura ---
+# As leituras abaixo são servidas da memória enquanto os dados não mudam; cada função de
+# escrita invalida só as tags que afetou:
+#   'patient_directory'        lista/diretório de pacientes (nomes, ordem, paginação)
+#   ('patient', id)            detalhes de um paciente
+#   ('consultations', id)      consultas de um paciente (e a data da última consulta)
+#   'patient_archive'          pacientes excluídos guardados no arquivo
+query_cache = QueryCache(maxsize=QUERY_CACHE_SIZE, ttl_seconds=QUERY_CACHE_TTL_SECONDS)
+
+
+# --- Gravações de outros processos ---
+# O query_cache é por processo: o Streamlit não vê as invalidações feitas pela API, e vice-versa.
+# Cada transaction() incrementa o contador do banco (data_changes, migração 14) antes do commit;
+# as leituras em cache conferem o contador (no máximo a cada CHANGE_CHECK_INTERVAL_SECONDS) e, se
+# ele andou mais do que as gravações deste processo explicam, esvaziam o cache.
+_changes = {}  # DATABASE_FILE -> (último valor do contador conhecido, próxima conferência)
+_changes_lock = threading.Lock()
+
+
+def mark_data_changed(conn):
+    """
+    Incrementa o contador de gravações na transação aberta em conn e devolve o novo valor.
+    transaction() já faz isso; chame antes do commit nas gravações com conexão própria (scripts).
+    """
+    conn.execute("UPDATE data_changes SET counter = counter + 1 WHERE id = 1")
+    return conn.execute("SELECT counter FROM data_changes WHERE id = 1").fetchone()[0]
+
+
+def _observe_changes(counter, own_change=False):
+    """Guarda o valor lido do contador; esvazia o cache se outro processo gravou desde o último."""
+    with _changes_lock:
+        known = _changes.get(DATABASE_FILE, (None, 0.0))[0]
+        # Uma gravação deste processo anda o contador em 1; qualquer salto além disso veio de fora
+        external = known is not None and counter - own_change > known
+        _changes[DATABASE_FILE] = (
+            counter if known is None else max(known, counter), time.monotonic() + CHANGE_CHECK_INTERVAL_SECONDS
+        )
+    if external:
+        query_cache.clear()
+
+
+def _record_own_change(conn):
+    # Ainda com o lock de escrita: as gravações deste processo passam por aqui uma de cada vez
+    _observe_changes(mark_data_changed(conn), own_change=True)
+
+
+def _forget_changes():
+    with _changes_lock:
+        _changes.pop(DATABASE_FILE, None)
+    query_cache.clear()
+
+
+def check_external_changes():
+    """
+    Esvazia o cache de leituras se outro processo gravou no banco. Chamada pelas leituras em cache;
+    consulta o banco no máximo a cada CHANGE_CHECK_INTERVAL_SECONDS.
+    """
+    state = _changes.get(DATABASE_FILE)
+    if state is not None and time.monotonic() < state[1]:
+        return
+    with get_db_connection() as conn:
+        counter = conn.execute("SELECT counter FROM data_changes WHERE id = 1").fetchone()[0]
+    _observe_changes(counter)
+
+
+def _cached(tags_for_call):
+    """
+    Decorador que guarda o resultado da função no query_cache.
+    tags_for_call(arguments, result) recebe os argumentos nomeados e o resultado e devolve as tags.
+    DataFrames são copiados na saída, para que quem chama possa alterá-los sem afetar o cache.
+    """
+    def decorator(function):
+        signature = inspect.signature(function)
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            arguments = bound.arguments
+            check_external_changes()
+            key = (DATABASE_FILE, function.__name__, *arguments.values())
+            result = query_cache.get_or_load(
+                key,
+                lambda: function(*bound.args, **bound.kwargs),
+                lambda value: tags_for_call(arguments, value)
+            )
+            return result.copy() if isinstance(result, pd.DataFrame) else result
+        return wrapper
+    return decorator
+
+
+def cache_stats():
+    """Contadores de acertos/faltas do cache de leituras (para diagnóstico)."""
+    return query_cache.stats()
+
+
+# Campos dos pacientes cifrados no banco quando há chave configurada (src/crypto.py).
+# Com a criptografia ligada, name_search fica vazio e a busca por nome usa o índice cego
+# patient_name_index; as leituras decifram só as colunas que devolvem (a lista e a busca, só o nome).
+ENCRYPTED_PATIENT_COLUMNS = ('name', 'contact', 'medical_history')
+
+
+def _seal_patient(name, contact, medical_history):
+    """Valores gravados para (name, name_search, contact, medical_history), cifrados se houver chave."""
+    if not crypto.is_enabled():
+        return name, normalize_text(name), contact, medical_history
+    return crypto.encrypt(name, 'name'), None, crypto.encrypt(contact, 'contact'), crypto.encrypt(medical_history, 'medical_history')
+
+
+def index_patient_name(conn, patient_id, name):
+    """Regrava os termos do índice cego do nome do paciente (nada a gravar sem criptografia)."""
+    if not crypto.is_enabled():
+        return
+    conn.execute("DELETE FROM patient_name_index WHERE patient_id = ?", (patient_id,))
+    conn.executemany(
+        "INSERT INTO patient_name_index (term, patient_id) VALUES (?, ?)",
+        ((term, patient_id) for term in crypto.blind_index_terms(name))
+    )
+
+
+def _open_patient_frame(frame):
+    """Decifra, no lugar, as colunas sensíveis presentes no DataFrame (texto puro passa direto)."""
+    for column in ENCRYPTED_PATIENT_COLUMNS:
+        if column in frame:
+            frame[column] = crypto.decrypt_many(frame[column], column)
+    return frame
+
+
+# Nomes já normalizados, para remontar o diretório depois de uma gravação sem normalizar tudo de novo
+_normalized_name = functools.lru_cache(maxsize=crypto.DECRYPTION_CACHE_SIZE)(normalize_text)
+
+
+@_cached(lambda arguments, result: ['patient_directory'])
+def _patient_directory():
+    """Diretório com os nomes decifrados: lista de (nome normalizado, id, nome), em ordem alfabética."""
+    with get_db_connection() as conn:
+        rows = conn.execute("SELECT id, name FROM patients").fetchall()
+    names = crypto.decrypt_many((row[1] for row in rows), 'name')
+    return sorted((_normalized_name(name), row[0], name) for row, name in zip(rows, names))
+
+
+@instrumented()
+@_cached(lambda arguments, result: ['patient_directory'])
 def get_patient_list():
     """Busca uma lista de todos os pacientes (id e nome)."""
-    conn = get_db_connection()
-    patients = pd.read_sql_query("SELECT id, name FROM patients ORDER BY name ASC", con=conn)
-    conn.close()
-    return patients
-    
+    if crypto.is_enabled():
+        # ORDER BY name não serve para texto cifrado: a ordem vem do diretório decifrado
+        directory = _patient_directory()
+        return pd.DataFrame({'id': [entry[1] for entry in directory], 'name': [entry[2] for entry in directory]})
+    with get_db_connection() as conn:
+        return pd.read_sql_query("SELECT id, name FROM patients ORDER BY name ASC", con=conn)
+
+
+def _search_encrypted_patients(conn, query, after, limit):
+    """
+    search_patients() com os nomes cifrados: a busca de pelo menos BLIND_INDEX_MIN_PREFIX letras
+    pega os candidatos no índice cego e decifra só eles; as demais percorrem o diretório decifrado.
+    Os nomes são conferidos e ordenados depois de decifrados. Retorna linhas (nome normalizado, id, nome).
+    """
+    prefix = normalize_text(query)
+    term = crypto.query_term(query)
+    if term is None:
+        entries = _patient_directory()
+    else:
+        rows = conn.execute(
+            """
+            SELECT p.id, p.name FROM patient_name_index i JOIN patients p ON p.id = i.patient_id WHERE i.term = ?
+            UNION
+            SELECT id, name FROM patients WHERE name_search >= ? AND name_search < ?
+            """,
+            (term, prefix, prefix + '\uffff')  # A segunda parte pega pacientes ainda em texto puro
+        ).fetchall()
+        names = crypto.decrypt_many((row[1] for row in rows), 'name')
+        entries = sorted((_normalized_name(name), row[0], name) for row, name in zip(rows, names))
+    # Paginação por chave sobre a lista ordenada: continua depois do último (nome, id) da página anterior
+    start = bisect.bisect_left(entries, (prefix,))
+    if after is not None:
+        start = max(start, bisect.bisect_right(entries, tuple(after) + ('\uffff',)))
+    page = []
+    for entry in itertools.islice(entries, start, None):
+        if not entry[0].startswith(prefix):
+            break
+        page.append(entry)
+        if len(page) > limit:
+            break
+    return page
+
+
+@instrumented(rows=lambda result: len(result[0]))
+@_cached(lambda arguments, result: ['patient_directory'] + [('consultations', row[0]) for row in result[0]])
+def search_patients(query='', after=None, limit=PATIENT_PAGE_SIZE):
+    """
+    Busca uma página do diretório de pacientes, em ordem alfabética, usando o índice (name_search, id).
+    query: começo do nome (ignora acentos e maiúsculas); vazio lista todos.
+    after: cursor devolvido pela página anterior (None para a primeira página).
+    Retorna (rows, next_cursor): rows é uma lista de tuplas (id, name, last_consultation_date)
+    e next_cursor é None quando não há mais páginas.
+    """
+    if limit < 1:
+        raise ValueError(f"limit deve ser pelo menos 1 (recebido: {limit}).")
+    if crypto.is_enabled():
+        with get_db_connection() as conn:
+            page = _search_encrypted_patients(conn, query, after, limit)
+            last_dates = dict(conn.execute(
+                f"""
+                SELECT patient_id, MAX(consultation_date) FROM consultations
+                WHERE patient_id IN ({', '.join('?' for _ in page)}) GROUP BY patient_id
+                """,
+                [entry[1] for entry in page]
+            ).fetchall()) if page else {}
+        rows = [(entry[1], entry[2], entry[0], last_dates.get(entry[1])) for entry in page]
+    else:
+        prefix = normalize_text(query)
+        conditions = ["p.name_search >= ?", "p.name_search < ?"]
+        params = [prefix, prefix + '\uffff']
+        if after is not None:
+            # Paginação por chave: continua exatamente depois do último (nome, id) da página anterior
+            conditions.append("(p.name_search, p.id) > (?, ?)")
+            params.extend(after)
 
+        with get_db_connection() as conn:
+            rows = conn.execute(
+                f"""
+                SELECT p.id, p.name, p.name_search,
+                       (SELECT MAX(c.consultation_date) FROM consultations c WHERE c.patient_id = p.id)
+                FROM patients p
+                WHERE {' AND '.join(conditions)}
+                ORDER BY p.name_search, p.id
+                LIMIT ?
+                """,
+                (*params, limit + 1)
+            ).fetchall()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = (rows[-1][2], rows[-1][0])
+    return [(row[0], row[1], row[3]) for row in rows], next_cursor
+
+
+@instrumented()
 def add_patient(name, birth_date, sex, contact, medical_history):
-    """Adiciona um novo paciente ao banco de dados."""
-    conn = get_db_connection()
-    conn.execute(
-        "INSERT INTO patients (name, birth_date, sex, contact, medical_history) VALUES (?, ?, ?, ?, ?)",
-        (name, birth_date, sex, contact, medical_history)
-    )
-    conn.commit()
-    conn.close()
+    """Adiciona um novo paciente ao banco de dados. Retorna o id do paciente criado."""
+    sealed_name, name_search, sealed_contact, sealed_history = _seal_patient(name, contact, medical_history)
+    with transaction() as conn:
+        cursor = conn.execute(
+            "INSERT INTO patients (name, name_search, birth_date, sex, contact, medical_history) VALUES (?, ?, ?, ?, ?, ?)",
+            (sealed_name, name_search, birth_date, sex, sealed_contact, sealed_history)
+        )
+        index_patient_name(conn, cursor.lastrowid, name)
+    query_cache.invalidate('patient_directory')
+    return cursor.lastrowid
 
+@instrumented()
+@_cached(lambda arguments, result: [('patient', arguments['patient_id'])])
 def get_patient_details(patient_id):
     """Busca todos os detalhes de um paciente específico pelo seu ID."""
-    conn = get_db_connection()
-    patient = pd.read_sql_query("SELECT * FROM patients WHERE id = ?", params=(patient_id,),con=conn)
-    conn.close()
-    return patient
-
-def update_patient(patient_id, name, birth_date, sex, contact, medical_history):
-    """Atualiza as informações de um paciente existente."""
-    conn = get_db_connection()
-    conn.execute(
-        """
-        UPDATE patients
-        SET name = ?, birth_date = ?, sex = ?, contact = ?, medical_history = ?
-        WHERE id = ?
-        """,
-        (name, birth_date, sex, contact, medical_history, patient_id)
+    with get_db_connection() as conn:
+        frame = pd.read_sql_query("SELECT * FROM patients WHERE id = ?", params=(patient_id,), con=conn)
+    return _open_patient_frame(frame)
+
+class VersionConflictError(Exception):
+    """O paciente foi alterado por outra sessão depois de lido (a versão informada não é mais a atual)."""
+
+    def __init__(self, patient_id, expected_version, current_version):
+        super().__init__(
+            f"O paciente {patient_id} foi alterado por outra sessão (versão {current_version}, "
+            f"editada a partir da {expected_version}). Recarregue os dados antes de salvar."
+        )
+        self.patient_id = patient_id
+        self.expected_version = expected_version
+        self.current_version = current_version
+
+
+@instrumented()
+def update_patient(patient_id, name, birth_date, sex, contact, medical_history, expected_version=None):
+    """
+    Atualiza as informações de um paciente existente e devolve a nova versão do cadastro
+    (None se o paciente não existir).
+    expected_version: versão lida em get_patient_details(); se outra sessão tiver salvo antes,
+    nada é gravado e sobe VersionConflictError. None grava sem conferir (última gravação vence).
+    """
+    sealed_name, name_search, sealed_contact, sealed_history = _seal_patient(name, contact, medical_history)
+    condition = "id = ?" if expected_version is None else "id = ? AND version = ?"
+    params = (patient_id,) if expected_version is None else (patient_id, int(expected_version))
+    with transaction() as conn:
+        updated = conn.execute(
+            f"""
+            UPDATE patients
+            SET name = ?, name_search = ?, birth_date = ?, sex = ?, contact = ?, medical_history = ?,
+                version = version + 1
+            WHERE {condition}
+            """,
+            (sealed_name, name_search, birth_date, sex, sealed_contact, sealed_history, *params)
+        ).rowcount
+        row = conn.execute("SELECT version FROM patients WHERE id = ?", (patient_id,)).fetchone()
+        if not updated:
+            if expected_version is not None and row is not None:
+                # A versão nova pode ter vindo de outro processo: o cadastro em cache aqui está velho
+                query_cache.invalidate(('patient', patient_id))
+                raise VersionConflictError(patient_id, expected_version, row[0])
+            return None  # Paciente inexistente: nada a gravar
+        index_patient_name(conn, patient_id, name)
+    query_cache.invalidate(('patient', patient_id), 'patient_directory')
+    return row[0]
+
+@instrumented()
+def delete_patient(patient_id, archive=False):
+    """
+    Exclui um paciente; as consultas e os planos alimentares dele são excluídos em cascata.
+    archive=True guarda antes o cadastro, as consultas e os planos em patients_archive,
+    de onde o paciente pode ser recuperado com restore_patient().
+    """
+    with transaction() as conn:
+        if archive:
+            _archive_patient(conn, patient_id)
+        conn.execute("DELETE FROM patients WHERE id = ?", (patient_id,))
+    # Os PDFs trazem nome e contato: não ficam no disco depois da exclusão (nem no modo arquivo)
+    reports.remove_reports(patient_id)
+    tags = [('patient', patient_id), ('consultations', patient_id), 'patient_directory']
+    if archive:
+        tags.append('patient_archive')
+    query_cache.invalidate(*tags)
+
+
+def _select_dicts(conn, sql, params):
+    return [dict(row) for row in conn.execute(sql, params).fetchall()]
+
+
+def _insert_dicts(conn, table, rows):
+    """Insere dicionários coluna -> valor, ignorando colunas que a tabela não tem mais."""
+    if not rows:
+        return
+    table_columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table})").fetchall()}
+    columns = [column for column in rows[0] if column in table_columns]  # Todas as linhas têm as mesmas chaves
+    conn.executemany(
+        f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})",
+        ([row[column] for column in columns] for row in rows)
     )
-    conn.commit()
-    conn.close()
-
-def delete_patient(patient_id):
-    """Exclui um paciente do banco de dados."""
-    conn = get_db_connection()
-    # Futuramente, considere também excluir consultas associadas
-    conn.execute("DELETE FROM patients WHERE id = ?", (patient_id,))
-    conn.commit()
-    conn.close()
-
-def add_consultation(patient_id, consultation_date, weight_kg, height_cm, body_fat_percentage, notes):
-    """Adiciona um novo registro de consulta para um paciente."""
-    conn = get_db_connection()
+
+
+def _archive_patient(conn, patient_id):
+    """Copia o paciente, suas consultas e seus planos (com os itens) para patients_archive, em JSON."""
+    patient = _select_dicts(conn, "SELECT * FROM patients WHERE id = ?", (patient_id,))
+    if not patient:
+        return
+    plans = _select_dicts(conn, "SELECT * FROM meal_plans WHERE patient_id = ?", (patient_id,))
+    for plan in plans:
+        plan['items'] = _select_dicts(conn, "SELECT * FROM meal_plan_items WHERE plan_id = ?", (plan['id'],))
+    data = {
+        'patient': patient[0],
+        'consultations': _select_dicts(conn, "SELECT * FROM consultations WHERE patient_id = ?", (patient_id,)),
+        'meal_plans': plans,
+    }
     conn.execute(
-        """
-        INSERT INTO consultations (patient_id, consultation_date, weight_kg, height_cm, body_fat_percentage, notes)
-        VALUES (?, ?, ?, ?, ?, ?)
-        """,
-        (patient_id, consultation_date, weight_kg, height_cm, body_fat_percentage, notes)
+        "INSERT OR REPLACE INTO patients_archive (patient_id, name, data) VALUES (?, ?, ?)",
+        (patient_id, patient[0]['name'], json.dumps(data, ensure_ascii=False))
+    )
+
+
+@instrumented()
+@_cached(lambda arguments, result: ['patient_archive'])
+def get_archived_patients():
+    """Pacientes no arquivo (id, nome e data da exclusão), dos mais recentes para os mais antigos."""
+    with get_db_connection() as conn:
+        frame = pd.read_sql_query(
+            "SELECT patient_id, name, archived_at FROM patients_archive ORDER BY archived_at DESC", con=conn
+        )
+    return _open_patient_frame(frame)
+
+
+@instrumented()
+def restore_patient(patient_id):
+    """Devolve um paciente arquivado (com consultas e planos, nos ids originais) e o tira do arquivo."""
+    with transaction() as conn:
+        row = conn.execute("SELECT data FROM patients_archive WHERE patient_id = ?", (patient_id,)).fetchone()
+        if row is None:
+            raise ValueError(f"Paciente {patient_id} não está no arquivo.")
+        data = json.loads(row['data'])
+        _insert_dicts(conn, 'patients', [data['patient']])
+        index_patient_name(conn, patient_id, crypto.decrypt(data['patient']['name'], 'name'))
+        _insert_dicts(conn, 'consultations', data['consultations'])
+        for plan in data['meal_plans']:
+            items = plan.pop('items')
+            _insert_dicts(conn, 'meal_plans', [plan])
+            _insert_dicts(conn, 'meal_plan_items', items)
+        conn.execute("DELETE FROM patients_archive WHERE patient_id = ?", (patient_id,))
+    query_cache.invalidate(('patient', patient_id), ('consultations', patient_id), 'patient_directory', 'patient_archive')
+
+# Medidas da avaliação guardadas em cada consulta (colunas skinfold_<local>_mm e circ_<local>_cm)
+SKINFOLD_SITES = (
+    'triceps', 'subscapular', 'biceps', 'chest', 'midaxillary', 'suprailiac', 'abdominal', 'thigh', 'medial_calf',
+)
+CIRCUMFERENCE_SITES = ('arm', 'waist', 'abdominal', 'hip', 'thigh')
+
+
+def _measurement_columns(skinfolds, circumferences):
+    """Converte os dicionários de medidas em {coluna: valor}; 0 (campo não preenchido) vira NULL."""
+    columns = {}
+    for prefix, suffix, sites, values in (
+        ('skinfold_', '_mm', SKINFOLD_SITES, skinfolds or {}),
+        ('circ_', '_cm', CIRCUMFERENCE_SITES, circumferences or {}),
+    ):
+        for site, value in values.items():
+            if site not in sites:
+                raise ValueError(f"Medida desconhecida: {prefix}{site}{suffix}")
+            columns[f"{prefix}{site}{suffix}"] = value or None
+    return columns
+
+@instrumented()
+def add_consultation(patient_id, consultation_date, weight_kg=None, height_cm=None, body_fat_percentage=None,
+                     notes=None, skinfolds=None, circumferences=None, body_fat_protocol=None):
+    """
+    Adiciona um novo registro de consulta para um paciente, com todas as medidas da avaliação.
+    skinfolds: {'triceps': 12.0, ...} (ver SKINFOLD_SITES); circumferences: {'waist': 80.0, ...}.
+    body_fat_protocol: protocolo que gerou o %GC; com ele, o %GC é recalculado automaticamente
+    (src/body_composition.py) quando as dobras, a data ou os dados do paciente mudarem.
+    Retorna o id da consulta criada.
+    """
+    columns = _consultation_columns(
+        patient_id, consultation_date, weight_kg, height_cm, body_fat_percentage, notes,
+        skinfolds, circumferences, body_fat_protocol
     )
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        cursor = conn.execute(
+            f"INSERT INTO consultations ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})",
+            tuple(columns.values())
+        )
+    query_cache.invalidate(('consultations', patient_id))
+    return cursor.lastrowid
+
+def _consultation_columns(patient_id, consultation_date, weight_kg=None, height_cm=None, body_fat_percentage=None,
+                          notes=None, skinfolds=None, circumferences=None, body_fat_protocol=None):
+    """{coluna: valor} de uma consulta, com os mesmos argumentos de add_consultation."""
+    return {
+        'patient_id': patient_id, 'consultation_date': consultation_date, 'weight_kg': weight_kg,
+        'height_cm': height_cm, 'body_fat_percentage': body_fat_percentage, 'notes': notes,
+        'body_fat_protocol': body_fat_protocol,
+        **_measurement_columns(skinfolds, circumferences),
+    }
 
+@instrumented()
+def add_consultations(consultations):
+    """
+    Insere muitas consultas em uma única transação (tudo ou nada).
+    consultations: sequência de dicionários com os argumentos de add_consultation
+    (patient_id e consultation_date obrigatórios). Retorna o número de consultas inseridas.
+    """
+    groups = {}  # Consultas com o mesmo conjunto de colunas vão juntas em um executemany
+    for consultation in consultations:
+        columns = _consultation_columns(**consultation)
+        groups.setdefault(tuple(columns), []).append(tuple(columns.values()))
+    with transaction() as conn:
+        for columns, rows in groups.items():
+            conn.executemany(
+                f"INSERT INTO consultations ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})",
+                rows
+            )
+    query_cache.invalidate(*{('consultations', consultation['patient_id']) for consultation in consultations})
+    return sum(len(rows) for rows in groups.values())
+
+@instrumented()
+def set_body_fat_protocol(patient_id, protocol):
+    """
+    Passa para o protocolo informado as consultas do paciente que têm as dobras que ele usa
+    (None = parar de recalcular todas). As demais (ex: %GC digitado, sem dobras) ficam como estão.
+    Os triggers marcam as consultas como pendentes e o %GC é recalculado em segundo plano.
+    Retorna o número de consultas alteradas.
+    """
+    with transaction() as conn:
+        condition = ""
+        if protocol is not None:
+            row = conn.execute("SELECT sex FROM patients WHERE id = ?", (patient_id,)).fetchone()
+            folds = required_skinfolds(protocol, row[0] if row else None)
+            condition = ''.join(f" AND skinfold_{fold}_mm > 0" for fold in folds)
+        updated = conn.execute(
+            f"UPDATE consultations SET body_fat_protocol = ? WHERE patient_id = ?{condition}", (protocol, patient_id)
+        ).rowcount
+    query_cache.invalidate(('consultations', patient_id))
+    return updated
+
+@instrumented()
+@_cached(lambda arguments, result: [('consultations', arguments['patient_id'])])
 def get_consultations_for_patient(patient_id):
     """Busca todos os registros de consulta para um paciente, ordenados por data decrescente."""
-    conn = get_db_connection()
-    consultations = pd.read_sql_query(
-        "SELECT * FROM consultations WHERE patient_id = ? ORDER BY consultation_date DESC",
-        params=(patient_id,),
-        con=conn
-    )
-    conn.close()
-    return consultations
+    with get_db_connection() as conn:
+        return pd.read_sql_query(
+            "SELECT * FROM consultations WHERE patient_id = ? ORDER BY consultation_date DESC",
+            params=(patient_id,),
+            con=conn
+        )
 
+@instrumented()
 def delete_consultation(consultation_id):
     """Exclui um registro de consulta específico."""
-    conn = get_db_connection()
-    conn.execute("DELETE FROM consultations WHERE id = ?", (consultation_id,))
-    conn.commit()
-    conn.close()
\ No newline at end of file
+    with transaction() as conn:
+        row = conn.execute("SELECT patient_id FROM consultations WHERE id = ?", (consultation_id,)).fetchone()
+        conn.execute("DELETE FROM consultations WHERE id = ?", (consultation_id,))
+    if row is not None:
+        query_cache.invalidate(('consultations', row['patient_id']))
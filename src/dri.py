@@ -0,0 +1,271 @@
+# src/dri.py
+
+import os
+import threading
+import numpy as np
+from src import db_utils
+from src.calculations import ages_from_birth_dates, encode_sexes
+from src.instrumentation import instrumented
+from src.meal_plans import MAX_DAYS
+from src.nutrient_matrix import get_nutrient_matrix
+from src.query_cache import QueryCache
+from src.lazy_imports import lazy_import
+pd = lazy_import('pandas')
+
+# Ingestão dietética de referência (DRI, IOM/NASEM) por sexo e faixa etária, para os nutrientes da
+# tabela foods. Cada linha do CSV traz a RDA ou a AI (meta) e o UL (limite superior) de um nutriente:
+# - a idade vale para age_min <= idade < age_max (age_max vazio = sem limite);
+# - para o sódio, o "UL" é o CDRR (redução de risco de doença crônica);
+# - o UL de vitamina A vale para o retinol pré-formado (retinol_mcg) e a meta para o RAE;
+# - ULs que só se aplicam a suplementos (magnésio, niacina) ficam de fora.
+# Gestantes, lactantes e menores de 1 ano não estão na tabela (resultado NaN).
+DRI_CSV_FILE = os.path.join('data', 'dri.csv')
+ADEQUACY_CACHE_SIZE = 4096  # Resultados guardados por (versão do plano, sexo, idade)
+ADEQUACY_CACHE_TTL_SECONDS = 24 * 3600
+
+
+class AdequacyResult:
+    """
+    Adequação de várias ingestões diárias (linhas) às DRI, para todos os nutrientes de uma vez.
+    intakes, targets e upper_limits: arrays linhas x nutrientes (NaN onde não há referência).
+    """
+
+    def __init__(self, intakes, targets, upper_limits, columns, labels=None):
+        self.columns = tuple(columns)
+        self.labels = labels
+        self.intakes = intakes
+        self.targets = targets
+        self.upper_limits = upper_limits
+        with np.errstate(invalid='ignore', divide='ignore'):
+            self.adequacy_ratios = intakes / targets  # 1.0 = atinge a RDA/AI
+            self.excess_ratios = intakes / upper_limits  # > 1.0 = passa do UL
+
+    def __len__(self):
+        return len(self.intakes)
+
+    def _frame(self, values):
+        return pd.DataFrame(values, columns=self.columns, index=self.labels)
+
+    @property
+    def adequacy(self):
+        """Ingestão / meta (RDA ou AI), linhas x nutrientes."""
+        return self._frame(self.adequacy_ratios)
+
+    @property
+    def excess(self):
+        """Ingestão / UL, linhas x nutrientes."""
+        return self._frame(self.excess_ratios)
+
+    def summary(self):
+        """
+        Uma linha por ingestão: adequacy_score (0 a 100, média da adequação limitada a 100% nos
+        nutrientes com meta), nutrients_below (abaixo da meta) e nutrients_above_ul (acima do UL).
+        """
+        has_target = ~np.isnan(self.adequacy_ratios)
+        capped = np.where(has_target, np.minimum(self.adequacy_ratios, 1.0), 0.0)
+        n_targets = has_target.sum(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            score = np.where(n_targets > 0, capped.sum(axis=1) / n_targets * 100, np.nan)
+        return pd.DataFrame({
+            'adequacy_score': score,
+            'nutrients_below': (has_target & (np.nan_to_num(self.adequacy_ratios, nan=1.0) < 1.0)).sum(axis=1),
+            'nutrients_above_ul': (np.nan_to_num(self.excess_ratios, nan=0.0) > 1.0).sum(axis=1),
+        }, index=self.labels)
+
+    def detail(self, row=0):
+        """Tabela nutriente a nutriente de uma linha (ingestão, meta, UL e percentuais), para exibição."""
+        frame = pd.DataFrame({
+            'intake': self.intakes[row],
+            'target': self.targets[row],
+            'upper_limit': self.upper_limits[row],
+            'adequacy_percent': self.adequacy_ratios[row] * 100,
+            'upper_limit_percent': self.excess_ratios[row] * 100,
+        }, index=self.columns)
+        return frame.dropna(subset=['target', 'upper_limit'], how='all')
+
+
+class DriTable:
+    """
+    Tabela de DRI em arrays: um grupo (sexo, faixa etária) por linha e uma coluna por nutriente,
+    nas mesmas colunas da NutrientMatrix. Imutável, compartilhada pelo processo.
+    """
+
+    def __init__(self, frame, columns):
+        self.columns = tuple(columns)
+        groups = frame[['sex', 'age_min', 'age_max']].drop_duplicates().reset_index(drop=True)
+        self.sex_codes = encode_sexes(groups['sex'])
+        self.age_min = groups['age_min'].to_numpy(dtype=float)
+        self.age_max = groups['age_max'].fillna(np.inf).to_numpy(dtype=float)
+
+        shape = (len(groups), len(self.columns))
+        self.targets = np.full(shape, np.nan)
+        self.upper_limits = np.full(shape, np.nan)
+        group_rows = frame.merge(groups.reset_index(), on=['sex', 'age_min', 'age_max'], how='left')['index']
+        column_index = {column: position for position, column in enumerate(self.columns)}
+        known = frame['nutrient'].isin(column_index)
+        rows = group_rows[known].to_numpy()
+        positions = frame.loc[known, 'nutrient'].map(column_index).to_numpy()
+        rda, ai = frame.loc[known, 'rda'].to_numpy(dtype=float), frame.loc[known, 'ai'].to_numpy(dtype=float)
+        self.targets[rows, positions] = np.where(np.isnan(rda), ai, rda)
+        self.upper_limits[rows, positions] = frame.loc[known, 'ul'].to_numpy(dtype=float)
+        for array in (self.targets, self.upper_limits):
+            array.flags.writeable = False
+
+    def group_rows(self, sexes, ages):
+        """Grupo de cada (sexo, idade): array de linhas da tabela, -1 quando não há grupo."""
+        sex_codes = encode_sexes(sexes)[:, None]
+        ages = np.asarray(ages, dtype=float)[:, None]
+        matches = (sex_codes == self.sex_codes) & (ages >= self.age_min) & (ages < self.age_max)
+        return np.where(matches.any(axis=1), matches.argmax(axis=1), -1)
+
+    def references(self, group_rows):
+        """(metas, ULs) para as linhas informadas; grupos -1 ficam com NaN."""
+        group_rows = np.asarray(group_rows, dtype=np.intp)
+        missing = (group_rows < 0)[:, None]
+        targets = np.where(missing, np.nan, self.targets[group_rows])
+        upper_limits = np.where(missing, np.nan, self.upper_limits[group_rows])
+        return targets, upper_limits
+
+    def assess(self, intakes, sexes, ages, labels=None):
+        """
+        Adequação vetorizada de muitas ingestões diárias (linhas x nutrientes, nas colunas da tabela)
+        para os sexos e idades correspondentes. Retorna um AdequacyResult.
+        """
+        intakes = np.atleast_2d(np.asarray(intakes, dtype=float))
+        targets, upper_limits = self.references(self.group_rows(sexes, ages))
+        return AdequacyResult(intakes, targets, upper_limits, self.columns, labels)
+
+
+def load_dri_table(path=DRI_CSV_FILE, columns=None):
+    """Lê o CSV de DRI e monta a DriTable (colunas padrão: as da NutrientMatrix)."""
+    frame = pd.read_csv(path, dtype={'sex': str, 'nutrient': str})
+    return DriTable(frame, columns if columns is not None else get_nutrient_matrix().columns)
+
+
+_table = None
+_table_lock = threading.Lock()
+_adequacy_cache = QueryCache(maxsize=ADEQUACY_CACHE_SIZE, ttl_seconds=ADEQUACY_CACHE_TTL_SECONDS)
+
+
+def get_dri_table():
+    """DriTable do processo, lida do CSV na primeira chamada."""
+    global _table
+    table = _table
+    if table is not None:
+        return table
+    with _table_lock:
+        if _table is None:
+            _table = load_dri_table()
+        return _table
+
+
+def patient_age(birth_date):
+    """Idade em anos completos (NaN se a data estiver ausente ou inválida), como em calculations."""
+    return float(ages_from_birth_dates([birth_date])[0])
+
+
+def plan_adequacy(plan, sex, birth_date):
+    """
+    Adequação da ingestão média diária de um MealPlan em memória (dias com algum item).
+    Não usa cache: o plano pode ter alterações ainda não gravadas, e o cálculo é um só vetor.
+    """
+    day_totals = plan.day_totals().to_numpy()
+    filled = day_totals.any(axis=1)
+    intake = day_totals[filled].mean(axis=0) if filled.any() else np.zeros(day_totals.shape[1])
+    return get_dri_table().assess(intake[None, :], [sex], [patient_age(birth_date)], labels=[plan.plan_id])
+
+
+def _plan_intakes(conn, plan_ids, matrix):
+    """
+    Ingestão média diária (dias com itens) de planos gravados. Os itens são lidos na ordem da chave
+    primária e somados com numpy: um GROUP BY no SQLite ordenaria tudo em uma árvore temporária.
+    """
+    rows = conn.execute(
+        f"SELECT plan_id, day, food_id, grams FROM meal_plan_items WHERE plan_id IN ({', '.join('?' for _ in plan_ids)})",
+        plan_ids
+    ).fetchall()
+    quantities = np.zeros((len(plan_ids), len(matrix)))
+    days = np.ones(len(plan_ids))
+    if rows:
+        plan_column, day_column, food_ids, grams = zip(*rows)
+        position = {plan_id: row for row, plan_id in enumerate(plan_ids)}
+        plan_rows = np.fromiter(map(position.__getitem__, plan_column), dtype=np.intp, count=len(rows))
+        np.add.at(quantities, (plan_rows, matrix.rows_for(food_ids)), np.asarray(grams, dtype=float) / 100)
+        filled_days = np.unique(plan_rows * MAX_DAYS + np.asarray(day_column, dtype=np.intp))
+        days = np.maximum(np.bincount(filled_days // MAX_DAYS, minlength=len(plan_ids)), 1).astype(float)
+    return quantities @ matrix.values / days[:, None]
+
+
+@instrumented(rows=len)
+def cohort_adequacy(plan_ids):
+    """
+    Adequação de muitos planos gravados em uma chamada, cada um comparado às DRI do seu paciente
+    (sexo e idade de hoje). Os resultados ficam em cache por (plano, updated_at, versão da matriz de
+    nutrientes, sexo, idade): só os planos alterados desde a última chamada (ou de pacientes que mudaram
+    de idade, ou todos, depois de uma receita editada) são recalculados, todos juntos. Retorna um AdequacyResult com uma linha por plano (rótulos = plan_id).
+    """
+    plan_ids = [int(plan_id) for plan_id in dict.fromkeys(plan_ids)]
+    table = get_dri_table()
+    matrix = get_nutrient_matrix()
+    cached = []
+    with db_utils.get_db_connection() as conn:
+        headers = conn.execute(
+            f"""
+            SELECT m.id, m.updated_at, p.sex, p.birth_date
+            FROM meal_plans m LEFT JOIN patients p ON p.id = m.patient_id
+            WHERE m.id IN ({', '.join('?' for _ in plan_ids)})
+            """,
+            plan_ids
+        ).fetchall()
+        found = {row[0]: row for row in headers}  # Planos inexistentes ficam de fora do resultado
+        plan_ids = [plan_id for plan_id in plan_ids if plan_id in found]
+        ages = ages_from_birth_dates([found[plan_id][3] for plan_id in plan_ids])
+        sex_codes = encode_sexes([found[plan_id][2] for plan_id in plan_ids])
+        keys = [
+            # matrix.version: receitas editadas e a TACO recarregada mudam os alimentos sem mudar o plano
+            ('dri_adequacy', plan_id, found[plan_id][1], matrix.version, int(sex_code), None if np.isnan(age) else int(age))
+            for plan_id, sex_code, age in zip(plan_ids, sex_codes, ages)
+        ]
+
+        generation = _adequacy_cache.generation
+        cached = [_adequacy_cache.get(key) for key in keys]
+        missing = [row for row, value in enumerate(cached) if value is None]
+        if missing and plan_ids:
+            intakes = _plan_intakes(conn, [plan_ids[row] for row in missing], matrix)
+            group_rows = table.group_rows([found[plan_ids[row]][2] for row in missing], ages[missing])
+            for position, row in enumerate(missing):
+                cached[row] = (intakes[position], int(group_rows[position]))
+                _adequacy_cache.put(keys[row], cached[row], generation=generation)
+
+    intakes = np.array([value[0] for value in cached]).reshape(len(cached), len(table.columns))
+    targets, upper_limits = table.references([value[1] for value in cached])
+    return AdequacyResult(intakes, targets, upper_limits, table.columns, labels=plan_ids)
+
+
+def latest_plan_ids(patient_ids):
+    """Plano mais recente (por updated_at) de cada paciente: {patient_id: plan_id}."""
+    patient_ids = [int(patient_id) for patient_id in patient_ids]
+    if not patient_ids:
+        return {}
+    with db_utils.get_db_connection() as conn:
+        rows = conn.execute(
+            f"""
+            SELECT patient_id, id FROM (
+                SELECT patient_id, id, ROW_NUMBER() OVER (
+                    PARTITION BY patient_id ORDER BY updated_at DESC, id DESC
+                ) AS position
+                FROM meal_plans WHERE patient_id IN ({', '.join('?' for _ in patient_ids)})
+            ) WHERE position = 1
+            """,
+            patient_ids
+        ).fetchall()
+    return dict(rows)
+
+
+def patients_adequacy(patient_ids):
+    """Adequação do plano mais recente de cada paciente (rótulos = patient_id; sem plano fica de fora)."""
+    plans = latest_plan_ids(patient_ids)
+    result = cohort_adequacy(list(plans.values()))
+    patient_by_plan = {plan_id: patient_id for patient_id, plan_id in plans.items()}
+    result.labels = [patient_by_plan[plan_id] for plan_id in result.labels]
+    return result
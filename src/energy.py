@@ -0,0 +1,204 @@
+# src/energy.py
+
+import numpy as np
+from src.calculations import SEX_CODES, encode_sexes
+from src.lazy_imports import lazy_import
+pd = lazy_import('pandas')
+
+# --- Tabelas de referência ---
+
+# Fatores de atividade física aplicados sobre a TMB para obter o GET
+ACTIVITY_FACTORS = {
+    'Sedentário': 1.2,
+    'Levemente ativo': 1.375,
+    'Moderadamente ativo': 1.55,
+    'Muito ativo': 1.725,
+    'Extremamente ativo': 1.9,
+}
+
+# Ajuste calórico padrão (kcal/dia) sobre o GET para cada objetivo
+GOAL_ADJUSTMENTS = {
+    'Perda de peso': -500,
+    'Manutenção': 0,
+    'Ganho de massa': 300,
+}
+
+# Equações lineares de TMB: TMB = a + b*peso(kg) + c*altura(cm) - d*idade(anos)
+# Uma linha por sexo (masculino, feminino), na ordem de SEX_CODES
+_LINEAR_BMR_COEFFICIENTS = {
+    # Harris & Benedict (1919)
+    'Harris-Benedict': np.array([
+        [66.473, 13.7516, 5.0033, 6.755],
+        [655.0955, 9.5634, 1.8496, 4.6756],
+    ]),
+    # Mifflin-St Jeor (1990)
+    'Mifflin-St Jeor': np.array([
+        [5.0, 10.0, 6.25, 5.0],
+        [-161.0, 10.0, 6.25, 5.0],
+    ]),
+    # IOM (2005), gasto energético basal de adultos (altura convertida de metros para cm)
+    'IOM': np.array([
+        [293.0, 10.12, 4.564, 3.8],
+        [247.0, 8.60, 4.015, 2.67],
+    ]),
+}
+
+# Equações baseadas na massa magra: TMB = a + b*massa_magra(kg)
+_LEAN_MASS_BMR_COEFFICIENTS = {
+    'Katch-McArdle': (370.0, 21.6),
+    'Cunningham': (500.0, 22.0),
+}
+
+# FAO/OMS (1985): TMB = a*peso + b, por sexo e faixa etária (0-2, 3-9, 10-17, 18-29, 30-59, 60+)
+_FAO_WHO_AGE_LIMITS = np.array([3, 10, 18, 30, 60])
+_FAO_WHO_COEFFICIENTS = np.array([
+    [[60.9, -54.0], [22.7, 495.0], [17.5, 651.0], [15.3, 679.0], [11.6, 879.0], [13.5, 487.0]],
+    [[61.0, -51.0], [22.5, 499.0], [12.2, 746.0], [14.7, 496.0], [8.7, 829.0], [10.5, 596.0]],
+])
+
+# IOM (2005), necessidade energética estimada (EER) de adultos: calculada direto, sem TMB x fator.
+# EER = a - b*idade + PA*(c*peso + d*altura(m)); PA depende do sexo e do nível de atividade
+_IOM_EER_COEFFICIENTS = np.array([
+    [662.0, 9.53, 15.91, 539.6],
+    [354.0, 6.91, 9.36, 726.0],
+])
+_IOM_ACTIVITY_LEVELS = {  # Nível de atividade -> categoria de PA do IOM
+    'Sedentário': 0, 'Levemente ativo': 1, 'Moderadamente ativo': 2, 'Muito ativo': 3, 'Extremamente ativo': 3,
+}
+_IOM_PA_COEFFICIENTS = np.array([
+    [1.00, 1.11, 1.25, 1.48],
+    [1.00, 1.12, 1.27, 1.45],
+])
+
+EQUATIONS = ('Harris-Benedict', 'Mifflin-St Jeor', 'Katch-McArdle', 'Cunningham', 'FAO/OMS', 'IOM')
+
+
+def lean_mass_from_body_fat(weight_kg, body_fat_percentage):
+    """Massa magra (kg) a partir do peso e do percentual de gordura (ex: o de calculate_body_fat)."""
+    return weight_kg * (1 - body_fat_percentage / 100)
+
+
+# --- API escalar (um paciente) ---
+
+def calculate_bmr(equation, sex, age, weight_kg, height_cm, body_fat_percentage=None):
+    """
+    Calcula a Taxa Metabólica Basal (kcal/dia) pela equação escolhida.
+    Katch-McArdle e Cunningham precisam do percentual de gordura (para a massa magra).
+    Retorna None se a equação for inválida ou faltarem dados.
+    """
+    sex_code = SEX_CODES.get((sex or '').lower())
+    if sex_code is None:
+        return None
+
+    if equation in _LINEAR_BMR_COEFFICIENTS:
+        a, b, c, d = _LINEAR_BMR_COEFFICIENTS[equation][sex_code]
+        return float(a + b * weight_kg + c * height_cm - d * age)
+    if equation in _LEAN_MASS_BMR_COEFFICIENTS:
+        if not body_fat_percentage:
+            return None
+        a, b = _LEAN_MASS_BMR_COEFFICIENTS[equation]
+        return a + b * lean_mass_from_body_fat(weight_kg, body_fat_percentage)
+    if equation == 'FAO/OMS':
+        band = int(np.searchsorted(_FAO_WHO_AGE_LIMITS, age, side='right'))
+        a, b = _FAO_WHO_COEFFICIENTS[sex_code, band]
+        return float(a * weight_kg + b)
+    return None
+
+
+def calculate_tee(equation, sex, age, weight_kg, height_cm, activity_level, body_fat_percentage=None):
+    """
+    Calcula o Gasto Energético Total (kcal/dia). Para a IOM usa a equação de EER com o
+    coeficiente de atividade do IOM; para as demais, TMB x fator de atividade.
+    """
+    if activity_level not in ACTIVITY_FACTORS:
+        return None
+    if equation == 'IOM':
+        sex_code = SEX_CODES.get((sex or '').lower())
+        if sex_code is None:
+            return None
+        a, b, c, d = _IOM_EER_COEFFICIENTS[sex_code]
+        pa = _IOM_PA_COEFFICIENTS[sex_code, _IOM_ACTIVITY_LEVELS[activity_level]]
+        return float(a - b * age + pa * (c * weight_kg + d * height_cm / 100))
+
+    bmr = calculate_bmr(equation, sex, age, weight_kg, height_cm, body_fat_percentage)
+    return None if bmr is None else bmr * ACTIVITY_FACTORS[activity_level]
+
+
+def calculate_energy_target(tee, goal, adjustment_kcal=None):
+    """Meta calórica: GET + ajuste do objetivo (ou um ajuste manual, ex: -750)."""
+    if adjustment_kcal is None:
+        adjustment_kcal = GOAL_ADJUSTMENTS.get(goal, 0)
+    return tee + adjustment_kcal
+
+
+def macro_targets(target_kcal, protein_percent=20, carbohydrate_percent=50, lipid_percent=30):
+    """Distribui a meta calórica entre os macronutrientes e retorna os gramas (4/4/9 kcal por grama)."""
+    return {
+        'protein_g': target_kcal * protein_percent / 100 / 4,
+        'carbohydrate_g': target_kcal * carbohydrate_percent / 100 / 4,
+        'lipid_g': target_kcal * lipid_percent / 100 / 9,
+    }
+
+
+# --- API em lote (vetorizada) ---
+
+def _lookup(values, mapping, default=np.nan):
+    """Mapeia uma sequência de rótulos (ex: níveis de atividade) pelos valores do dicionário."""
+    codes, uniques = pd.factorize(np.asarray(values, dtype=object))
+    lookup = np.array([mapping.get(value, default) for value in uniques] + [default], dtype=float)
+    return lookup[codes]
+
+
+def _bmr_batch(equation, sex_codes, ages, weights, heights, body_fat_percentages):
+    """TMB de todas as linhas; NaN onde a equação não se aplica ou faltam dados."""
+    row_sex = np.maximum(sex_codes, 0)
+    if equation in _LINEAR_BMR_COEFFICIENTS:
+        a, b, c, d = _LINEAR_BMR_COEFFICIENTS[equation][row_sex].T
+        bmr = a + b * weights + c * heights - d * ages
+    elif equation in _LEAN_MASS_BMR_COEFFICIENTS:
+        a, b = _LEAN_MASS_BMR_COEFFICIENTS[equation]
+        body_fat = np.where(body_fat_percentages > 0, body_fat_percentages, np.nan)
+        bmr = a + b * lean_mass_from_body_fat(weights, body_fat)
+    elif equation == 'FAO/OMS':
+        bands = np.searchsorted(_FAO_WHO_AGE_LIMITS, ages, side='right')
+        a, b = _FAO_WHO_COEFFICIENTS[row_sex, bands].T
+        bmr = a * weights + b
+    else:
+        raise ValueError(f"Equação desconhecida: {equation}")
+    return np.where(sex_codes >= 0, bmr, np.nan)
+
+
+def calculate_energy_batch(equation, sexes, ages, weights_kg, heights_cm, activity_levels,
+                           body_fat_percentages=None, goals=None):
+    """
+    Versão vetorizada de calculate_bmr/calculate_tee/calculate_energy_target, para recalcular
+    as metas de todos os pacientes em uma chamada. Todos os argumentos são sequências alinhadas
+    (uma posição por paciente); goals é opcional (sem objetivo = manutenção).
+    Retorna um DataFrame com 'bmr', 'tee' e 'target_kcal' (NaN onde faltarem dados).
+    """
+    sex_codes = encode_sexes(sexes)
+    ages = np.asarray(ages, dtype=float)
+    weights = np.asarray(weights_kg, dtype=float)
+    heights = np.asarray(heights_cm, dtype=float)
+    n_rows = len(ages)
+    body_fat = np.full(n_rows, np.nan) if body_fat_percentages is None else np.asarray(body_fat_percentages, dtype=float)
+    factors = _lookup(activity_levels, ACTIVITY_FACTORS)
+
+    if equation == 'IOM':
+        bmr = _bmr_batch(equation, sex_codes, ages, weights, heights, body_fat)
+        row_sex = np.maximum(sex_codes, 0)
+        a, b, c, d = _IOM_EER_COEFFICIENTS[row_sex].T
+        pa_levels = _lookup(activity_levels, _IOM_ACTIVITY_LEVELS, default=0).astype(int)
+        pa = _IOM_PA_COEFFICIENTS[row_sex, pa_levels]
+        tee = a - b * ages + pa * (c * weights + d * heights / 100)
+        tee = np.where((sex_codes >= 0) & ~np.isnan(factors), tee, np.nan)
+    else:
+        bmr = _bmr_batch(equation, sex_codes, ages, weights, heights, body_fat)
+        tee = bmr * factors
+
+    if goals is None:
+        adjustments = np.zeros(n_rows)
+    else:
+        adjustments = _lookup(goals, GOAL_ADJUSTMENTS, default=0)
+
+    return pd.DataFrame({'bmr': bmr, 'tee': tee, 'target_kcal': tee + adjustments})
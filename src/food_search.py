@@ -0,0 +1,146 @@
+# src/food_search.py
+
+from src import db_utils
+from src.text_utils import normalize_text, tokenize
+from src.lazy_imports import lazy_import
+pd = lazy_import('pandas')
+
+# Índice de busca textual (SQLite FTS5) sobre as descrições da tabela TACO.
+# A coluna indexada guarda a descrição normalizada (sem acentos, minúscula),
+# então "pao" encontra "Pão" e "acucar" encontra "Açúcar".
+FOODS_SEARCH_TABLE = 'foods_fts'
+FOODS_SEARCH_VOCAB_TABLE = 'foods_fts_vocab'
+
+DEFAULT_LIMIT = 20
+FUZZY_MIN_SIMILARITY = 0.45  # Similaridade mínima (Dice sobre trigramas) para considerar um termo parecido
+FUZZY_MAX_CANDIDATES = 3  # Termos parecidos considerados para cada palavra digitada
+
+
+def create_food_search_index(conn):
+    """Cria a tabela FTS5 de busca de alimentos e sua tabela de vocabulário, se não existirem."""
+    conn.execute(f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FOODS_SEARCH_TABLE} USING fts5(
+        food_id UNINDEXED,
+        description UNINDEXED,
+        search_text,
+        tokenize = 'unicode61 remove_diacritics 2'
+    );
+    """)
+    conn.execute(f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FOODS_SEARCH_VOCAB_TABLE}
+    USING fts5vocab({FOODS_SEARCH_TABLE}, 'row');
+    """)
+
+
+def rebuild_food_search_index(conn):
+    """Reconstrói o índice de busca a partir da tabela foods. Deve ser chamada sempre que a TACO for recarregada."""
+    create_food_search_index(conn)
+    foods = conn.execute("SELECT food_id, description FROM foods WHERE description IS NOT NULL").fetchall()
+    conn.execute(f"DELETE FROM {FOODS_SEARCH_TABLE}")
+    conn.executemany(
+        f"INSERT INTO {FOODS_SEARCH_TABLE} (food_id, description, search_text) VALUES (?, ?, ?)",
+        ((food_id, description, normalize_text(description)) for food_id, description in foods)
+    )
+    # Compacta o índice em um único segmento, deixando as consultas mais rápidas
+    conn.execute(f"INSERT INTO {FOODS_SEARCH_TABLE} ({FOODS_SEARCH_TABLE}) VALUES ('optimize')")
+    conn.commit()
+    return len(foods)
+
+
+def update_food_search_index(conn, food_ids):
+    """
+    Atualiza no índice só os alimentos informados (inseridos, renomeados ou excluídos de foods),
+    sem reconstruir o índice inteiro. Deve rodar dentro da transação que alterou foods.
+    """
+    food_ids = [int(food_id) for food_id in food_ids]
+    placeholders = ', '.join('?' for _ in food_ids)
+    conn.execute(f"DELETE FROM {FOODS_SEARCH_TABLE} WHERE food_id IN ({placeholders})", food_ids)
+    foods = conn.execute(
+        f"SELECT food_id, description FROM foods WHERE food_id IN ({placeholders}) AND description IS NOT NULL",
+        food_ids
+    ).fetchall()
+    conn.executemany(
+        f"INSERT INTO {FOODS_SEARCH_TABLE} (food_id, description, search_text) VALUES (?, ?, ?)",
+        ((food_id, description, normalize_text(description)) for food_id, description in foods)
+    )
+    return len(foods)
+
+
+def _quote(term):
+    """Coloca o termo entre aspas para que a sintaxe do FTS5 não interprete nada dentro dele."""
+    return '"' + term.replace('"', '""') + '"'
+
+
+def _prefix_expression(tokens):
+    """Expressão FTS5 em que todas as palavras digitadas precisam aparecer como prefixo."""
+    return ' AND '.join(f'{_quote(token)}*' for token in tokens)
+
+
+def _trigrams(term):
+    """Conjunto de trigramas do termo (com bordas), usado na comparação aproximada."""
+    padded = f'  {term} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _similarity(trigrams_a, trigrams_b):
+    """Coeficiente de Dice entre dois conjuntos de trigramas."""
+    return 2 * len(trigrams_a & trigrams_b) / (len(trigrams_a) + len(trigrams_b))
+
+
+def _fuzzy_expression(conn, tokens):
+    """
+    Expressão FTS5 tolerante a erros de digitação: cada palavra vira um OR entre ela mesma
+    e os termos mais parecidos do vocabulário do índice. Retorna None se alguma palavra
+    não tiver nenhum termo parecido.
+    """
+    vocabulary = [(term, _trigrams(term)) for (term,) in conn.execute(f"SELECT term FROM {FOODS_SEARCH_VOCAB_TABLE}")]
+    groups = []
+    for token in tokens:
+        token_trigrams = _trigrams(token)
+        scored = sorted(
+            ((_similarity(token_trigrams, trigrams), term) for term, trigrams in vocabulary),
+            reverse=True
+        )[:FUZZY_MAX_CANDIDATES]
+        candidates = [term for score, term in scored if score >= FUZZY_MIN_SIMILARITY]
+        if not candidates:
+            return None
+        groups.append('(' + ' OR '.join([f'{_quote(token)}*'] + [_quote(term) for term in candidates]) + ')')
+    return ' AND '.join(groups)
+
+
+def _match(conn, expression, first_token, limit):
+    """Executa a busca; descrições que começam pela primeira palavra digitada aparecem antes."""
+    return conn.execute(
+        f"""
+        SELECT food_id, description
+        FROM {FOODS_SEARCH_TABLE}
+        WHERE {FOODS_SEARCH_TABLE} MATCH ?
+        ORDER BY substr(search_text, 1, length(?)) = ? DESC, rank, length(search_text)
+        LIMIT ?
+        """,
+        (expression, first_token, first_token, limit)
+    ).fetchall()
+
+
+def search_foods(query, limit=DEFAULT_LIMIT):
+    """
+    Busca alimentos da TACO pelo nome, ignorando acentos e maiúsculas.
+    Primeiro procura por prefixo de todas as palavras; se faltarem resultados,
+    completa com correspondências aproximadas (erros de digitação).
+    Retorna um DataFrame com as colunas food_id e description, ordenado por relevância.
+    """
+    tokens = tokenize(query)
+    if not tokens:
+        return pd.DataFrame(columns=['food_id', 'description'])
+
+    with db_utils.get_db_connection() as conn:
+        rows = [tuple(row) for row in _match(conn, _prefix_expression(tokens), tokens[0], limit)]
+        if len(rows) < limit:
+            expression = _fuzzy_expression(conn, tokens)
+            if expression is not None:
+                found = {food_id for food_id, _ in rows}
+                for food_id, description in _match(conn, expression, tokens[0], limit):
+                    if food_id not in found and len(rows) < limit:
+                        rows.append((food_id, description))
+
+    return pd.DataFrame(rows, columns=['food_id', 'description'])
@@ -0,0 +1,231 @@
+# src/food_similarity.py
+
+import threading
+import numpy as np
+from src import db_utils
+from src.nutrient_matrix import get_nutrient_matrix, load_nutrient_matrix
+from src.lazy_imports import lazy_import
+pd = lazy_import('pandas')
+
+# Busca de substitutos (equivalentes) de um alimento: vizinhos mais próximos no espaço dos
+# nutrientes padronizados (z-score por nutriente, sobre todos os alimentos da tabela foods).
+# A distância é euclidiana ponderada: os pesos escolhem quais nutrientes importam na troca.
+SUBSTITUTES_TABLE = 'food_substitutes'
+
+WEIGHT_PRESETS = {
+    'geral': {'energy_kcal': 1.0, 'protein_g': 1.0, 'carbohydrate_g': 1.0, 'lipid_g': 1.0, 'dietary_fiber_g': 1.0},
+    'carboidratos': {'carbohydrate_g': 2.0, 'dietary_fiber_g': 1.0, 'energy_kcal': 1.0},
+    'proteinas': {'protein_g': 2.0, 'lipid_g': 1.0, 'energy_kcal': 1.0},
+    'micronutrientes': {
+        'calcium_mg': 1.0, 'iron_mg': 1.0, 'magnesium_mg': 1.0, 'potassium_mg': 1.0,
+        'sodium_mg': 1.0, 'zinc_mg': 1.0, 'vitamin_c_mg': 1.0,
+    },
+}
+DEFAULT_PRESET = 'geral'
+# Nutrientes que podem servir de base para a equivalência em gramas (mesma quantidade na troca)
+EQUIVALENCE_NUTRIENTS = ('energy_kcal', 'carbohydrate_g', 'protein_g', 'lipid_g')
+DEFAULT_K = 10
+PRECOMPUTED_K = 20  # Vizinhos guardados por alimento e perfil na tabela food_substitutes
+MAX_EQUIVALENT_GRAMS = 1000.0  # Descarta substitutos que exigiriam porções absurdas
+PAIRWISE_BLOCK_ROWS = 1024  # Linhas por bloco no cálculo de todos os pares (limita a memória)
+
+
+def create_substitutes_table(conn):
+    """Tabela com os vizinhos pré-calculados de cada alimento, por perfil de pesos."""
+    conn.execute(f"""
+    CREATE TABLE IF NOT EXISTS {SUBSTITUTES_TABLE} (
+        profile TEXT NOT NULL,
+        food_id INTEGER NOT NULL,
+        rank INTEGER NOT NULL,
+        substitute_id INTEGER NOT NULL,
+        distance REAL NOT NULL,
+        PRIMARY KEY (profile, food_id, rank)
+    ) WITHOUT ROWID;
+    """)
+
+
+class FoodSimilarity:
+    """
+    Matriz de nutrientes padronizada (alimentos x nutrientes, z-score por coluna) pronta para
+    consultas de vizinhos mais próximos. Imutável, compartilhada entre as sessões como a NutrientMatrix.
+    """
+
+    def __init__(self, matrix, descriptions=None):
+        self.matrix = matrix
+        self.descriptions = descriptions or {}
+        self.mean = matrix.values.mean(axis=0)
+        scale = matrix.values.std(axis=0)
+        self.scale = np.where(scale > 0, scale, 1.0)  # Nutriente constante: não pesa na distância
+        self.standardized = np.ascontiguousarray((matrix.values - self.mean) / self.scale)
+        self.standardized.flags.writeable = False
+
+    def weight_vector(self, weights=DEFAULT_PRESET):
+        """Converte um perfil (nome em WEIGHT_PRESETS) ou um dicionário {nutriente: peso} em um vetor de pesos."""
+        if isinstance(weights, str):
+            if weights not in WEIGHT_PRESETS:
+                raise ValueError(f"Perfil de pesos desconhecido: {weights}")
+            weights = WEIGHT_PRESETS[weights]
+        vector = np.zeros(len(self.matrix.columns))
+        for nutrient, weight in weights.items():
+            if nutrient not in self.matrix.columns:
+                raise ValueError(f"Nutriente desconhecido: {nutrient}")
+            vector[self.matrix.columns.index(nutrient)] = weight
+        if not vector.any():
+            raise ValueError("Informe peso maior que zero para pelo menos um nutriente.")
+        return vector
+
+    def neighbours(self, food_id, grams=100.0, k=DEFAULT_K, weights=DEFAULT_PRESET, match=None,
+                   max_grams=MAX_EQUIVALENT_GRAMS, exclude=()):
+        """
+        Os k alimentos mais parecidos com `grams` gramas de food_id.
+        match=None compara a composição por 100 g (o substituto usa a mesma quantidade em gramas).
+        match='energy_kcal' (ou outro de EQUIVALENCE_NUTRIENTS) calcula para cada candidato a porção
+        com a mesma quantidade desse nutriente e compara os nutrientes nessas porções.
+        Retorna um DataFrame com food_id, description, grams, distance e os nutrientes ponderados.
+        """
+        row = self.matrix.row_index[int(food_id)]
+        weight_vector = self.weight_vector(weights)
+        columns = np.flatnonzero(weight_vector)
+        column_weights = weight_vector[columns]
+        values = self.matrix.values[:, columns]
+
+        if match is None:
+            equivalent_grams = np.full(len(self.matrix), float(grams))
+            differences = self.standardized[:, columns] - self.standardized[row, columns]
+            distances = np.sqrt((differences ** 2 * column_weights).sum(axis=1))
+        else:
+            if match not in EQUIVALENCE_NUTRIENTS:
+                raise ValueError(f"A equivalência deve ser por um destes nutrientes: {', '.join(EQUIVALENCE_NUTRIENTS)}")
+            per_100g = self.matrix.values[:, self.matrix.columns.index(match)]
+            target = per_100g[row] * grams / 100
+            if target <= 0:
+                raise ValueError(f"O alimento não tem {match}; escolha outra base de equivalência.")
+            with np.errstate(divide='ignore'):
+                equivalent_grams = np.where(per_100g > 0, target * 100 / per_100g, np.inf)
+            portions = np.where(np.isfinite(equivalent_grams), equivalent_grams, 0.0) / 100
+            differences = (values * portions[:, None] - values[row] * grams / 100) / self.scale[columns]
+            distances = np.sqrt((differences ** 2 * column_weights).sum(axis=1))
+            distances[equivalent_grams > max_grams] = np.inf
+
+        distances[row] = np.inf
+        if len(exclude):
+            distances[self.matrix.rows_for(exclude)] = np.inf
+        k = min(k, len(distances) - 1)
+        nearest = np.argpartition(distances, k)[:k] if k < len(distances) else np.arange(len(distances))
+        nearest = nearest[np.argsort(distances[nearest], kind='stable')]
+        nearest = nearest[np.isfinite(distances[nearest])]
+
+        food_ids = self.matrix.food_ids[nearest]
+        result = pd.DataFrame({
+            'food_id': food_ids,
+            'description': [self.descriptions.get(int(food), '') for food in food_ids],
+            'grams': equivalent_grams[nearest].round(0),
+            'distance': distances[nearest],
+        })
+        for position, column in enumerate(columns):
+            result[self.matrix.columns[column]] = values[nearest, position] * equivalent_grams[nearest] / 100
+        return result
+
+    def all_pairs_top_k(self, k=PRECOMPUTED_K, weights=DEFAULT_PRESET):
+        """
+        Os k vizinhos de todos os alimentos (composição por 100 g), em blocos de linhas:
+        ||a - b||² = ||a||² + ||b||² - 2a·b com os atributos já multiplicados pela raiz dos pesos.
+        Retorna (vizinhos, distâncias), arrays alimentos x k com as linhas da matriz e as distâncias.
+        """
+        weight_vector = self.weight_vector(weights)
+        features = self.standardized * np.sqrt(weight_vector)
+        squared_norms = (features ** 2).sum(axis=1)
+        n_foods = len(features)
+        k = min(k, n_foods - 1)
+        neighbours = np.empty((n_foods, k), dtype=np.intp)
+        distances = np.empty((n_foods, k))
+        for start in range(0, n_foods, PAIRWISE_BLOCK_ROWS):
+            block = slice(start, min(start + PAIRWISE_BLOCK_ROWS, n_foods))
+            squared = squared_norms[block, None] + squared_norms[None, :] - 2 * features[block] @ features.T
+            np.maximum(squared, 0, out=squared)  # Arredondamento pode deixar valores levemente negativos
+            block_rows = np.arange(block.start, block.stop)
+            squared[block_rows - block.start, block_rows] = np.inf  # O próprio alimento não é vizinho
+            nearest = np.argpartition(squared, k - 1, axis=1)[:, :k]
+            nearest_squared = np.take_along_axis(squared, nearest, axis=1)
+            order = np.argsort(nearest_squared, axis=1, kind='stable')
+            neighbours[block] = np.take_along_axis(nearest, order, axis=1)
+            distances[block] = np.sqrt(np.take_along_axis(nearest_squared, order, axis=1))
+        return neighbours, distances
+
+
+def rebuild_substitutes_table(conn, k=PRECOMPUTED_K):
+    """
+    Recalcula a tabela food_substitutes (todos os perfis de WEIGHT_PRESETS) a partir da tabela foods.
+    Deve ser chamada sempre que a TACO for recarregada. Retorna o número de linhas gravadas.
+    """
+    create_substitutes_table(conn)
+    matrix = load_nutrient_matrix(conn)
+    similarity = FoodSimilarity(matrix)
+    conn.execute(f"DELETE FROM {SUBSTITUTES_TABLE}")
+    written = 0
+    for profile in WEIGHT_PRESETS:
+        neighbours, distances = similarity.all_pairs_top_k(k, profile)
+        food_ids = matrix.food_ids.tolist()
+        substitute_ids = matrix.food_ids[neighbours].tolist()
+        rows = [
+            (profile, food_ids[row], rank, substitute_ids[row][rank], float(distances[row, rank]))
+            for row in range(len(food_ids)) for rank in range(neighbours.shape[1])
+        ]
+        conn.executemany(
+            f"INSERT INTO {SUBSTITUTES_TABLE} (profile, food_id, rank, substitute_id, distance) VALUES (?, ?, ?, ?, ?)",
+            rows
+        )
+        written += len(rows)
+    conn.commit()
+    return written
+
+
+_similarity = None
+_similarity_lock = threading.Lock()
+
+
+def get_food_similarity():
+    """FoodSimilarity do processo, montada sobre a NutrientMatrix atual (recriada se ela mudar)."""
+    global _similarity
+    matrix = get_nutrient_matrix()
+    similarity = _similarity
+    if similarity is not None and similarity.matrix is matrix:
+        return similarity
+    with _similarity_lock:
+        if _similarity is None or _similarity.matrix is not matrix:
+            with db_utils.get_db_connection() as conn:
+                descriptions = dict(conn.execute("SELECT food_id, description FROM foods").fetchall())
+            _similarity = FoodSimilarity(matrix, descriptions)
+        return _similarity
+
+
+def find_substitutes(food_id, grams=100.0, k=DEFAULT_K, weights=DEFAULT_PRESET, match=None):
+    """
+    Substitutos de um alimento (mesmas colunas de FoodSimilarity.neighbours).
+    Buscas por um perfil de WEIGHT_PRESETS sem equivalência (match=None) vêm da tabela
+    pré-calculada quando o alimento está nela; as demais são calculadas na hora.
+    """
+    if isinstance(weights, str) and match is None and k <= PRECOMPUTED_K:
+        with db_utils.get_db_connection() as conn:
+            rows = conn.execute(
+                f"""
+                SELECT s.substitute_id, f.description, s.distance
+                FROM {SUBSTITUTES_TABLE} s JOIN foods f ON f.food_id = s.substitute_id
+                WHERE s.profile = ? AND s.food_id = ?
+                ORDER BY s.rank
+                LIMIT ?
+                """,
+                (weights, int(food_id), k)
+            ).fetchall()
+        if rows:
+            matrix = get_nutrient_matrix()
+            substitute_ids, descriptions, distances = zip(*rows)
+            result = pd.DataFrame({
+                'food_id': substitute_ids, 'description': descriptions,
+                'grams': float(grams), 'distance': distances,
+            })
+            nutrient_rows = matrix.rows_for(substitute_ids)
+            for nutrient in WEIGHT_PRESETS.get(weights, {}):
+                result[nutrient] = matrix.values[nutrient_rows, matrix.columns.index(nutrient)] * grams / 100
+            return result
+    return get_food_similarity().neighbours(food_id, grams=grams, k=k, weights=weights, match=match)
@@ -0,0 +1,272 @@
+# src/instrumentation.py
+
+import bisect
+import functools
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+# Instrumentação leve dos caminhos quentes (db_utils, cálculos e SQL).
+# Desligada por padrão: cada chamada instrumentada custa só a checagem de uma variável global.
+# Ligue com NUTRI_INSTRUMENTATION=1 (ou enable() / página de administração).
+ENABLED_ENV = 'NUTRI_INSTRUMENTATION'
+SLOW_QUERY_ENV = 'NUTRI_SLOW_QUERY_MS'
+SLOW_QUERY_LOG_FILE_ENV = 'NUTRI_SLOW_QUERY_LOG'  # Se definido, o log lento também vai para este arquivo (JSON lines)
+DEFAULT_SLOW_QUERY_MS = 50.0
+SLOW_QUERY_LOG_SIZE = 200  # Consultas lentas mantidas em memória
+
+# Limites superiores (em segundos) das faixas do histograma de latência, como no Prometheus
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+_enabled = os.environ.get(ENABLED_ENV, '').lower() in ('1', 'true', 'yes', 'sim')
+slow_query_ms = float(os.environ.get(SLOW_QUERY_ENV, DEFAULT_SLOW_QUERY_MS))
+
+_metrics = {}  # (tipo, nome) -> _Metric
+_metrics_lock = threading.Lock()
+_slow_queries = deque(maxlen=SLOW_QUERY_LOG_SIZE)
+
+
+class _Metric:
+    """Contagem, erros, linhas e histograma de latência de uma função ou tipo de comando SQL."""
+
+    def __init__(self, kind, name):
+        self.kind = kind
+        self.name = name
+        self.count = 0
+        self.errors = 0
+        self.rows = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)  # Última faixa: acima do maior limite (+Inf)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds, rows=None, error=False):
+        with self._lock:
+            self.count += 1
+            self.errors += error
+            self.rows += rows or 0
+            self.total_seconds += seconds
+            self.max_seconds = max(self.max_seconds, seconds)
+            self.buckets[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+
+    def quantile(self, fraction):
+        """Estimativa do quantil pelo histograma (limite superior da faixa onde ele cai)."""
+        target = self.count * fraction
+        seen = 0
+        for upper, count in zip(LATENCY_BUCKETS + (float('inf'),), self.buckets):
+            seen += count
+            if seen >= target:
+                return min(upper, self.max_seconds)
+        return self.max_seconds
+
+
+def _metric(kind, name):
+    metric = _metrics.get((kind, name))
+    if metric is None:
+        with _metrics_lock:
+            metric = _metrics.setdefault((kind, name), _Metric(kind, name))
+    return metric
+
+
+# --- Ligar/desligar ---
+
+def is_enabled():
+    return _enabled
+
+
+def enable(slow_threshold_ms=None):
+    """Liga a instrumentação (opcionalmente com outro limite para o log de consultas lentas)."""
+    global _enabled, slow_query_ms
+    _enabled = True
+    if slow_threshold_ms is not None:
+        slow_query_ms = float(slow_threshold_ms)
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def reset():
+    """Zera as métricas e o log de consultas lentas."""
+    with _metrics_lock:
+        _metrics.clear()
+    _slow_queries.clear()
+
+
+# --- Funções ---
+
+def _default_row_count(result):
+    """Linhas de um resultado: tamanho de DataFrames e listas; None para o resto."""
+    if isinstance(result, list) or hasattr(result, 'shape'):
+        return len(result)
+    return None
+
+
+def instrumented(name=None, rows=_default_row_count):
+    """
+    Decorador que registra chamadas, erros, latência e linhas devolvidas pela função.
+    rows: função que recebe o resultado e devolve o número de linhas (ou None).
+    Com a instrumentação desligada, a função é chamada diretamente.
+    """
+    def decorator(function):
+        metric_name = name or f"{function.__module__.split('.')[-1]}.{function.__name__}"
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return function(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                result = function(*args, **kwargs)
+            except BaseException:
+                _metric('function', metric_name).observe(time.perf_counter() - start, error=True)
+                raise
+            _metric('function', metric_name).observe(time.perf_counter() - start, rows(result))
+            return result
+        return wrapper
+    return decorator
+
+
+# --- SQL ---
+
+def _statement_kind(sql):
+    words = sql.lstrip().split(None, 1)
+    return words[0].lower() if words else 'vazio'
+
+
+def _query_plan(connection, sql, parameters):
+    """EXPLAIN QUERY PLAN do comando, com os mesmos parâmetros (não executa o comando)."""
+    try:
+        cursor = sqlite3.Cursor(connection)  # Cursor comum: não entra de novo na instrumentação
+        return [row[-1] for row in cursor.execute(f"EXPLAIN QUERY PLAN {sql}", parameters).fetchall()]
+    except sqlite3.Error as error:
+        return [f"(plano indisponível: {error})"]
+
+
+def _record_slow_query(connection, sql, parameters, seconds):
+    entry = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'duration_ms': round(seconds * 1000, 3),
+        'sql': ' '.join(sql.split()),
+        'plan': _query_plan(connection, sql, parameters) if _statement_kind(sql) in ('select', 'with', 'update', 'delete', 'insert') else [],
+    }
+    _slow_queries.append(entry)
+    _metric('sql', 'slow').observe(seconds)
+    log_file = os.environ.get(SLOW_QUERY_LOG_FILE_ENV)
+    if log_file:
+        with open(log_file, 'a', encoding='utf-8') as file:
+            file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor que mede execute/executemany por tipo de comando e registra as consultas lentas."""
+
+    def execute(self, sql, parameters=()):
+        if not _enabled:
+            return super().execute(sql, parameters)
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            seconds = time.perf_counter() - start
+            _metric('sql', _statement_kind(sql)).observe(seconds)
+            if seconds * 1000 >= slow_query_ms:
+                _record_slow_query(self.connection, sql, parameters, seconds)
+
+    def executemany(self, sql, seq_of_parameters):
+        if not _enabled:
+            return super().executemany(sql, seq_of_parameters)
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            seconds = time.perf_counter() - start
+            _metric('sql', _statement_kind(sql)).observe(seconds, self.rowcount if self.rowcount > 0 else None)
+            if seconds * 1000 >= slow_query_ms:
+                _record_slow_query(self.connection, sql, (), seconds)
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """
+    Conexão cujos cursores são InstrumentedCursor, inclusive os de Connection.execute e os
+    do pandas (read_sql_query), para que todo SQL passe pela medição.
+    Use como sqlite3.connect(..., factory=InstrumentedConnection).
+    """
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+# --- Leitura e exportação ---
+
+def snapshot():
+    """Lista de dicionários com as métricas atuais (para tabelas e relatórios)."""
+    with _metrics_lock:
+        metrics = list(_metrics.values())
+    return [
+        {
+            'kind': metric.kind,
+            'name': metric.name,
+            'count': metric.count,
+            'errors': metric.errors,
+            'rows': metric.rows,
+            'total_ms': metric.total_seconds * 1000,
+            'mean_ms': metric.total_seconds * 1000 / metric.count if metric.count else 0.0,
+            'p95_ms': metric.quantile(0.95) * 1000,
+            'max_ms': metric.max_seconds * 1000,
+        }
+        for metric in sorted(metrics, key=lambda metric: (metric.kind, metric.name))
+    ]
+
+
+def slow_queries():
+    """Consultas lentas mais recentes primeiro (SQL, duração e plano de execução)."""
+    return list(reversed(_slow_queries))
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"')
+
+
+def prometheus_text():
+    """Exporta as métricas no formato texto do Prometheus."""
+    with _metrics_lock:
+        metrics = sorted(_metrics.values(), key=lambda metric: (metric.kind, metric.name))
+    families = {
+        'function': ('nutri_call', 'function', "Chamadas instrumentadas (db_utils e cálculos)"),
+        'sql': ('nutri_sql', 'statement', "Comandos SQL por tipo (execute/executemany)"),
+    }
+    lines = []
+    for kind, (prefix, label, description) in families.items():
+        selected = [metric for metric in metrics if metric.kind == kind]
+        lines += [
+            f"# HELP {prefix}_duration_seconds {description}: latência",
+            f"# TYPE {prefix}_duration_seconds histogram",
+        ]
+        for metric in selected:
+            labels = f'{label}="{_label(metric.name)}"'
+            cumulative = 0
+            for upper, count in zip(LATENCY_BUCKETS, metric.buckets):
+                cumulative += count
+                lines.append(f'{prefix}_duration_seconds_bucket{{{labels},le="{upper}"}} {cumulative}')
+            lines.append(f'{prefix}_duration_seconds_bucket{{{labels},le="+Inf"}} {metric.count}')
+            lines.append(f"{prefix}_duration_seconds_sum{{{labels}}} {metric.total_seconds}")
+            lines.append(f"{prefix}_duration_seconds_count{{{labels}}} {metric.count}")
+        for suffix, attribute, text in (('errors_total', 'errors', 'erros'), ('rows_total', 'rows', 'linhas')):
+            lines += [f"# HELP {prefix}_{suffix} {description}: {text}", f"# TYPE {prefix}_{suffix} counter"]
+            lines += [
+                f'{prefix}_{suffix}{{{label}="{_label(metric.name)}"}} {getattr(metric, attribute)}'
+                for metric in selected
+            ]
+    return '\n'.join(lines) + '\n'
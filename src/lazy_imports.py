@@ -0,0 +1,48 @@
+# src/lazy_imports.py
+
+import importlib
+import sys
+import threading
+
+# Importação adiada de bibliotecas pesadas (pandas, plotly, highspy...).
+# Os módulos do app usam `pd = lazy_import('pandas')` no lugar de `import pandas as pd`: a
+# biblioteca só é carregada no primeiro uso de um atributo (ex: pd.read_sql_query), e não ao
+# abrir uma página. Assim uma página que não precisa do pandas não paga os ~0,4 s de importação.
+_proxies = {}
+_proxies_lock = threading.Lock()
+
+
+class LazyModule:
+    """Representa um módulo ainda não importado; importa-o no primeiro acesso a um atributo."""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            # import_module segura o lock de importação do Python: seguro entre as threads do Streamlit
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attribute):
+        value = getattr(self._load(), attribute)
+        # Guarda no próprio objeto: os próximos acessos não passam mais por __getattr__
+        self.__dict__[attribute] = value
+        return value
+
+    def __repr__(self):
+        state = 'carregado' if self._module is not None else 'não carregado'
+        return f"<LazyModule '{self._name}' ({state})>"
+
+
+def lazy_import(name):
+    """
+    Retorna o módulo, se ele já foi importado, ou um LazyModule que o importa no primeiro uso.
+    Há um único LazyModule por nome no processo, compartilhado por todas as páginas e sessões.
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    with _proxies_lock:
+        return _proxies.setdefault(name, LazyModule(name))
@@ -0,0 +1,167 @@
+# src/meal_plan_optimizer.py
+
+import time
+import numpy as np
+from src.nutrient_matrix import get_nutrient_matrix
+from src.lazy_imports import lazy_import
+pd = lazy_import('pandas')
+highspy = lazy_import('highspy')
+
+# Nutrientes com meta (kcal e macros): o otimizador minimiza o desvio relativo de cada um
+TARGET_NUTRIENTS = ('energy_kcal', 'protein_g', 'carbohydrate_g', 'lipid_g')
+DEFAULT_PORTION_BOUNDS = (0.0, 300.0)  # Gramas mínimos/máximos de cada alimento
+# Custo por 100 g de alimento: desempata soluções equivalentes a favor de menos comida
+FOOD_COST = 1e-6
+
+
+class MealPlanOptimizer:
+    """
+    Monta um plano alimentar por programação linear (HiGHS) sobre a matriz de nutrientes da TACO.
+
+    Variáveis: porções de 100 g de cada alimento permitido, mais um par de folgas (acima/abaixo)
+    por meta. Cada meta vira uma linha "nutriente - folga_acima + folga_abaixo = meta" e o objetivo
+    é a soma ponderada dos desvios relativos. Pisos e tetos de micronutrientes (sódio, fibra,
+    cálcio, ferro...) viram linhas com limites; as porções viram limites das variáveis.
+
+    O modelo fica vivo entre as chamadas: set_targets, set_nutrient_bounds, set_portion_bounds e
+    remove_food só alteram o modelo, e o próximo solve() parte da base ótima anterior (warm start),
+    então pequenas edições num plano são re-resolvidas em poucas iterações.
+    """
+
+    def __init__(self, food_ids, targets, nutrient_bounds=None, portion_bounds=None, target_weights=None, matrix=None):
+        """
+        food_ids: alimentos permitidos.
+        targets: {nutriente: meta}, ex: {'energy_kcal': 2000, 'protein_g': 100, ...}.
+        nutrient_bounds: {nutriente: (mínimo, máximo)}; use None para um lado sem limite.
+        portion_bounds: {food_id: (gramas_mín, gramas_máx)}; os demais usam DEFAULT_PORTION_BOUNDS.
+        target_weights: {nutriente: peso} do desvio de cada meta no objetivo (padrão 1).
+        """
+        self.matrix = matrix or get_nutrient_matrix()
+        self._nutrient_columns = {name: column for column, name in enumerate(self.matrix.columns)}
+        self._target_weights = dict(target_weights or {})
+        self._targets = {}
+        self._rows = {}  # ('target'|'bound', nutriente) -> linha do modelo
+        self._food_columns = {}  # food_id -> coluna do modelo
+        self._deviation_columns = {}  # nutriente -> (coluna folga_acima, coluna folga_abaixo)
+
+        self._highs = highspy.Highs()
+        self._highs.setOptionValue('output_flag', False)
+
+        for nutrient, target in targets.items():
+            self._add_target_row(nutrient, target)
+        for nutrient, (lower, upper) in (nutrient_bounds or {}).items():
+            self.set_nutrient_bounds(nutrient, lower, upper)
+        portion_bounds = portion_bounds or {}
+        for food_id in food_ids:
+            self.set_portion_bounds(food_id, *portion_bounds.get(food_id, DEFAULT_PORTION_BOUNDS))
+
+    # --- Construção e edição do modelo ---
+
+    def _nutrient_coefficients(self, food_id):
+        """Nutrientes de 100 g do alimento, um valor por linha atual do modelo."""
+        values = self.matrix.values[self.matrix.row_index[int(food_id)]]
+        rows = np.array(list(self._rows.values()), dtype=np.int32)
+        coefficients = np.array([values[self._nutrient_columns[nutrient]] for _, nutrient in self._rows], dtype=float)
+        nonzero = coefficients != 0
+        return rows[nonzero], coefficients[nonzero]
+
+    def _deviation_cost(self, nutrient):
+        return self._target_weights.get(nutrient, 1.0) / max(abs(self._targets[nutrient]), 1.0)
+
+    def _add_target_row(self, nutrient, target):
+        self._targets[nutrient] = float(target)
+        row = self._add_row(nutrient, target, target, kind='target')
+        cost = self._deviation_cost(nutrient)
+        # folga_acima entra com -1 e folga_abaixo com +1: nutriente - acima + abaixo = meta
+        above = self._add_column(cost, 0.0, highspy.kHighsInf, [row], [-1.0])
+        below = self._add_column(cost, 0.0, highspy.kHighsInf, [row], [1.0])
+        self._deviation_columns[nutrient] = (above, below)
+
+    def _add_row(self, nutrient, lower, upper, kind):
+        """Acrescenta uma linha com os coeficientes do nutriente para todos os alimentos já no modelo."""
+        column = self._nutrient_columns[nutrient]
+        food_columns = np.array(list(self._food_columns.values()), dtype=np.int32)
+        coefficients = np.array(
+            [self.matrix.values[self.matrix.row_index[food_id], column] for food_id in self._food_columns], dtype=float
+        )
+        nonzero = coefficients != 0
+        self._highs.addRow(lower, upper, int(nonzero.sum()), food_columns[nonzero], coefficients[nonzero])
+        row = self._highs.getNumRow() - 1
+        self._rows[(kind, nutrient)] = row
+        return row
+
+    def _add_column(self, cost, lower, upper, rows, values):
+        self._highs.addCol(cost, lower, upper, len(rows), np.asarray(rows, dtype=np.int32), np.asarray(values, dtype=float))
+        return self._highs.getNumCol() - 1
+
+    def set_targets(self, targets):
+        """Altera as metas (ex: nova meta calórica) sem reconstruir o modelo."""
+        for nutrient, target in targets.items():
+            if nutrient not in self._targets:
+                self._add_target_row(nutrient, target)
+                continue
+            self._targets[nutrient] = float(target)
+            row = self._rows[('target', nutrient)]
+            self._highs.changeRowBounds(row, target, target)
+            for column in self._deviation_columns[nutrient]:
+                self._highs.changeColCost(column, self._deviation_cost(nutrient))
+
+    def set_nutrient_bounds(self, nutrient, lower=None, upper=None):
+        """Define piso e/ou teto de um nutriente (None = sem limite daquele lado)."""
+        lower = -highspy.kHighsInf if lower is None else float(lower)
+        upper = highspy.kHighsInf if upper is None else float(upper)
+        row = self._rows.get(('bound', nutrient))
+        if row is None:
+            self._add_row(nutrient, lower, upper, kind='bound')
+        else:
+            self._highs.changeRowBounds(row, lower, upper)
+
+    def set_portion_bounds(self, food_id, min_grams, max_grams):
+        """Define a porção mínima/máxima de um alimento, acrescentando-o ao modelo se ainda não estiver."""
+        lower, upper = min_grams / 100, max_grams / 100
+        column = self._food_columns.get(food_id)
+        if column is None:
+            rows, values = self._nutrient_coefficients(food_id)
+            self._food_columns[food_id] = self._add_column(FOOD_COST, lower, upper, rows, values)
+        else:
+            self._highs.changeColBounds(column, lower, upper)
+
+    def remove_food(self, food_id):
+        """Tira um alimento do plano (a coluna continua no modelo, fixada em zero)."""
+        column = self._food_columns.get(food_id)
+        if column is not None:
+            self._highs.changeColBounds(column, 0.0, 0.0)
+
+    # --- Solução ---
+
+    def solve(self):
+        """
+        Resolve (ou re-resolve, a partir da base anterior) e retorna um dicionário com:
+        status, grams (Series food_id -> gramas), totals (Series de nutrientes),
+        deviations ({nutriente: total - meta}), iterations e solve_ms.
+        """
+        start = time.perf_counter()
+        self._highs.run()
+        solve_ms = (time.perf_counter() - start) * 1000
+
+        status = self._highs.getModelStatus()
+        result = {
+            'status': self._highs.modelStatusToString(status),
+            'optimal': status == highspy.HighsModelStatus.kOptimal,
+            'iterations': self._highs.getInfo().simplex_iteration_count,
+            'solve_ms': solve_ms,
+        }
+        if not result['optimal']:
+            return result
+
+        solution = np.asarray(self._highs.getSolution().col_value)
+        food_ids = list(self._food_columns)
+        grams = solution[list(self._food_columns.values())] * 100
+        grams = pd.Series(np.where(grams > 1e-6, grams, 0.0), index=pd.Index(food_ids, name='food_id'))
+        totals = self.matrix.totals(grams[grams > 0].items())
+        result.update({
+            'grams': grams,
+            'totals': totals,
+            'deviations': {nutrient: float(totals[nutrient] - target) for nutrient, target in self._targets.items()},
+        })
+        return result
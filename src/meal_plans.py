@@ -0,0 +1,259 @@
+# src/meal_plans.py
+
+import numpy as np
+from src import db_utils
+from src.instrumentation import instrumented
+from src.nutrient_matrix import get_nutrient_matrix
+from src.lazy_imports import lazy_import
+pd = lazy_import('pandas')
+
+# Refeições de cada dia do plano; no banco fica só o índice (meal_plan_items.meal)
+MEALS = ('Café da manhã', 'Lanche da manhã', 'Almoço', 'Lanche da tarde', 'Jantar', 'Ceia')
+MAX_DAYS = 28 * 3  # Planos de até 12 semanas
+# Nutrientes mostrados nos resumos do plano (página e relatórios)
+SUMMARY_NUTRIENTS = ('energy_kcal', 'protein_g', 'carbohydrate_g', 'lipid_g', 'dietary_fiber_g', 'sodium_mg')
+
+_LOAD_QUERY = """
+SELECT p.patient_id, p.name, p.n_days, i.day, i.meal, i.food_id, i.grams
+FROM meal_plans p
+LEFT JOIN meal_plan_items i ON i.plan_id = p.id
+WHERE p.id = ?
+"""
+
+
+class MealPlan:
+    """
+    Plano alimentar de vários dias em memória.
+    Os itens ficam em um dicionário {food_id: gramas} por dia e refeição; os totais de nutrientes
+    de cada refeição e de cada dia ficam em arrays (dias x refeições x nutrientes e dias x nutrientes)
+    atualizados de forma incremental a cada alteração, sem recalcular o plano inteiro.
+    As alterações desde o último save_meal_plan() são guardadas para que só elas sejam gravadas.
+    """
+
+    def __init__(self, n_days, name, patient_id=None, plan_id=None, matrix=None):
+        if not 1 <= n_days <= MAX_DAYS:
+            raise ValueError(f"O plano deve ter entre 1 e {MAX_DAYS} dias.")
+        self.plan_id = plan_id
+        self.patient_id = patient_id
+        self.name = name
+        self.n_days = n_days
+        self.matrix = matrix if matrix is not None else get_nutrient_matrix()
+        self._slots = [[{} for _ in MEALS] for _ in range(n_days)]
+        n_nutrients = len(self.matrix.columns)
+        self._meal_totals = np.zeros((n_days, len(MEALS), n_nutrients))
+        self._day_totals = np.zeros((n_days, n_nutrients))
+        self._original = {}  # (dia, refeição, food_id) -> gramas no banco (None = não existia)
+        self._header_changed = plan_id is None
+
+    @classmethod
+    def from_rows(cls, plan_id, patient_id, name, n_days, days, meals, food_ids, grams, matrix=None):
+        """Monta o plano a partir de arrays paralelos de itens, somando os totais de uma só vez."""
+        plan = cls(n_days, name, patient_id=patient_id, plan_id=plan_id, matrix=matrix)
+        plan._header_changed = False
+        if len(food_ids):
+            for day, meal, food_id, value in zip(days.tolist(), meals.tolist(), food_ids.tolist(), grams.tolist()):
+                plan._slots[day][meal][food_id] = value
+            contributions = (grams / 100)[:, None] * plan.matrix.values[plan.matrix.rows_for(food_ids)]
+            np.add.at(plan._meal_totals, (days, meals), contributions)
+            plan._day_totals = plan._meal_totals.sum(axis=1)
+        return plan
+
+    def _check_slot(self, day, meal):
+        if not 0 <= day < self.n_days:
+            raise IndexError(f"Dia {day} fora do plano (0 a {self.n_days - 1}).")
+        if not 0 <= meal < len(MEALS):
+            raise IndexError(f"Refeição {meal} inexistente.")
+
+    # --- Edição ---
+
+    def set_item(self, day, meal, food_id, grams):
+        """Define a quantidade de um alimento em uma refeição; 0 (ou None) remove o alimento."""
+        self._check_slot(day, meal)
+        food_id = int(food_id)
+        grams = float(grams or 0.0)
+        row = self.matrix.row_index[food_id]  # KeyError para alimentos fora da tabela foods
+        slot = self._slots[day][meal]
+        previous = slot.get(food_id)
+        if grams == (previous or 0.0):
+            return
+
+        key = (day, meal, food_id)
+        self._original.setdefault(key, previous)
+        if grams > 0:
+            slot[food_id] = grams
+        else:
+            slot.pop(food_id, None)
+        delta = (grams - (previous or 0.0)) / 100 * self.matrix.values[row]
+        self._meal_totals[day, meal] += delta
+        self._day_totals[day] += delta
+
+    def remove_item(self, day, meal, food_id):
+        self.set_item(day, meal, food_id, 0)
+
+    def set_meal(self, day, meal, items):
+        """Substitui todos os itens de uma refeição por items ({food_id: gramas})."""
+        self._check_slot(day, meal)
+        items = {int(food_id): grams for food_id, grams in items.items()}
+        for food_id in list(self._slots[day][meal]):
+            if food_id not in items:
+                self.set_item(day, meal, food_id, 0)
+        for food_id, grams in items.items():
+            self.set_item(day, meal, food_id, grams)
+
+    def copy_day(self, source_day, target_day):
+        """Copia todas as refeições de um dia para outro (o dia de destino é substituído)."""
+        for meal in range(len(MEALS)):
+            self.set_meal(target_day, meal, dict(self._slots[source_day][meal]))
+
+    def rename(self, name):
+        if name != self.name:
+            self.name = name
+            self._header_changed = True
+
+    # --- Leitura ---
+
+    def items(self, day, meal):
+        """Itens de uma refeição: dicionário {food_id: gramas} (cópia)."""
+        self._check_slot(day, meal)
+        return dict(self._slots[day][meal])
+
+    def meal_totals(self, day, meal):
+        """Totais de nutrientes de uma refeição (Series indexada pelos nutrientes)."""
+        self._check_slot(day, meal)
+        return pd.Series(self._meal_totals[day, meal], index=self.matrix.columns)
+
+    def day_totals(self, day=None):
+        """Totais de um dia (Series) ou, sem day, de todos os dias (DataFrame dias x nutrientes)."""
+        if day is None:
+            return pd.DataFrame(self._day_totals, columns=self.matrix.columns)
+        self._check_slot(day, 0)
+        return pd.Series(self._day_totals[day], index=self.matrix.columns)
+
+    def n_items(self):
+        return sum(len(slot) for meals in self._slots for slot in meals)
+
+    def pending_changes(self):
+        """
+        Alterações ainda não gravadas: (upserts, deletes), listas de (dia, refeição, food_id, gramas)
+        e de (dia, refeição, food_id). Alterações desfeitas (voltaram ao valor do banco) são ignoradas.
+        """
+        upserts, deletes = [], []
+        for (day, meal, food_id), original in self._original.items():
+            current = self._slots[day][meal].get(food_id)
+            if current == original:
+                continue
+            if current is None:
+                deletes.append((day, meal, food_id))
+            else:
+                upserts.append((day, meal, food_id, current))
+        return upserts, deletes
+
+    def has_changes(self):
+        upserts, deletes = self.pending_changes()
+        return self._header_changed or bool(upserts or deletes)
+
+
+@instrumented()
+def load_meal_plan(plan_id, matrix=None):
+    """Carrega um plano com uma única consulta (cabeçalho + itens). Retorna None se não existir."""
+    with db_utils.get_db_connection() as conn:
+        rows = conn.execute(_LOAD_QUERY, (plan_id,)).fetchall()
+    if not rows:
+        return None
+
+    patient_id, name, n_days = rows[0][0], rows[0][1], rows[0][2]
+    items = [row[3:] for row in rows if row[5] is not None]
+    columns = np.array(items, dtype=float).reshape(len(items), 4).T
+    return MealPlan.from_rows(
+        plan_id, patient_id, name, n_days,
+        days=columns[0].astype(np.intp), meals=columns[1].astype(np.intp),
+        food_ids=columns[2].astype(np.int64), grams=columns[3],
+        matrix=matrix
+    )
+
+
+@instrumented()
+def save_meal_plan(plan):
+    """
+    Grava o plano. Um plano novo ganha seu id; nos existentes, só os itens alterados desde a
+    carga (ou o último save) são gravados, com upserts e deletes pela chave primária.
+    Retorna o número de itens gravados.
+    """
+    upserts, deletes = plan.pending_changes()
+    if not plan.has_changes():
+        return 0
+
+    name = plan.name
+    with db_utils.transaction() as conn:
+        plan_id = plan.plan_id
+        if plan_id is None:
+            cursor = conn.execute(
+                "INSERT INTO meal_plans (patient_id, name, n_days) VALUES (?, ?, ?)",
+                (plan.patient_id, name, plan.n_days)
+            )
+            plan_id = cursor.lastrowid
+        else:
+            conn.execute(
+                "UPDATE meal_plans SET name = ?, updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now') WHERE id = ?",
+                (name, plan_id)
+            )
+        if deletes:
+            conn.executemany(
+                "DELETE FROM meal_plan_items WHERE plan_id = ? AND day = ? AND meal = ? AND food_id = ?",
+                [(plan_id, *key) for key in deletes]
+            )
+        if upserts:
+            conn.executemany(
+                """
+                INSERT INTO meal_plan_items (plan_id, day, meal, food_id, grams) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (plan_id, day, meal, food_id) DO UPDATE SET grams = excluded.grams
+                """,
+                [(plan_id, *item) for item in upserts]
+            )
+        # Na fila de escrita este bloco é só um SAVEPOINT: o plano só fica "salvo" (com id e sem
+        # alterações pendentes) depois do commit do lote; se ele falhar, o próximo save grava tudo de novo
+        db_utils.on_commit(lambda: _mark_saved(plan, plan_id, name, upserts, deletes))
+    return len(upserts) + len(deletes)
+
+
+def _mark_saved(plan, plan_id, name, upserts, deletes):
+    """O que foi gravado passa a ser o estado do banco; edições feitas depois continuam pendentes."""
+    plan.plan_id = plan_id
+    saved = {(day, meal, food_id): grams for day, meal, food_id, grams in upserts}
+    saved.update({key: None for key in deletes})
+    for (day, meal, food_id), grams in saved.items():
+        if plan._slots[day][meal].get(food_id) == grams:
+            plan._original.pop((day, meal, food_id), None)
+        else:
+            plan._original[day, meal, food_id] = grams
+    plan._header_changed = plan.name != name
+
+
+def list_meal_plans(patient_id):
+    """Planos de um paciente (id, nome, dias e última alteração), do mais recente para o mais antigo."""
+    with db_utils.get_db_connection() as conn:
+        return pd.read_sql_query(
+            "SELECT id, name, n_days, updated_at FROM meal_plans WHERE patient_id = ? ORDER BY updated_at DESC, id DESC",
+            params=(patient_id,),
+            con=conn
+        )
+
+
+def food_descriptions(food_ids):
+    """Descrições dos alimentos informados: dicionário {food_id: descrição}."""
+    food_ids = sorted({int(food_id) for food_id in food_ids})
+    if not food_ids:
+        return {}
+    with db_utils.get_db_connection() as conn:
+        rows = conn.execute(
+            f"SELECT food_id, description FROM foods WHERE food_id IN ({', '.join('?' for _ in food_ids)})",
+            food_ids
+        ).fetchall()
+    return {row[0]: row[1] for row in rows}
+
+
+def delete_meal_plan(plan_id):
+    """Exclui um plano e todos os seus itens."""
+    with db_utils.transaction() as conn:
+        conn.execute("DELETE FROM meal_plan_items WHERE plan_id = ?", (plan_id,))
+        conn.execute("DELETE FROM meal_plans WHERE id = ?", (plan_id,))
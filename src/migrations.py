@@ -0,0 +1,459 @@
+# src/migrations.py
+
+import re
+from src import food_search
+from src import food_similarity
+from src.text_utils import normalize_text
+from src.taco import NUTRIENT_COLUMNS
+
+# Migrações versionadas do banco de dados.
+# Cada migração roda uma única vez, dentro de uma transação, e registra sua versão em
+# schema_version. Todas são escritas para serem idempotentes (IF NOT EXISTS, checagem de
+# colunas), de modo que bancos antigos criados por create_tables() possam ser atualizados.
+SCHEMA_VERSION_TABLE = 'schema_version'
+
+
+def _table_columns(conn, table):
+    """Retorna um dicionário {nome_da_coluna: info} da tabela (vazio se ela não existir)."""
+    return {row[1]: row for row in conn.execute(f"PRAGMA table_info({table})").fetchall()}
+
+
+def _add_column_if_missing(conn, table, column, definition):
+    """ALTER TABLE ... ADD COLUMN, só se a coluna ainda não existir."""
+    if column not in _table_columns(conn, table):
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+def _foods_table_sql(table='foods'):
+    """CREATE TABLE da tabela de alimentos (da TACO), com food_id como chave primária."""
+    nutrient_definitions = ',\n        '.join(f"{column} REAL" for column in NUTRIENT_COLUMNS)
+    return f"""
+    CREATE TABLE IF NOT EXISTS {table} (
+        food_id INTEGER PRIMARY KEY,
+        description TEXT NOT NULL,
+        {nutrient_definitions}
+    );
+    """
+
+
+def _migration_001_base_schema(conn):
+    """Tabelas originais: alimentos, pacientes, consultas e o índice de busca de alimentos."""
+    conn.execute(_foods_table_sql())
+
+    # Tabela de pacientes
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS patients (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        birth_date TEXT,
+        contact TEXT,
+        medical_history TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    """)
+
+    # Tabela de consultas/avaliações
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS consultations (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        patient_id INTEGER,
+        consultation_date TEXT NOT NULL,
+        weight_kg REAL,
+        height_cm REAL,
+        body_fat_percentage REAL,
+        -- Dobras Cutâneas (mm)
+        skinfold_triceps_mm REAL,
+        skinfold_subscapular_mm REAL,
+        skinfold_biceps_mm REAL,
+        skinfold_chest_mm REAL,
+        skinfold_midaxillary_mm REAL,
+        skinfold_suprailiac_mm REAL,
+        skinfold_abdominal_mm REAL,
+        skinfold_thigh_mm REAL,
+        skinfold_medial_calf_mm REAL,
+        -- Circunferências (cm)
+        circ_arm_cm REAL,
+        circ_waist_cm REAL,
+        circ_abdominal_cm REAL,
+        circ_hip_cm REAL,
+        circ_thigh_cm REAL,
+        notes TEXT,
+        FOREIGN KEY (patient_id) REFERENCES patients (id)
+    );
+    """)
+
+    food_search.create_food_search_index(conn)
+
+
+def _migration_002_patients_sex(conn):
+    """A coluna sex era gravada por add_patient, mas nunca existiu na tabela patients."""
+    _add_column_if_missing(conn, 'patients', 'sex', 'TEXT')
+
+
+def _migration_003_foods_typed_schema(conn):
+    """
+    Bancos antigos têm a tabela foods recriada por DataFrame.to_sql: sem chave primária,
+    com colunas sobrando ('Unnamed: 4', 'Número do', 'RAE ') e números guardados como texto.
+    Reconstrói a tabela no esquema tipado, copiando as colunas que coincidem.
+    """
+    columns = _table_columns(conn, 'foods')
+    expected = ['food_id', 'description', *NUTRIENT_COLUMNS]
+    has_primary_key = columns.get('food_id') is not None and columns['food_id'][5] == 1
+    if has_primary_key and list(columns) == expected:
+        return
+
+    conn.execute("ALTER TABLE foods RENAME TO foods_legacy")
+    conn.execute(_foods_table_sql())
+    shared = [column for column in expected if column in columns]
+    select_list = ', '.join(
+        column if column in ('food_id', 'description') else f"CAST(NULLIF(TRIM({column}), '') AS REAL)"
+        for column in shared
+    )
+    conn.execute(
+        f"INSERT OR REPLACE INTO foods ({', '.join(shared)}) "
+        f"SELECT {select_list} FROM foods_legacy WHERE food_id IS NOT NULL AND description IS NOT NULL"
+    )
+    conn.execute("DROP TABLE foods_legacy")
+
+
+def _migration_004_indexes(conn):
+    """Índices para as consultas mais frequentes das páginas."""
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_consultations_patient_date ON consultations (patient_id, consultation_date)"
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_patients_name ON patients (name)")
+
+
+def _migration_005_patient_name_search(conn):
+    """
+    Coluna name_search (nome normalizado, sem acentos e minúsculo) com índice (name_search, id),
+    usada pelo diretório de pacientes para busca por prefixo e paginação por chave.
+    """
+    _add_column_if_missing(conn, 'patients', 'name_search', 'TEXT')
+    conn.create_function('normalize_text', 1, normalize_text, deterministic=True)
+    conn.execute("UPDATE patients SET name_search = normalize_text(name) WHERE name_search IS NULL")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_patients_name_search ON patients (name_search, id)")
+
+
+def _migration_006_derived_body_fat(conn):
+    """
+    O %GC passa a ser uma coluna derivada: body_fat_protocol guarda o protocolo usado (NULL =
+    valor digitado, nunca recalculado) e body_fat_stale é um contador incrementado por triggers
+    sempre que algo de que o %GC depende muda (dobras, data, protocolo, sexo ou nascimento).
+    O recálculo fica para o job de src/body_composition.py, que zera o contador.
+    """
+    _add_column_if_missing(conn, 'consultations', 'body_fat_protocol', 'TEXT')
+    _add_column_if_missing(conn, 'consultations', 'body_fat_stale', 'INTEGER NOT NULL DEFAULT 0')
+    # Índice parcial: só as (poucas) consultas pendentes entram nele
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_consultations_body_fat_stale ON consultations (id) WHERE body_fat_stale > 0"
+    )
+
+    skinfold_columns = [column for column in _table_columns(conn, 'consultations') if column.startswith('skinfold_')]
+    conn.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS trg_consultations_body_fat_inputs
+    AFTER UPDATE OF body_fat_protocol, consultation_date, {', '.join(skinfold_columns)} ON consultations
+    WHEN NEW.body_fat_protocol IS NOT NULL
+    BEGIN
+        UPDATE consultations SET body_fat_stale = body_fat_stale + 1 WHERE id = NEW.id;
+    END;
+    """)
+    conn.execute("""
+    CREATE TRIGGER IF NOT EXISTS trg_consultations_body_fat_insert
+    AFTER INSERT ON consultations
+    WHEN NEW.body_fat_protocol IS NOT NULL AND NEW.body_fat_percentage IS NULL
+    BEGIN
+        UPDATE consultations SET body_fat_stale = body_fat_stale + 1 WHERE id = NEW.id;
+    END;
+    """)
+    conn.execute("""
+    CREATE TRIGGER IF NOT EXISTS trg_patients_body_fat_inputs
+    AFTER UPDATE OF birth_date, sex ON patients
+    WHEN OLD.birth_date IS NOT NEW.birth_date OR OLD.sex IS NOT NEW.sex
+    BEGIN
+        UPDATE consultations SET body_fat_stale = body_fat_stale + 1
+        WHERE patient_id = NEW.id AND body_fat_protocol IS NOT NULL;
+    END;
+    """)
+
+
+def _migration_007_meal_plans(conn):
+    """
+    Planos alimentares de vários dias. Cada item é uma linha compacta (plano, dia, refeição,
+    alimento, gramas) com chave primária composta e WITHOUT ROWID: o plano inteiro sai em uma
+    leitura pela chave, e salvar uma alteração é um upsert/delete de uma única linha.
+    Dias e refeições são índices (0 = primeiro dia; refeições em src/meal_plans.py MEALS).
+    """
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS meal_plans (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        patient_id INTEGER,
+        name TEXT NOT NULL,
+        n_days INTEGER NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (patient_id) REFERENCES patients (id)
+    );
+    """)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS meal_plan_items (
+        plan_id INTEGER NOT NULL,
+        day INTEGER NOT NULL,
+        meal INTEGER NOT NULL,
+        food_id INTEGER NOT NULL,
+        grams REAL NOT NULL,
+        PRIMARY KEY (plan_id, day, meal, food_id),
+        FOREIGN KEY (plan_id) REFERENCES meal_plans (id),
+        FOREIGN KEY (food_id) REFERENCES foods (food_id)
+    ) WITHOUT ROWID;
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_meal_plans_patient ON meal_plans (patient_id, updated_at)")
+
+
+def _migration_008_patients_updated_at(conn):
+    """
+    patients.updated_at: momento (com milissegundos) da última alteração do paciente ou de
+    qualquer consulta dele, mantido por triggers. É a chave de validade dos relatórios em
+    cache (src/reports.py). NULL = nunca alterado desde o cadastro (vale created_at).
+    """
+    _add_column_if_missing(conn, 'patients', 'updated_at', 'TEXT')
+    now = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+    conn.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS trg_patients_touch
+    AFTER UPDATE OF name, birth_date, sex, contact, medical_history ON patients
+    BEGIN
+        UPDATE patients SET updated_at = {now} WHERE id = NEW.id;
+    END;
+    """)
+    for event, row in (('INSERT', 'NEW'), ('UPDATE', 'NEW'), ('DELETE', 'OLD')):
+        conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_consultations_touch_patient_{event.lower()}
+        AFTER {event} ON consultations
+        BEGIN
+            UPDATE patients SET updated_at = {now} WHERE id = {row}.patient_id;
+        END;
+        """)
+
+
+def _migration_009_food_substitutes(conn):
+    """
+    Tabela food_substitutes com os vizinhos pré-calculados de cada alimento (src/food_similarity.py).
+    Ela é preenchida ao carregar a TACO; enquanto estiver vazia, as buscas são calculadas na hora.
+    """
+    food_similarity.create_substitutes_table(conn)
+
+
+def _rebuild_with_cascade(conn, table, column, parent):
+    """
+    Recria a tabela com FOREIGN KEY (column) REFERENCES parent (id) ON DELETE CASCADE.
+    O SQLite não altera restrições de tabelas existentes: a tabela é copiada para uma nova
+    (a partir do CREATE TABLE guardado, só com a cláusula da chave estrangeira trocada)
+    e seus índices e triggers são recriados com o mesmo SQL de antes.
+    """
+    create_sql = conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+    ).fetchone()[0]
+    dependents = [row[0] for row in conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type IN ('index', 'trigger') AND tbl_name = ? AND sql IS NOT NULL",
+        (table,)
+    ).fetchall()]
+
+    reference = re.compile(rf"REFERENCES\s+{parent}\s*\(\s*id\s*\)(\s+ON\s+DELETE\s+\w+(\s+\w+)?)?", re.IGNORECASE)
+    cascade = f"REFERENCES {parent} (id) ON DELETE CASCADE"
+    if reference.search(create_sql):
+        create_sql = reference.sub(cascade, create_sql)
+    else:
+        closing = create_sql.rindex(')')
+        create_sql = f"{create_sql[:closing].rstrip()},\n    FOREIGN KEY ({column}) {cascade}\n{create_sql[closing:]}"
+    create_sql = re.sub(
+        rf"^\s*CREATE\s+TABLE\s+(IF\s+NOT\s+EXISTS\s+)?[\"`\[]?{table}[\"`\]]?",
+        f"CREATE TABLE {table}_rebuild", create_sql, count=1, flags=re.IGNORECASE
+    )
+
+    columns = ', '.join(_table_columns(conn, table))
+    # AUTOINCREMENT: preserva o último id já usado, para que ids de linhas excluídas não voltem
+    sequence = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (table,)).fetchone() \
+        if 'AUTOINCREMENT' in create_sql.upper() else None
+    conn.execute(create_sql)
+    conn.execute(f"INSERT INTO {table}_rebuild ({columns}) SELECT {columns} FROM {table}")
+    conn.execute(f"DROP TABLE {table}")
+    # Triggers de outras tabelas citam esta pelo nome e ficam inválidos até o RENAME;
+    # no modo legado o RENAME não tenta reanalisá-los
+    conn.execute("PRAGMA legacy_alter_table = ON")
+    conn.execute(f"ALTER TABLE {table}_rebuild RENAME TO {table}")
+    conn.execute("PRAGMA legacy_alter_table = OFF")
+    if sequence is not None:
+        conn.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = ?", (sequence[0], table))
+    for sql in dependents:
+        conn.execute(sql)
+
+
+def _migration_010_cascade_and_archive(conn):
+    """
+    Integridade referencial: consultas e planos alimentares passam a ser excluídos junto com o
+    paciente (ON DELETE CASCADE), e os itens junto com o plano. As conexões do pool ligam
+    PRAGMA foreign_keys. Linhas órfãs já existentes são copiadas como estão; scripts/maintenance.py
+    as encontra e remove.
+    patients_archive guarda pacientes excluídos no modo arquivo (db_utils.delete_patient(archive=True)):
+    o cadastro, as consultas e os planos em JSON, para que possam ser restaurados.
+    """
+    _rebuild_with_cascade(conn, 'consultations', 'patient_id', 'patients')
+    _rebuild_with_cascade(conn, 'meal_plans', 'patient_id', 'patients')
+    _rebuild_with_cascade(conn, 'meal_plan_items', 'plan_id', 'meal_plans')
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS patients_archive (
+        patient_id INTEGER PRIMARY KEY,
+        name TEXT,
+        archived_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now')),
+        data TEXT NOT NULL
+    );
+    """)
+
+
+def _migration_011_recipes(conn):
+    """
+    Receitas (preparações da clínica) como alimentos compostos. Cada receita é também uma linha
+    de foods (food_id a partir de src/recipes.py RECIPE_FOOD_ID_START), com o vetor por 100 g já
+    calculado, então aparece na busca e entra nos planos como um alimento só.
+    recipe_ingredients guarda a lista de ingredientes (que podem ser outras receitas) e o índice
+    por ingrediente acha as receitas afetadas quando um alimento muda: o trigger marca como
+    pendentes (stale) só as receitas cujos ingredientes tiveram algum nutriente alterado.
+    """
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS recipes (
+        food_id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        yield_factor REAL NOT NULL DEFAULT 1.0,
+        notes TEXT,
+        stale INTEGER NOT NULL DEFAULT 0,
+        updated_at TEXT DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now'))
+    );
+    """)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS recipe_ingredients (
+        recipe_id INTEGER NOT NULL,
+        food_id INTEGER NOT NULL,
+        grams REAL NOT NULL,
+        PRIMARY KEY (recipe_id, food_id),
+        FOREIGN KEY (recipe_id) REFERENCES recipes (food_id) ON DELETE CASCADE,
+        FOREIGN KEY (food_id) REFERENCES foods (food_id)
+    ) WITHOUT ROWID;
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_recipe_ingredients_food ON recipe_ingredients (food_id, recipe_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_recipes_stale ON recipes (food_id) WHERE stale > 0")
+    changed = ' OR '.join(f"OLD.{column} IS NOT NEW.{column}" for column in NUTRIENT_COLUMNS)
+    conn.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS trg_foods_recipe_inputs
+    AFTER UPDATE OF {', '.join(NUTRIENT_COLUMNS)} ON foods
+    WHEN {changed}
+    BEGIN
+        UPDATE recipes SET stale = 1
+        WHERE food_id IN (SELECT recipe_id FROM recipe_ingredients WHERE food_id = NEW.food_id);
+    END;
+    """)
+
+
+def _migration_012_patient_name_index(conn):
+    """
+    Índice cego dos nomes de pacientes (src/crypto.py): com a criptografia ligada, o nome fica
+    cifrado e name_search vazio, e a busca por nome usa os HMACs dos prefixos das palavras.
+    A cifragem dos dados já existentes é feita por scripts/encrypt_patients.py (precisa da chave).
+    """
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS patient_name_index (
+        term INTEGER NOT NULL,
+        patient_id INTEGER NOT NULL,
+        PRIMARY KEY (term, patient_id),
+        FOREIGN KEY (patient_id) REFERENCES patients (id) ON DELETE CASCADE
+    ) WITHOUT ROWID;
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_patient_name_index_patient ON patient_name_index (patient_id)")
+
+
+def _migration_013_patients_version(conn):
+    """
+    patients.version: número da versão do cadastro, incrementado a cada update_patient().
+    Quem edita informa a versão que leu e a gravação só acontece se ela ainda for a atual
+    (controle de concorrência otimista: duas sessões não sobrescrevem uma a outra sem saber).
+    """
+    _add_column_if_missing(conn, 'patients', 'version', 'INTEGER NOT NULL DEFAULT 1')
+
+
+def _migration_014_data_changes(conn):
+    """
+    data_changes: contador (uma única linha) incrementado a cada gravação feita com db_utils.transaction().
+    O cache de leituras é por processo; comparando o contador com o último que viu, cada processo
+    (Streamlit, API) descobre que outro gravou no banco e descarta o que tinha em cache.
+    """
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS data_changes (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        counter INTEGER NOT NULL
+    );
+    """)
+    conn.execute("INSERT OR IGNORE INTO data_changes (id, counter) VALUES (1, 0)")
+
+
+# (versão, descrição, função) — sempre acrescente no final, nunca altere migrações já publicadas
+MIGRATIONS = [
+    (1, 'Esquema base (foods, patients, consultations, busca de alimentos)', _migration_001_base_schema),
+    (2, 'Coluna sex em patients', _migration_002_patients_sex),
+    (3, 'Tabela foods tipada e com chave primária', _migration_003_foods_typed_schema),
+    (4, 'Índices de consultas por paciente/data e de pacientes por nome', _migration_004_indexes),
+    (5, 'Nome normalizado e indexado para o diretório de pacientes', _migration_005_patient_name_search),
+    (6, '%GC derivado: protocolo por consulta e recálculo incremental', _migration_006_derived_body_fat),
+    (7, 'Planos alimentares de vários dias (meal_plans, meal_plan_items)', _migration_007_meal_plans),
+    (8, 'Última alteração do paciente e de suas consultas (patients.updated_at)', _migration_008_patients_updated_at),
+    (9, 'Substitutos de alimentos pré-calculados (food_substitutes)', _migration_009_food_substitutes),
+    (10, 'Exclusão em cascata de consultas e planos; arquivo de pacientes excluídos', _migration_010_cascade_and_archive),
+    (11, 'Receitas (alimentos compostos) com vetor de nutrientes pré-calculado', _migration_011_recipes),
+    (12, 'Índice cego dos nomes de pacientes (dados cifrados)', _migration_012_patient_name_index),
+    (13, 'Versão do cadastro do paciente (controle de concorrência otimista)', _migration_013_patients_version),
+    (14, 'Contador de gravações no banco (cache entre processos)', _migration_014_data_changes),
+]
+
+
+def current_version(conn):
+    """Versão do esquema já aplicada ao banco (0 para bancos nunca migrados)."""
+    conn.execute(f"""
+    CREATE TABLE IF NOT EXISTS {SCHEMA_VERSION_TABLE} (
+        version INTEGER PRIMARY KEY,
+        description TEXT,
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    """)
+    return conn.execute(f"SELECT COALESCE(MAX(version), 0) FROM {SCHEMA_VERSION_TABLE}").fetchone()[0]
+
+
+def migrate(conn):
+    """
+    Aplica, em ordem, todas as migrações pendentes. Cada uma roda em sua própria transação:
+    se falhar, o banco fica na última versão completa e nada se perde.
+    Retorna a lista de versões aplicadas nesta execução.
+    """
+    version = current_version(conn)
+    conn.commit()
+    # Migrações que recriam tabelas não podem disparar as ações das chaves estrangeiras
+    # (um DROP TABLE apagaria as linhas filhas em cascata); o PRAGMA só muda fora de transação
+    foreign_keys = conn.execute("PRAGMA foreign_keys").fetchone()[0]
+    conn.execute("PRAGMA foreign_keys = OFF")
+    applied = []
+    try:
+        for migration_version, description, migration in MIGRATIONS:
+            if migration_version <= version:
+                continue
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                migration(conn)
+                conn.execute(
+                    f"INSERT INTO {SCHEMA_VERSION_TABLE} (version, description) VALUES (?, ?)",
+                    (migration_version, description)
+                )
+            except BaseException:
+                conn.rollback()
+                raise
+            conn.commit()
+            applied.append(migration_version)
+    finally:
+        conn.execute(f"PRAGMA foreign_keys = {'ON' if foreign_keys else 'OFF'}")
+    return applied
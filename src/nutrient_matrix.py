@@ -0,0 +1,109 @@
+# src/nutrient_matrix.py
+
+import threading
+import numpy as np
+from src import db_utils
+from src.taco import NUTRIENT_COLUMNS
+from src.lazy_imports import lazy_import
+pd = lazy_import('pandas')
+
+
+class NutrientMatrix:
+    """
+    Tabela de nutrientes em memória: uma matriz float contígua (alimentos x nutrientes, por 100 g)
+    e um índice food_id -> linha. É imutável depois de criada, então pode ser compartilhada
+    entre todas as sessões do Streamlit sem cópia nem lock.
+    """
+
+    def __init__(self, food_ids, values, columns=NUTRIENT_COLUMNS):
+        self.food_ids = np.asarray(food_ids, dtype=np.int64)
+        self.values = np.ascontiguousarray(values, dtype=np.float64)
+        self.columns = tuple(columns)
+        self.row_index = {int(food_id): row for row, food_id in enumerate(self.food_ids)}
+        self.version = 0  # Número da carga da tabela foods (get_nutrient_matrix); muda a cada invalidação
+        self.food_ids.flags.writeable = False
+        self.values.flags.writeable = False
+
+    def __len__(self):
+        return len(self.food_ids)
+
+    def rows_for(self, food_ids):
+        """Converte uma sequência de food_id nas linhas correspondentes da matriz (KeyError se não existir)."""
+        return np.fromiter((self.row_index[int(food_id)] for food_id in food_ids), dtype=np.intp)
+
+    def quantity_matrix(self, plans):
+        """
+        Monta a matriz de quantidades (planos x alimentos, em porções de 100 g).
+        plans: sequência de planos, cada um um dicionário {food_id: gramas}.
+        """
+        quantities = np.zeros((len(plans), len(self.food_ids)))
+        for plan_row, items in enumerate(plans):
+            if items:
+                # add.at soma quantidades repetidas do mesmo alimento (ex: em refeições diferentes)
+                np.add.at(quantities[plan_row], self.rows_for(items.keys()), np.fromiter(items.values(), dtype=float) / 100)
+        return quantities
+
+    def totals(self, items):
+        """
+        Perfil nutricional completo de um plano: um único produto vetor-matriz.
+        items: dicionário {food_id: gramas} ou sequência de pares (food_id, gramas).
+        Retorna uma Series indexada pelos nomes das colunas de nutrientes.
+        """
+        pairs = list(items.items() if isinstance(items, dict) else items)
+        if not pairs:
+            return pd.Series(0.0, index=self.columns)
+        food_ids, grams = zip(*pairs)
+        portions = np.asarray(grams, dtype=float) / 100
+        return pd.Series(portions @ self.values[self.rows_for(food_ids)], index=self.columns)
+
+    def totals_many(self, plans, labels=None):
+        """
+        Totaliza muitos planos (ou dias) de uma vez com um único produto matriz-matriz.
+        plans: sequência de dicionários {food_id: gramas}; labels: rótulos opcionais das linhas.
+        Retorna um DataFrame (planos x nutrientes).
+        """
+        totals = self.quantity_matrix(plans) @ self.values
+        return pd.DataFrame(totals, columns=self.columns, index=labels)
+
+
+def load_nutrient_matrix(conn):
+    """
+    Lê a tabela foods e monta a NutrientMatrix. As colunas de nutrientes já são REAL (a TACO é
+    convertida na carga, ver src/taco.py); aqui só os valores ausentes (NULL) viram 0.
+    """
+    foods = pd.read_sql_query("SELECT * FROM foods ORDER BY food_id", con=conn)
+    nutrients = foods.reindex(columns=list(NUTRIENT_COLUMNS))
+    values = nutrients.fillna(0.0).to_numpy(dtype=np.float64)
+    return NutrientMatrix(foods['food_id'].to_numpy(), values)
+
+
+_matrix = None
+_matrix_database = None
+_matrix_version = 0  # Incrementado por invalidate_nutrient_matrix(); caches derivados usam na chave
+_matrix_lock = threading.Lock()
+
+
+def get_nutrient_matrix():
+    """
+    Retorna a NutrientMatrix do processo, carregando a tabela foods do banco só na primeira chamada.
+    Chame invalidate_nutrient_matrix() depois de alterar a tabela foods.
+    """
+    global _matrix, _matrix_database
+    matrix = _matrix
+    if matrix is not None and _matrix_database == db_utils.DATABASE_FILE:
+        return matrix
+    with _matrix_lock:
+        if _matrix is None or _matrix_database != db_utils.DATABASE_FILE:
+            with db_utils.get_db_connection() as conn:
+                _matrix = load_nutrient_matrix(conn)
+            _matrix.version = _matrix_version
+            _matrix_database = db_utils.DATABASE_FILE
+        return _matrix
+
+
+def invalidate_nutrient_matrix():
+    """Descarta a matriz em memória; a próxima chamada a get_nutrient_matrix() recarrega do banco."""
+    global _matrix, _matrix_version
+    with _matrix_lock:
+        _matrix = None
+        _matrix_version += 1
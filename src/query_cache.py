@@ -0,0 +1,127 @@
+# src/query_cache.py
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class QueryCache:
+    """
+    Cache LRU com tempo de expiração (TTL) para resultados de consultas ao banco.
+    Cada entrada recebe "tags" (ex: ('patient', 7)); as funções de escrita invalidam
+    apenas as tags que afetaram, e todas as entradas marcadas com elas são descartadas.
+    É compartilhado por todas as sessões do processo, então todas as operações usam um lock.
+    """
+
+    def __init__(self, maxsize=1024, ttl_seconds=300):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # chave -> (expira_em, valor, tags)
+        self._keys_by_tag = {}  # tag -> conjunto de chaves
+        self._generation = 0  # Incrementado a cada invalidação (ver get_or_load)
+        self._listeners = []  # Funções chamadas com as tags a cada invalidação
+        self._clear_listeners = []  # Funções chamadas (sem argumentos) a cada clear()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @property
+    def generation(self):
+        """Contador de invalidações; leia antes de consultar o banco e passe para put()."""
+        return self._generation
+
+    def get(self, key, default=None):
+        """Retorna o valor em cache para a chave (ou default se ausente/expirado)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            return default
+
+    def put(self, key, value, tags=(), generation=None):
+        """
+        Guarda um valor com suas tags. Se generation for informado e tiver havido uma
+        invalidação desde então, o valor pode já estar velho e não é guardado.
+        """
+        with self._lock:
+            if generation is None or generation == self._generation:
+                self._store(key, value, frozenset(tags))
+
+    def get_or_load(self, key, loader, tags_for_result=None):
+        """
+        Retorna o valor em cache para a chave ou chama loader() e guarda o resultado.
+        tags_for_result: função que recebe o resultado e devolve suas tags.
+        """
+        missing = object()
+        generation = self._generation
+        value = self.get(key, missing)
+        if value is not missing:
+            return value
+
+        # A consulta roda fora do lock, para não bloquear as outras sessões
+        value = loader()
+        self.put(key, value, tags_for_result(value) if tags_for_result else (), generation)
+        return value
+
+    def _store(self, key, value, tags):
+        self._discard(key)
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value, tags)
+        for tag in tags:
+            self._keys_by_tag.setdefault(tag, set()).add(key)
+        while len(self._entries) > self.maxsize:
+            self._discard(next(iter(self._entries)))
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[2]:
+            keys = self._keys_by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_tag[tag]
+
+    def add_invalidation_listener(self, listener):
+        """Registra uma função chamada com as mesmas tags a cada invalidate() (ex: caches derivados)."""
+        self._listeners.append(listener)
+
+    def add_clear_listener(self, listener):
+        """Registra uma função chamada a cada clear() (ex: caches derivados que também devem ser esvaziados)."""
+        self._clear_listeners.append(listener)
+
+    def invalidate(self, *tags):
+        """Descarta todas as entradas marcadas com qualquer uma das tags."""
+        with self._lock:
+            self._generation += 1
+            for tag in tags:
+                for key in list(self._keys_by_tag.get(tag, ())):
+                    self._discard(key)
+                    self.invalidations += 1
+        for listener in self._listeners:
+            listener(*tags)
+
+    def clear(self):
+        """Esvazia o cache (ex: depois de trocar de banco de dados ou de uma gravação de outro processo)."""
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._keys_by_tag.clear()
+        for listener in self._clear_listeners:
+            listener()
+
+    def stats(self):
+        """Contadores de acertos/faltas/invalidações e o tamanho atual do cache."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'invalidations': self.invalidations,
+                'size': len(self._entries),
+            }
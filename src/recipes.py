@@ -0,0 +1,281 @@
+# src/recipes.py
+
+import numpy as np
+from src import db_utils, food_search
+from src.food_similarity import SUBSTITUTES_TABLE
+from src.instrumentation import instrumented
+from src.nutrient_matrix import invalidate_nutrient_matrix
+from src.taco import NUTRIENT_COLUMNS
+from src.lazy_imports import lazy_import
+pd = lazy_import('pandas')
+
+# Receitas da clínica (ex: uma marmita de arroz integral, feijão e frango) como alimentos compostos.
+# A receita é uma lista de ingredientes (alimentos da TACO ou outras receitas) em gramas crus e um
+# fator de rendimento (peso pronto / peso cru). O vetor de nutrientes por 100 g da receita pronta é
+# calculado ao salvar e gravado em foods, ao lado da TACO: busca, planos, otimizador e relatórios
+# usam a receita como uma linha só, sem expandir os ingredientes a cada totalização.
+# Quando um ingrediente muda, o trigger da migração 11 marca as receitas que o usam como pendentes
+# (stale) e refresh_stale_recipes() recalcula só elas, na ordem das dependências.
+RECIPE_FOOD_ID_START = 1_000_000  # Longe dos ids da TACO e dos alimentos sintéticos dos benchmarks
+WATER_COLUMN = 'moisture_percent'
+
+_NUTRIENT_SELECT = ', '.join(f"f.{column}" for column in NUTRIENT_COLUMNS)
+
+
+def recipe_vector(ingredient_values, grams, yield_factor=1.0):
+    """
+    Nutrientes por 100 g da receita pronta.
+    ingredient_values: array ingredientes x NUTRIENT_COLUMNS (por 100 g; NaN conta como 0);
+    grams: gramas cruas de cada ingrediente; yield_factor: peso pronto / peso cru.
+    A variação de peso no preparo é tratada como água: a umidade é recalculada pelo balanço
+    de água (água dos ingredientes - água perdida ou + água absorvida), os demais nutrientes
+    só se concentram (ou diluem) no peso final.
+    """
+    values = np.nan_to_num(np.asarray(ingredient_values, dtype=float))
+    grams = np.asarray(grams, dtype=float)
+    raw_weight = grams.sum()
+    cooked_weight = raw_weight * yield_factor
+    if raw_weight <= 0 or cooked_weight <= 0:
+        raise ValueError("A receita precisa de ingredientes e de rendimento maiores que zero.")
+    vector = grams / 100 @ values / cooked_weight * 100
+    water_column = NUTRIENT_COLUMNS.index(WATER_COLUMN)
+    water = grams @ values[:, water_column] / 100 + (cooked_weight - raw_weight)
+    vector[water_column] = min(max(water, 0.0) / cooked_weight * 100, 100.0)
+    return vector
+
+
+def _validate(conn, recipe_id, ingredients, yield_factor):
+    if not ingredients:
+        raise ValueError("Informe pelo menos um ingrediente.")
+    if any(grams is None or grams <= 0 for grams in ingredients.values()):
+        raise ValueError("As quantidades dos ingredientes devem ser maiores que zero.")
+    if not yield_factor or yield_factor <= 0:
+        raise ValueError("O fator de rendimento deve ser maior que zero.")
+
+    food_ids = list(ingredients)
+    placeholders = ', '.join('?' for _ in food_ids)
+    found = {row[0] for row in conn.execute(f"SELECT food_id FROM foods WHERE food_id IN ({placeholders})", food_ids)}
+    if len(found) < len(food_ids):
+        raise ValueError(f"Ingredientes inexistentes: {sorted(set(food_ids) - found)}")
+    if recipe_id is None:
+        return
+    # Uma receita não pode usar a si mesma, nem direta nem indiretamente (via outras receitas)
+    nested = conn.execute(
+        f"""
+        WITH RECURSIVE used(food_id) AS (
+            SELECT food_id FROM recipe_ingredients WHERE recipe_id IN ({placeholders})
+            UNION
+            SELECT ri.food_id FROM recipe_ingredients ri JOIN used ON ri.recipe_id = used.food_id
+        )
+        SELECT 1 FROM used WHERE food_id = ? LIMIT 1
+        """,
+        (*food_ids, recipe_id)
+    ).fetchone()
+    if recipe_id in ingredients or nested is not None:
+        raise ValueError("A receita não pode ser ingrediente dela mesma.")
+
+
+def _write_recipe_foods(conn, recipe_ids):
+    """Recalcula e grava em foods o vetor por 100 g das receitas informadas (ingredientes já atualizados)."""
+    recipe_ids = [int(recipe_id) for recipe_id in recipe_ids]
+    placeholders = ', '.join('?' for _ in recipe_ids)
+    headers = {row[0]: (row[1], row[2]) for row in conn.execute(
+        f"SELECT food_id, name, yield_factor FROM recipes WHERE food_id IN ({placeholders})", recipe_ids
+    )}
+    rows = conn.execute(
+        f"""
+        SELECT ri.recipe_id, ri.grams, {_NUTRIENT_SELECT}
+        FROM recipe_ingredients ri JOIN foods f ON f.food_id = ri.food_id
+        WHERE ri.recipe_id IN ({placeholders})
+        ORDER BY ri.recipe_id
+        """,
+        recipe_ids
+    ).fetchall()
+    ingredients = {}
+    for row in rows:
+        ingredients.setdefault(row[0], []).append(tuple(row[1:]))
+
+    columns = ['food_id', 'description', *NUTRIENT_COLUMNS]
+    updates = ', '.join(f"{column} = excluded.{column}" for column in columns[1:])
+    records = []
+    for recipe_id, (name, yield_factor) in headers.items():
+        table = np.array(ingredients.get(recipe_id, []), dtype=float).reshape(-1, len(NUTRIENT_COLUMNS) + 1)
+        if not len(table):
+            continue
+        vector = recipe_vector(table[:, 1:], table[:, 0], yield_factor)
+        records.append((recipe_id, name, *[round(float(value), 4) for value in vector]))
+    # O UPDATE em foods dispara o trigger que marca como pendentes as receitas que usam estas
+    conn.executemany(
+        f"""
+        INSERT INTO foods ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})
+        ON CONFLICT (food_id) DO UPDATE SET {updates}
+        """,
+        records
+    )
+    _forget_substitutes(conn, recipe_ids)
+    return [record[0] for record in records]
+
+
+def _forget_substitutes(conn, recipe_ids):
+    """
+    Apaga os substitutos pré-calculados em que as receitas aparecem (como alimento ou como substituto):
+    o vetor delas mudou, e find_substitutes passa a calculá-los na hora, sobre a matriz atual.
+    """
+    placeholders = ', '.join('?' for _ in recipe_ids)
+    conn.execute(
+        f"DELETE FROM {SUBSTITUTES_TABLE} WHERE food_id IN ({placeholders}) OR substitute_id IN ({placeholders})",
+        [*recipe_ids, *recipe_ids]
+    )
+
+
+def _refresh_stale(conn):
+    """
+    Recalcula as receitas pendentes em ondas: cada onda pega as que não dependem de outra receita
+    ainda pendente, e gravá-las pode marcar a receita "de cima" para a próxima onda.
+    Retorna os food_id recalculados.
+    """
+    refreshed = []
+    while True:
+        ready = [row[0] for row in conn.execute("""
+            SELECT r.food_id FROM recipes r
+            WHERE r.stale > 0 AND NOT EXISTS (
+                SELECT 1 FROM recipe_ingredients ri JOIN recipes d ON d.food_id = ri.food_id
+                WHERE ri.recipe_id = r.food_id AND d.stale > 0
+            )
+        """)]
+        if not ready:
+            return refreshed  # Sem pendências (ou só um ciclo, que _validate impede de existir)
+        placeholders = ', '.join('?' for _ in ready)
+        conn.execute(f"UPDATE recipes SET stale = 0 WHERE food_id IN ({placeholders})", ready)
+        refreshed += _write_recipe_foods(conn, ready)
+
+
+def refresh_stale_recipes(conn=None):
+    """
+    Recalcula todas as receitas pendentes (ingredientes alterados, ex: TACO recarregada).
+    conn: conexão fora de transação (ex: a de scripts/initialize_database.py); sem ela, usa o pool.
+    Retorna o número de receitas recalculadas.
+    """
+    if conn is None:
+        with db_utils.transaction() as pooled:
+            refreshed = _refresh_stale(pooled)
+    else:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            refreshed = _refresh_stale(conn)
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+    if refreshed:
+        invalidate_nutrient_matrix()
+    return len(refreshed)
+
+
+@instrumented()
+def save_recipe(name, ingredients, yield_factor=1.0, notes=None, recipe_id=None):
+    """
+    Cria (recipe_id=None) ou atualiza uma receita e grava seu vetor por 100 g em foods.
+    ingredients: {food_id: gramas cruas}; yield_factor: peso pronto / peso cru (ex: 2.5 para arroz).
+    As receitas que usam esta como ingrediente são recalculadas na mesma transação.
+    Retorna o food_id da receita.
+    """
+    name = (name or '').strip()
+    if not name:
+        raise ValueError("Informe o nome da receita.")
+    ingredients = {int(food_id): float(grams) for food_id, grams in ingredients.items()}
+    yield_factor = float(yield_factor) if yield_factor is not None else None
+
+    with db_utils.transaction() as conn:
+        _validate(conn, recipe_id, ingredients, yield_factor)
+        if recipe_id is None:
+            recipe_id = conn.execute(
+                "SELECT MAX(?, COALESCE(MAX(food_id) + 1, 0)) FROM foods", (RECIPE_FOOD_ID_START,)
+            ).fetchone()[0]
+            conn.execute(
+                "INSERT INTO recipes (food_id, name, yield_factor, notes) VALUES (?, ?, ?, ?)",
+                (recipe_id, name, yield_factor, notes)
+            )
+        else:
+            updated = conn.execute(
+                """
+                UPDATE recipes SET name = ?, yield_factor = ?, notes = ?,
+                       updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now')
+                WHERE food_id = ?
+                """,
+                (name, yield_factor, notes, recipe_id)
+            ).rowcount
+            if not updated:
+                raise ValueError(f"Receita {recipe_id} não encontrada.")
+            conn.execute("DELETE FROM recipe_ingredients WHERE recipe_id = ?", (recipe_id,))
+        conn.executemany(
+            "INSERT INTO recipe_ingredients (recipe_id, food_id, grams) VALUES (?, ?, ?)",
+            [(recipe_id, food_id, grams) for food_id, grams in ingredients.items()]
+        )
+        _write_recipe_foods(conn, [recipe_id])
+        _refresh_stale(conn)
+        food_search.update_food_search_index(conn, [recipe_id])
+        # Na fila de escrita, o commit é o do lote: antes dele, a matriz recarregada viria sem a receita
+        db_utils.on_commit(invalidate_nutrient_matrix)
+    return recipe_id
+
+
+@instrumented()
+def delete_recipe(recipe_id):
+    """
+    Exclui uma receita (e sua linha em foods). Receitas usadas em planos alimentares ou como
+    ingrediente de outra receita não podem ser excluídas (ValueError).
+    """
+    with db_utils.transaction() as conn:
+        users = conn.execute(
+            """
+            SELECT (SELECT COUNT(*) FROM recipe_ingredients WHERE food_id = ?),
+                   (SELECT COUNT(*) FROM meal_plan_items WHERE food_id = ?)
+            """,
+            (recipe_id, recipe_id)
+        ).fetchone()
+        if users[0]:
+            raise ValueError("A receita é ingrediente de outra receita; remova-a de lá antes.")
+        if users[1]:
+            raise ValueError("A receita está em planos alimentares; remova-a dos planos antes.")
+        conn.execute("DELETE FROM recipes WHERE food_id = ?", (recipe_id,))
+        _forget_substitutes(conn, [recipe_id])
+        conn.execute("DELETE FROM foods WHERE food_id = ?", (recipe_id,))
+        food_search.update_food_search_index(conn, [recipe_id])
+        db_utils.on_commit(invalidate_nutrient_matrix)
+
+
+def list_recipes():
+    """Receitas cadastradas (food_id, nome, rendimento, número de ingredientes, última alteração)."""
+    with db_utils.get_db_connection() as conn:
+        return pd.read_sql_query(
+            """
+            SELECT r.food_id, r.name, r.yield_factor, COUNT(ri.food_id) AS n_ingredients, r.updated_at
+            FROM recipes r LEFT JOIN recipe_ingredients ri ON ri.recipe_id = r.food_id
+            GROUP BY r.food_id
+            ORDER BY r.name
+            """,
+            con=conn
+        )
+
+
+def get_recipe(recipe_id):
+    """
+    Uma receita: (cabeçalho, ingredientes). O cabeçalho é um dicionário (None se não existir);
+    os ingredientes, um DataFrame com food_id, description e grams.
+    """
+    with db_utils.get_db_connection() as conn:
+        header = conn.execute(
+            "SELECT food_id, name, yield_factor, notes, updated_at FROM recipes WHERE food_id = ?", (recipe_id,)
+        ).fetchone()
+        ingredients = pd.read_sql_query(
+            """
+            SELECT ri.food_id, f.description, ri.grams
+            FROM recipe_ingredients ri JOIN foods f ON f.food_id = ri.food_id
+            WHERE ri.recipe_id = ?
+            ORDER BY ri.grams DESC
+            """,
+            params=(recipe_id,),
+            con=conn
+        )
+    return (dict(header) if header is not None else None), ingredients
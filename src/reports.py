@@ -0,0 +1,341 @@
+# src/reports.py
+
+import glob
+import hashlib
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime
+from src import analytics
+from src import db_utils
+from src import meal_plans
+from src.calculations import ages_from_birth_dates
+from src.lazy_imports import lazy_import
+pd = lazy_import('pandas')
+
+# Relatórios de evolução do paciente em PDF (reportlab).
+# Os dados são reunidos no processo do Streamlit (leituras em cache do db_utils) e a renderização,
+# que é o trabalho pesado, roda em um pool de processos. Os PDFs ficam em disco, com nome derivado
+# do id do paciente e da última alteração (patients.updated_at e plano alimentar mais recente):
+# enquanto nada muda, o relatório é servido direto do arquivo.
+REPORTS_DIR = os.path.join('data', 'cache', 'reports')
+REPORT_FORMAT_VERSION = 1  # Incremente ao mudar o layout, para invalidar os relatórios antigos
+REPORT_WORKERS = max(1, min(4, (os.cpu_count() or 2) - 1))
+ACTIVE_PATIENT_DAYS = 365  # Paciente ativo = teve consulta nos últimos N dias (modo em lote)
+PROGRESS_COLUMNS = ('weight_kg', 'bmi', 'body_fat_percentage')
+
+_LAST_MODIFIED_QUERY = """
+SELECT COALESCE(p.updated_at, p.created_at),
+       (SELECT MAX(m.updated_at) FROM meal_plans m WHERE m.patient_id = p.id)
+FROM patients p
+WHERE p.id = ?
+"""
+
+_executor = None
+_executor_lock = threading.Lock()
+_jobs = {}  # caminho do relatório -> Future da renderização em andamento
+
+
+def _require_reportlab():
+    try:
+        import reportlab  # noqa: F401
+    except ImportError as error:
+        raise ImportError(
+            "A geração de relatórios em PDF precisa do pacote reportlab (pip install reportlab)."
+        ) from error
+
+
+# --- Cache em disco ---
+
+def report_path(patient_id):
+    """
+    Caminho do relatório atual do paciente (pode ainda não existir).
+    Retorna None se o paciente não existir.
+    """
+    with db_utils.get_db_connection() as conn:
+        row = conn.execute(_LAST_MODIFIED_QUERY, (patient_id,)).fetchone()
+    if row is None:
+        return None
+    version = hashlib.sha1(f"v{REPORT_FORMAT_VERSION}|{row[0]}|{row[1]}".encode()).hexdigest()[:16]
+    return os.path.join(REPORTS_DIR, f"patient_{patient_id}_{version}.pdf")
+
+
+def _remove_old_reports(patient_id, current_path):
+    """Apaga as versões anteriores do relatório do paciente (na mesma pasta de current_path)."""
+    for path in glob.glob(os.path.join(os.path.dirname(current_path), f"patient_{patient_id}_*.pdf")):
+        if os.path.normpath(path) != os.path.normpath(current_path):
+            os.remove(path)
+
+
+def remove_reports(patient_id=None):
+    """
+    Apaga do disco os relatórios do paciente (todos, com patient_id=None), ex: ao excluir o
+    paciente ou ao cifrar o banco. Retorna quantos arquivos foram apagados.
+    """
+    pattern = f"patient_{'*' if patient_id is None else int(patient_id)}_*.pdf"
+    removed = 0
+    for path in glob.glob(os.path.join(REPORTS_DIR, pattern)):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            continue  # Apagado por outra sessão
+        removed += 1
+    return removed
+
+
+# --- Dados do relatório (processo principal) ---
+
+def _plan_summary(patient_id):
+    """Resumo do plano alimentar mais recente: médias diárias e os itens do primeiro dia."""
+    saved_plans = meal_plans.list_meal_plans(patient_id)
+    if saved_plans.empty:
+        return None
+    plan = meal_plans.load_meal_plan(int(saved_plans['id'].iloc[0]))
+    descriptions = meal_plans.food_descriptions(
+        food_id for meal in range(len(meal_plans.MEALS)) for food_id in plan.items(0, meal)
+    )
+    first_day = [
+        (meal_name, [(descriptions.get(food_id, str(food_id)), grams) for food_id, grams in plan.items(0, meal).items()])
+        for meal, meal_name in enumerate(meal_plans.MEALS)
+    ]
+    averages = plan.day_totals().mean()[list(meal_plans.SUMMARY_NUTRIENTS)]
+    return {
+        'name': plan.name,
+        'n_days': plan.n_days,
+        'daily_averages': {nutrient: float(value) for nutrient, value in averages.items()},
+        'first_day': [(meal_name, items) for meal_name, items in first_day if items],
+    }
+
+
+def collect_report_data(patient_id):
+    """Reúne tudo o que o relatório mostra, em tipos simples (o resultado vai para outro processo)."""
+    details = db_utils.get_patient_details(patient_id)
+    if details.empty:
+        return None
+    patient = details.iloc[0]
+    consultations = db_utils.get_consultations_for_patient(patient_id)
+    progress = analytics.get_patient_progress(patient_id)
+    age = ages_from_birth_dates([patient['birth_date']])[0] if patient['birth_date'] else None
+
+    history = consultations[['consultation_date', 'weight_kg', 'height_cm', 'body_fat_percentage', 'body_fat_protocol']]
+    history = history.astype(object).where(history.notna(), None)
+    return {
+        'patient': {
+            'id': int(patient_id),
+            'name': patient['name'],
+            'birth_date': patient['birth_date'],
+            'age': None if age is None or age != age else int(age),
+            'sex': patient['sex'],
+            'contact': patient['contact'],
+        },
+        'history': history.values.tolist(),
+        'progress': {
+            'dates': progress['consultation_date'].astype(str).tolist(),
+            **{column: progress[column].astype(float).tolist() for column in PROGRESS_COLUMNS if column in progress},
+        },
+        'plan': _plan_summary(patient_id),
+        'generated_at': datetime.now().strftime('%d/%m/%Y %H:%M'),
+    }
+
+
+# --- Renderização (processos do pool) ---
+
+def _format(value, decimals=1):
+    if value is None or value != value:
+        return '-'
+    return f"{value:.{decimals}f}".replace('.', ',')
+
+
+def _trend_chart(dates, values, title):
+    """Gráfico de linha (reportlab.graphics) de uma medida ao longo das consultas."""
+    from reportlab.graphics.charts.lineplots import LinePlot
+    from reportlab.graphics.shapes import Drawing, String
+    from reportlab.lib import colors
+
+    points = [
+        (date.fromisoformat(day).toordinal(), value)
+        for day, value in zip(dates, values) if value is not None and value == value
+    ]
+    if len(points) < 2:
+        return None
+    drawing = Drawing(480, 170)
+    drawing.add(String(0, 158, title, fontName='Helvetica-Bold', fontSize=10))
+    chart = LinePlot()
+    chart.x, chart.y, chart.width, chart.height = 40, 25, 420, 120
+    chart.data = [points]
+    chart.lines[0].strokeColor = colors.HexColor('#2e7d32')
+    chart.lines[0].strokeWidth = 1.5
+    chart.xValueAxis.valueMin = points[0][0]
+    chart.xValueAxis.valueMax = points[-1][0]
+    chart.xValueAxis.labelTextFormat = lambda ordinal: date.fromordinal(int(ordinal)).strftime('%d/%m/%y')
+    chart.xValueAxis.labels.fontSize = 7
+    chart.yValueAxis.labels.fontSize = 7
+    drawing.add(chart)
+    return drawing
+
+
+def render_report(data, path):
+    """Gera o PDF do relatório em path (escreve em um temporário e renomeia ao final)."""
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.lib.units import cm
+    from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+    styles = getSampleStyleSheet()
+    table_style = TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#e8f5e9')),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 8),
+        ('GRID', (0, 0), (-1, -1), 0.25, colors.grey),
+        ('ALIGN', (1, 1), (-1, -1), 'RIGHT'),
+    ])
+    patient = data['patient']
+    story = [
+        Paragraph(f"Relatório de evolução — {patient['name']}", styles['Title']),
+        Paragraph(
+            f"Nascimento: {patient['birth_date'] or '-'} ({patient['age'] if patient['age'] is not None else '-'} anos) · "
+            f"Sexo: {patient['sex'] or '-'} · Contato: {patient['contact'] or '-'}",
+            styles['Normal']
+        ),
+        Paragraph(f"Gerado em {data['generated_at']}", styles['Italic']),
+        Spacer(1, 0.5 * cm),
+        Paragraph("Histórico de consultas", styles['Heading2']),
+    ]
+    if data['history']:
+        rows = [['Data', 'Peso (kg)', 'Altura (cm)', '% Gordura', 'Protocolo']]
+        rows += [
+            [day, _format(weight), _format(height), _format(body_fat), protocol or '-']
+            for day, weight, height, body_fat, protocol in data['history']
+        ]
+        story.append(Table(rows, style=table_style, repeatRows=1))
+    else:
+        story.append(Paragraph("Nenhuma consulta registrada.", styles['Normal']))
+
+    progress = data['progress']
+    for column, title in (('weight_kg', 'Peso (kg)'), ('body_fat_percentage', '% Gordura'), ('bmi', 'IMC')):
+        chart = _trend_chart(progress['dates'], progress.get(column, []), title)
+        if chart is not None:
+            story += [Spacer(1, 0.4 * cm), chart]
+
+    plan = data['plan']
+    story.append(Paragraph("Plano alimentar atual", styles['Heading2']))
+    if plan is None:
+        story.append(Paragraph("Nenhum plano alimentar cadastrado.", styles['Normal']))
+    else:
+        story.append(Paragraph(f"{plan['name']} ({plan['n_days']} dias) — média diária:", styles['Normal']))
+        averages = plan['daily_averages']
+        story.append(Table([list(averages), [_format(value) for value in averages.values()]], style=table_style))
+        if plan['first_day']:
+            story += [Spacer(1, 0.3 * cm), Paragraph("Dia 1", styles['Heading3'])]
+            rows = [['Refeição', 'Alimento', 'Quantidade (g)']]
+            for meal_name, items in plan['first_day']:
+                rows += [[meal_name if position == 0 else '', description, _format(grams, 0)]
+                         for position, (description, grams) in enumerate(items)]
+            story.append(Table(rows, style=table_style, repeatRows=1))
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    SimpleDocTemplate(
+        temporary_path, pagesize=A4, title=f"Relatório - {patient['name']}",
+        leftMargin=2 * cm, rightMargin=2 * cm, topMargin=1.5 * cm, bottomMargin=1.5 * cm
+    ).build(story)
+    os.replace(temporary_path, path)
+    _remove_old_reports(data['patient']['id'], path)
+    return path
+
+
+# --- Fila de renderização ---
+
+def _get_executor():
+    """Pool de processos criado no primeiro uso. 'spawn' evita herdar as threads e conexões do Streamlit."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=REPORT_WORKERS, mp_context=multiprocessing.get_context('spawn')
+            )
+        return _executor
+
+
+def shutdown():
+    """Encerra o pool de renderização (os relatórios já na fila terminam antes)."""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+            _executor = None
+
+
+def request_report(patient_id):
+    """
+    Pede o relatório do paciente sem bloquear. Retorna (status, path):
+    'ready' — o PDF em path está atualizado; 'pending' — a renderização está na fila;
+    'error' — a renderização falhou (o próximo pedido tenta de novo);
+    'missing' — o paciente não existe.
+    """
+    path = report_path(patient_id)
+    if path is None:
+        return 'missing', None
+    if os.path.exists(path):
+        return 'ready', path
+
+    future = _jobs.get(path)
+    if future is not None:
+        if not future.done():
+            return 'pending', path
+        del _jobs[path]
+        return ('error' if future.exception() is not None else 'ready'), path
+
+    _require_reportlab()
+    data = collect_report_data(patient_id)
+    _jobs[path] = _get_executor().submit(render_report, data, path)
+    return 'pending', path
+
+
+def active_patient_ids(since_days=ACTIVE_PATIENT_DAYS):
+    """Pacientes com alguma consulta nos últimos since_days dias."""
+    with db_utils.get_db_connection() as conn:
+        rows = conn.execute(
+            "SELECT DISTINCT patient_id FROM consultations WHERE consultation_date >= date('now', ?) AND patient_id IS NOT NULL",
+            (f"-{int(since_days)} days",)
+        ).fetchall()
+    return [row[0] for row in rows]
+
+
+def render_reports(patient_ids, workers=REPORT_WORKERS, force=False, progress=None):
+    """
+    Modo em lote: gera os relatórios desatualizados dos pacientes informados, em paralelo.
+    force=True gera todos de novo. progress(feitos, total) é chamado a cada relatório pronto.
+    Retorna um dicionário com as contagens ('rendered', 'cached', 'failed') e os erros por paciente.
+    """
+    _require_reportlab()
+    summary = {'rendered': 0, 'cached': 0, 'failed': 0, 'errors': {}}
+    pending = {}
+    for patient_id in patient_ids:
+        path = report_path(patient_id)
+        if path is None:
+            continue
+        if os.path.exists(path) and not force:
+            summary['cached'] += 1
+            continue
+        pending[patient_id] = path
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+        futures = {
+            executor.submit(render_report, collect_report_data(patient_id), path): patient_id
+            for patient_id, path in pending.items()
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            patient_id = futures[future]
+            try:
+                future.result()
+            except Exception as error:
+                summary['failed'] += 1
+                summary['errors'][patient_id] = str(error)
+            else:
+                summary['rendered'] += 1
+            if progress is not None:
+                progress(done, len(futures))
+    return summary
@@ -0,0 +1,178 @@
+# src/taco.py
+
+import hashlib
+import os
+import numpy as np
+from src.lazy_imports import lazy_import
+pd = lazy_import('pandas')
+
+# --- Configurações ---
+TACO_XLSX_FILE = os.path.join('data', 'Taco-4a-Edicao.xlsx')
+TACO_CSV_FILE = os.path.join('data', 'taco.csv')
+CACHE_DIR = os.path.join('data', 'cache')
+CACHE_FORMAT_VERSION = 1  # Incremente ao mudar o parser, para invalidar os caches antigos
+
+# Colunas de nutrientes da tabela foods (valores da TACO por 100 g de alimento), na ordem do esquema
+NUTRIENT_COLUMNS = (
+    'moisture_percent', 'energy_kcal', 'protein_g', 'lipid_g', 'cholesterol_mg',
+    'carbohydrate_g', 'dietary_fiber_g', 'ash_g', 'calcium_mg', 'magnesium_mg',
+    'manganese_mg', 'phosphorus_mg', 'iron_mg', 'sodium_mg', 'potassium_mg',
+    'copper_mg', 'zinc_mg', 'retinol_mcg', 'retinol_equivalent_mcg',
+    'retinol_activity_equivalent_mcg', 'thiamin_mg', 'riboflavin_mg',
+    'pyridoxine_mg', 'niacin_mg', 'vitamin_c_mg',
+)
+
+# Cabeçalho da planilha/CSV original (já sem espaços nas pontas) -> coluna do esquema
+TACO_COLUMN_MAPPING = {
+    'Número do Alimento': 'food_id',
+    'Descrição dos alimentos': 'description',
+    'Umidade': 'moisture_percent',
+    'Energia': 'energy_kcal',
+    'Proteína': 'protein_g',
+    'Lipídeos': 'lipid_g',
+    'Colesterol': 'cholesterol_mg',
+    'Carboidrato': 'carbohydrate_g',
+    'Fibra alimentar': 'dietary_fiber_g',
+    'Cinzas': 'ash_g',
+    'Cálcio': 'calcium_mg',
+    'Magnésio': 'magnesium_mg',
+    'Manganês': 'manganese_mg',
+    'Fósforo': 'phosphorus_mg',
+    'Ferro': 'iron_mg',
+    'Sódio': 'sodium_mg',
+    'Potássio': 'potassium_mg',
+    'Cobre': 'copper_mg',
+    'Zinco': 'zinc_mg',
+    'Retinol': 'retinol_mcg',
+    'RE': 'retinol_equivalent_mcg',
+    'RAE': 'retinol_activity_equivalent_mcg',
+    'Tiamina': 'thiamin_mg',
+    'Riboflavina': 'riboflavin_mg',
+    'Piridoxina': 'pyridoxine_mg',
+    'Niacina': 'niacin_mg',
+    'Vitamina C': 'vitamin_c_mg',
+}
+# Colunas da planilha descartadas: energia em kJ (sem cabeçalho, derivável de kcal) e
+# uma repetição do número do alimento no meio da tabela
+IGNORED_COLUMNS = ('Unnamed: 4', 'Número do')
+
+# Marcadores de texto usados pela TACO nas colunas numéricas
+TRACE_MARKERS = {'tr'}  # Traços: presente, mas abaixo do limite de quantificação
+MISSING_MARKERS = {'', '*', 'na', 'nd', '-'}  # Não analisado / não se aplica
+TRACE_VALUE = 0.0  # Valor numérico usado para traços (a máscara trace preserva a informação)
+
+
+class TacoTable:
+    """
+    Tabela TACO tipada: ids (int32), descrições e uma matriz float32 (alimentos x NUTRIENT_COLUMNS),
+    com máscaras booleanas para valores em traço (trace) e ausentes (missing).
+    Valores ausentes ficam como NaN na matriz; traços ficam como TRACE_VALUE.
+    """
+
+    def __init__(self, food_ids, descriptions, values, trace, missing):
+        self.food_ids = np.asarray(food_ids, dtype=np.int32)
+        self.descriptions = np.asarray(descriptions, dtype=str)
+        self.values = np.asarray(values, dtype=np.float32)
+        self.trace = np.asarray(trace, dtype=bool)
+        self.missing = np.asarray(missing, dtype=bool)
+
+    def __len__(self):
+        return len(self.food_ids)
+
+    def to_frame(self):
+        """DataFrame no formato da tabela foods (food_id, description e as colunas de nutrientes)."""
+        frame = pd.DataFrame(self.values.astype(np.float64), columns=list(NUTRIENT_COLUMNS))
+        frame.insert(0, 'description', self.descriptions.astype(object))
+        frame.insert(0, 'food_id', self.food_ids.astype(np.int64))
+        return frame
+
+
+def _parse_number(text):
+    """Converte o texto de uma célula em (valor, é_traço, é_ausente)."""
+    cleaned = text.strip().lower()
+    if cleaned in TRACE_MARKERS:
+        return TRACE_VALUE, True, False
+    if cleaned in MISSING_MARKERS or cleaned == 'nan':
+        return np.nan, False, True
+    # Vírgula decimal e vírgulas soltas no início (ex: ',0,02') aparecem em algumas células
+    try:
+        return float(cleaned.lstrip(',').replace(',', '.')), False, False
+    except ValueError:
+        return np.nan, False, True
+
+
+def parse_taco_frame(raw):
+    """
+    Converte a tabela bruta (lida da planilha ou do CSV, com todas as células como texto)
+    em uma TacoTable. Linhas de categoria/cabeçalho repetido são descartadas.
+    """
+    raw = raw.rename(columns=lambda column: str(column).strip())
+    raw = raw.drop(columns=[column for column in IGNORED_COLUMNS if column in raw.columns])
+    raw = raw.rename(columns=TACO_COLUMN_MAPPING)
+
+    missing_columns = {'food_id', 'description'}.union(NUTRIENT_COLUMNS) - set(raw.columns)
+    if missing_columns:
+        raise ValueError(f"Colunas ausentes na tabela TACO: {sorted(missing_columns)}")
+
+    # Só as linhas com número de alimento são dados (as demais são categorias ou cabeçalhos)
+    food_ids = pd.to_numeric(raw['food_id'], errors='coerce')
+    raw = raw[food_ids.notna()]
+    food_ids = food_ids[food_ids.notna()]
+
+    cells = raw[list(NUTRIENT_COLUMNS)].fillna('').astype(str).to_numpy()
+    parsed = np.array([_parse_number(cell) for cell in cells.ravel()], dtype=object).reshape(cells.shape + (3,))
+
+    return TacoTable(
+        food_ids=food_ids.to_numpy(),
+        descriptions=raw['description'].astype(str).str.strip().to_numpy(),
+        values=parsed[..., 0].astype(np.float32),
+        trace=parsed[..., 1].astype(bool),
+        missing=parsed[..., 2].astype(bool),
+    )
+
+
+def read_taco_source(path):
+    """Lê a planilha (.xlsx) ou o CSV da TACO com todas as células como texto e devolve a TacoTable."""
+    if path.lower().endswith(('.xlsx', '.xls')):
+        # A primeira linha da planilha é um título; o cabeçalho real vem logo depois
+        raw = pd.read_excel(path, skiprows=1, dtype=str)
+    else:
+        raw = pd.read_csv(path, dtype=str, keep_default_na=False)
+    return parse_taco_frame(raw)
+
+
+def source_hash(path):
+    """Hash SHA-256 do arquivo de origem, usado como chave do cache binário."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as source:
+        for block in iter(lambda: source.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_path_for(path):
+    """Caminho do cache binário (.npz) correspondente ao conteúdo atual do arquivo de origem."""
+    return os.path.join(CACHE_DIR, f"taco-v{CACHE_FORMAT_VERSION}-{source_hash(path)[:16]}.npz")
+
+
+def load_taco(path=TACO_CSV_FILE):
+    """
+    Carrega a TACO tipada. Se o arquivo de origem não mudou desde a última leitura,
+    usa o cache binário (milissegundos); caso contrário, faz o parse e grava o cache.
+    """
+    cache_file = cache_path_for(path)
+    if os.path.exists(cache_file):
+        with np.load(cache_file, allow_pickle=False) as cached:
+            return TacoTable(cached['food_ids'], cached['descriptions'], cached['values'], cached['trace'], cached['missing'])
+
+    table = read_taco_source(path)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    # Grava em arquivo temporário e renomeia, para nunca deixar um cache pela metade
+    temporary_file = cache_file + '.tmp.npz'
+    np.savez(
+        temporary_file,
+        food_ids=table.food_ids, descriptions=table.descriptions,
+        values=table.values, trace=table.trace, missing=table.missing,
+    )
+    os.replace(temporary_file, cache_file)
+    return table
@@ -0,0 +1,21 @@
+# src/text_utils.py
+
+import re
+import unicodedata
+
+_NON_ALPHANUMERIC = re.compile(r'[^0-9a-z]+')
+
+
+def normalize_text(text):
+    """
+    Normaliza um texto para busca: remove acentos, converte para minúsculas e troca
+    pontuação por espaços. Ex: 'Pão, de queijo' -> 'pao de queijo'.
+    """
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    without_accents = ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return _NON_ALPHANUMERIC.sub(' ', without_accents.lower()).strip()
+
+
+def tokenize(text):
+    """Divide o texto normalizado em palavras."""
+    return normalize_text(text).split()
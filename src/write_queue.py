@@ -0,0 +1,167 @@
+# src/write_queue.py
+
+import atexit
+import queue
+import threading
+from concurrent.futures import Future, wait
+from src import db_utils
+
+# Fila de gravações com uma única thread escritora por processo.
+# As sessões (páginas do Streamlit, API) entregam a função de escrita — qualquer função que grave
+# com db_utils.transaction(), como db_utils.update_patient ou meal_plans.save_meal_plan — e recebem
+# um Future na hora, sem disputar entre si o lock de escrita do SQLite. A thread escritora junta o
+# que estiver na fila em um lote e grava tudo em uma transação (db_utils.write_batch): cada gravação
+# vira um SAVEPOINT, então uma que falha (ex: conflito de versão) não desfaz as outras do lote.
+# As páginas do Streamlit gravam com submit() e guardam os Futures na sessão: a execução da página
+# não espera o commit, e o resultado aparece na próxima (take_finished). call() fica para quem
+# precisa do resultado na hora (ex: o id de uma receita nova). O recálculo do %GC em segundo plano
+# e a importação em massa também passam por aqui; só os scripts de manutenção (com o app parado)
+# e as migrações gravam com conexão própria.
+MAX_BATCH_SIZE = 64  # Gravações por transação
+QUEUE_SIZE = 10000  # Gravações pendentes antes de submit() passar a esperar por espaço na fila
+READ_YOUR_WRITES_SECONDS = 0.5  # Espera de take_finished() pelas gravações pendentes da própria sessão
+
+_queue = queue.Queue(maxsize=QUEUE_SIZE)
+_thread = None
+_thread_lock = threading.Lock()
+_recording = threading.local()  # Tags invalidadas pelas gravações do lote em andamento
+_STOP = object()
+jobs_done = 0
+jobs_failed = 0
+batches_committed = 0
+
+
+def _record_invalidation(*tags):
+    recorded = getattr(_recording, 'tags', None)
+    if recorded is not None:
+        recorded.extend(tags)
+
+
+# As funções de escrita invalidam o cache antes do commit do lote; uma leitura feita nesse meio
+# tempo guardaria o dado antigo. As tags são anotadas e invalidadas de novo depois do commit.
+db_utils.query_cache.add_invalidation_listener(_record_invalidation)
+
+
+def _run_batch(batch):
+    global jobs_done, jobs_failed, batches_committed
+    jobs = [job for job in batch if job[0].set_running_or_notify_cancel()]
+    outcomes = []  # (future, deu certo, resultado ou exceção)
+    _recording.tags = []
+    try:
+        with db_utils.write_batch():
+            for future, function, args, kwargs in jobs:
+                try:
+                    outcomes.append((future, True, function(*args, **kwargs)))
+                except Exception as error:
+                    outcomes.append((future, False, error))
+    except Exception as error:
+        # O commit (ou o BEGIN) falhou: nenhuma gravação do lote ficou no banco
+        outcomes = [(future, False, outcome if not ok else error) for future, ok, outcome in outcomes]
+        outcomes += [(job[0], False, error) for job in jobs[len(outcomes):]]
+    else:
+        batches_committed += 1
+    finally:
+        tags, _recording.tags = _recording.tags, None
+    if tags:
+        db_utils.query_cache.invalidate(*dict.fromkeys(tags))
+
+    for future, ok, outcome in outcomes:
+        if ok:
+            jobs_done += 1
+            future.set_result(outcome)
+        else:
+            jobs_failed += 1
+            future.set_exception(outcome)
+
+
+def _writer():
+    stopping = False
+    while not stopping:
+        batch = [_queue.get()]
+        # Junta o que mais estiver esperando: sob carga, muitas gravações saem em um só commit
+        while len(batch) < MAX_BATCH_SIZE:
+            try:
+                batch.append(_queue.get_nowait())
+            except queue.Empty:
+                break
+        stopping = _STOP in batch
+        batch = [job for job in batch if job is not _STOP]
+        if batch:
+            _run_batch(batch)
+
+
+def _ensure_writer():
+    global _thread
+    with _thread_lock:
+        if _thread is None or not _thread.is_alive():
+            _thread = threading.Thread(target=_writer, name='nutri-writer', daemon=True)
+            _thread.start()
+
+
+def submit(function, *args, **kwargs):
+    """
+    Põe uma gravação na fila e devolve um concurrent.futures.Future com o resultado dela
+    (ou a exceção, ex: VersionConflictError). Quem chama não espera o commit.
+    """
+    future = Future()
+    if threading.current_thread() is _thread:
+        # Gravação pedida por outra gravação do lote: roda na hora, senão a fila esperaria por si mesma
+        future.set_running_or_notify_cancel()
+        try:
+            future.set_result(function(*args, **kwargs))
+        except Exception as error:
+            future.set_exception(error)
+        return future
+    _ensure_writer()
+    _queue.put((future, function, args, kwargs))
+    return future
+
+
+def call(function, *args, **kwargs):
+    """submit() e espera o resultado (para quem precisa dele na hora, ex: o id criado)."""
+    return submit(function, *args, **kwargs).result()
+
+
+def take_finished(pending, timeout=READ_YOUR_WRITES_SECONDS):
+    """
+    Para quem guarda as gravações enviadas como pares (rótulo, Future) (ex: na sessão do Streamlit):
+    espera até timeout segundos por elas, para que a leitura seguinte já veja o que foi gravado, tira
+    da lista as concluídas e devolve [(rótulo, resultado, exceção)]. As demais ficam na lista.
+    """
+    if pending:
+        wait([future for _, future in pending], timeout=timeout)
+    finished = [(label, future) for label, future in pending if future.done()]
+    pending[:] = [entry for entry in pending if entry not in finished]
+    return [
+        (label, None, future.exception()) if future.exception() is not None else (label, future.result(), None)
+        for label, future in finished
+    ]
+
+
+def flush():
+    """Espera todas as gravações já enfileiradas serem gravadas."""
+    call(lambda: None)
+
+
+def stop():
+    """Grava o que estiver pendente e encerra a thread escritora (ela volta no próximo submit)."""
+    global _thread
+    with _thread_lock:  # submit() espera aqui: nenhuma thread nova começa antes desta terminar
+        if _thread is not None and _thread.is_alive():
+            _queue.put(_STOP)
+            _thread.join()
+        _thread = None
+
+
+def queue_stats():
+    """Gravações pendentes, concluídas e com erro, e o tamanho médio dos lotes (para diagnóstico)."""
+    return {
+        'pending': _queue.qsize(),
+        'done': jobs_done,
+        'failed': jobs_failed,
+        'batches': batches_committed,
+        'mean_batch_size': (jobs_done + jobs_failed) / batches_committed if batches_committed else 0.0,
+    }
+
+
+atexit.register(stop)